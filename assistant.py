@@ -0,0 +1,1244 @@
+# Helper functions, tools and API clients of the assistant, kept apart from the chat loop in chatbot.py
+# so an updated version can be loaded with importlib.reload() without restarting the conversation
+
+import time  # For per-turn wall-clock time and background task durations
+from os import getenv  # For accessing environment variables
+import os  # For file operations
+import re  # For regular expressions to parse code blocks
+from datetime import datetime  # For handling date and time
+import logging  # For logging activities
+import atexit  # For flushing pending git work on exit
+import asyncio  # For running helper and reply requests concurrently
+import threading  # For warming up the API clients in the background
+from context_window import ContextWindow  # For keeping the prompt under a token budget
+from intent_classifier import CodeUpdateClassifier  # For deciding obvious code update checks locally
+from response_cache import ResponseCache  # For answering repeated helper prompts from disk
+from patch_update import PatchError, apply_patch, build_patch_prompt  # For diff-based self-updates
+from git_worker import ChangeTracker, GitWorker  # For git commits and pushes off the chat thread
+from tools import ToolRegistry  # For dispatching the assistant's tool calls
+from file_reader import FileReader, format_result  # For paged /read
+from command_executor import CommandExecutor  # For running the text commands of a reply
+from script_runner import run_sandboxed  # For running generated scripts with time and memory limits
+from worker_pool import CAN_FORK, WorkerPool  # For running scripts and tests on warm Python processes
+from parallel_tests import discover_tests, format_report, run_parallel, run_test_file  # For running test files
+from update_gate import ScriptInstaller, validate_update  # For checking self-updates before they are installed
+from backup_store import BackupStore  # For the compressed, deduplicated history of the assistant's code
+from telemetry import Telemetry, measure_stream, measure_stream_async  # For latency, token and cost statistics
+# openai, httpx (through transport) and git are imported lazily, see get_client() and GitWorker
+
+# importlib.reload() runs this module again in the same namespace. Objects that hold connections, threads,
+# caches or conversation state are only created on the first load, so they survive a reload; functions,
+# prompts and tools are replaced by their new versions.
+first_load = "first_load" not in globals()
+
+# Define constants
+DEBUG_MODE = True  # or set to False if debugging is not needed
+CONVERSATION_WINDOW_FOR_CODE_UPDATE = 5
+CONVERSATION_WINDOW_FOR_REQUIREMENTS = 10
+STREAM_RESPONSES = True  # Print the assistant's reply token by token as it arrives
+CONTEXT_TOKEN_BUDGET = 8000  # Maximum tokens of conversation sent with each reply request
+CONTEXT_MIN_RECENT_MESSAGES = 4  # Latest messages that are always sent verbatim
+LOCAL_INTENT_THRESHOLD = 0.1  # Below this update probability the code update check is answered locally
+RESPONSE_CACHE_FILE = '.sam_cache.sqlite'  # On-disk cache for helper prompt responses
+RESPONSE_CACHE_TTL = 24 * 3600  # Seconds a cached helper response stays valid
+RESPONSE_CACHE_MAX_ENTRIES = 1000  # Least recently used helper responses beyond this are evicted
+CHANGE_MANIFEST_FILE = '.sam_changes.json'  # Files written by the assistant that still need to be committed
+READ_PAGE_BYTES = 4096  # Approximate size of a page returned by /read and /page
+READ_MAX_BYTES = 16384  # Largest part of a file a single /read may return
+USE_TOOL_CALLING = True  # Let the model call tools through the API instead of typing /commands
+TOOL_MAX_ROUNDS = 5  # Maximum rounds of tool calls and follow-up replies per user turn
+SELF_UPDATE_MODE = "diff"  # "diff" asks the model for a patch, "full" for the complete file
+HTTP_MAX_CONNECTIONS = 10  # Connections kept by each pooled HTTP client
+HTTP_KEEPALIVE_EXPIRY = 120  # Seconds an idle connection is kept open for reuse
+API_RETRY_ATTEMPTS = 3  # Attempts per API call for connection errors, rate limits and server errors
+SCRIPT_WALL_TIMEOUT = 60  # Seconds a script may run before it is killed
+SCRIPT_CPU_SECONDS = 30  # CPU seconds a script may use (POSIX only)
+SCRIPT_MEMORY_BYTES = 1024 ** 3  # Address space a script may use (POSIX only)
+SCRIPT_MAX_OUTPUT_BYTES = 8192  # Output of a script kept for the conversation; the middle of longer output is dropped
+USE_WORKER_POOL = CAN_FORK  # Run scripts and tests on warm worker processes; off without fork (Windows), where workers give no speed-up
+WORKER_POOL_SIZE = 2  # Warm worker processes kept ready
+WORKER_MAX_JOBS = 50  # Jobs a worker runs before it is replaced
+TEST_FILE_PATTERN = 'test_*.py'  # Test files run together by run_all_tests
+TEST_WORKERS = os.cpu_count() or 2  # Test files run at the same time by run_all_tests
+UPDATE_STARTUP_TIMEOUT = 60  # Seconds an updated script may take to start during validation
+BACKUP_DIR = 'code_backups'  # Store of every proposed and replaced version of the assistant's code
+BACKUP_SNAPSHOT_EVERY = 10  # Versions stored as deltas before the next full copy
+BACKUP_KEEP_VERSIONS = 100  # Latest versions always kept
+BACKUP_KEEP_DAYS = 90  # Older versions are kept for this many days
+SESSION_DIR = '.sam_sessions'  # Append-only log of each conversation, used to resume after a restart
+SESSION_RESUME_MESSAGES = 50  # Latest messages reloaded when a session is resumed
+TELEMETRY_FILE = '.sam_telemetry.jsonl'  # Recent API calls kept for /stats across restarts
+TELEMETRY_CAPACITY = 1000  # API calls kept for /stats
+MODEL_PRICES = {  # USD per million prompt and completion tokens, for estimating the cost of each call
+    "openai/gpt-4o": (2.50, 10.00),
+    "openai/o1-preview": (15.00, 60.00),
+}
+# Settings used only when the objects that survive a reload are created; a change takes effect after a restart
+RESTART_SETTINGS = (
+    "RESPONSE_CACHE_FILE", "CHANGE_MANIFEST_FILE", "HTTP_MAX_CONNECTIONS", "HTTP_KEEPALIVE_EXPIRY",
+    "BACKUP_DIR", "SESSION_DIR", "TELEMETRY_FILE",
+)
+REQUEST_TIMEOUTS = {  # Seconds to wait for each type of API call
+    "reply": 60,
+    "helper": 30,
+    "code_update": 600,
+}
+
+# The API clients are built on first use (or by the background warm-up) because importing openai is slow
+if first_load:
+    client = None  # Blocking OpenAI client
+    async_client = None  # Async client used by the turn pipeline to issue the intent check and the reply in parallel
+    transport_stats = None  # Request and connection reuse counters shared by both HTTP clients
+    client_lock = threading.Lock()
+
+# Function to get the blocking OpenAI client, building it on first use
+def get_client():
+    """
+    Returns the OpenAI client, importing openai and creating the pooled HTTP client the first time.
+    """
+    global client, async_client, transport_stats
+    with client_lock:
+        if client is None:
+            from openai import OpenAI, AsyncOpenAI  # For interacting with the OpenAI API
+            from transport import TransportStats, build_async_http_client, build_http_client
+            transport_stats = TransportStats()
+            # Initialize the OpenAI client with the base URL and API key from environment variables
+            client = OpenAI(
+                base_url="https://openrouter.ai/api/v1",  # OpenAI API endpoint
+                api_key=getenv("SAM_OPENROUTER"),  # API key stored in environment variable
+                http_client=build_http_client(
+                    transport_stats,
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+                ),
+                max_retries=0  # Retries are done by create_completion with jittered backoff
+            )
+            async_client = AsyncOpenAI(
+                base_url="https://openrouter.ai/api/v1",
+                api_key=getenv("SAM_OPENROUTER"),
+                http_client=build_async_http_client(
+                    transport_stats,
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+                ),
+                max_retries=0
+            )
+    return client
+
+# Function to get the async OpenAI client, building it on first use
+def get_async_client():
+    """
+    Returns the AsyncOpenAI client, building both clients the first time.
+    """
+    get_client()
+    return async_client
+
+if first_load:
+    # Event loop reused across turns so the async client can keep its connections open
+    turn_loop = asyncio.new_event_loop()
+
+    # Local pre-classifier that answers obvious code update checks without calling the remote model
+    intent_classifier = CodeUpdateClassifier(threshold=LOCAL_INTENT_THRESHOLD)
+
+    # Cache for the deterministic helper prompts (code update check, requirements, version)
+    response_cache = ResponseCache(RESPONSE_CACHE_FILE, ttl=RESPONSE_CACHE_TTL, max_entries=RESPONSE_CACHE_MAX_ENTRIES)
+
+    # Latency, token and cost of the latest API calls, for /stats
+    telemetry = Telemetry(TELEMETRY_FILE, capacity=TELEMETRY_CAPACITY, prices=MODEL_PRICES)
+
+    background_phases = []  # (phase, seconds) for startup work moved to background threads
+
+# Function to run a startup task in the background and record how long it took
+def run_in_background(name, function):
+    """
+    Starts function on a daemon thread; its duration is recorded for the startup profile.
+    """
+    def run():
+        start = time.perf_counter()
+        try:
+            function()
+        except Exception as e:
+            logging.error(f"Background startup task '{name}' failed: {e}")
+        background_phases.append((name, time.perf_counter() - start))
+        logging.info(f"Background startup task '{name}' finished in {time.perf_counter() - start:.3f}s.")
+    threading.Thread(target=run, name=name, daemon=True).start()
+
+if first_load:
+    # Import openai and build the clients while the user types the first message
+    run_in_background("openai import and API clients", get_client)
+    # Train the intent classifier from past logs without delaying the first prompt
+    run_in_background("intent classifier training", intent_classifier.train_from_logs)
+
+# Utility functions for output
+def say(message):
+    print(f"Assistant: {message}")
+
+def info(message):
+    if DEBUG_MODE:
+        print(f"# {message}")
+
+# Whether a streamed reply is currently being printed
+if first_load:
+    stream_line_open = False
+
+def say_stream(chunk):
+    """
+    Prints one chunk of a streamed reply, starting the line on the first chunk.
+    """
+    global stream_line_open
+    if not stream_line_open:
+        print("Assistant: ", end="", flush=True)
+        stream_line_open = True
+    print(chunk, end="", flush=True)
+
+def say_stream_end():
+    """
+    Finishes the line of a streamed reply.
+    """
+    global stream_line_open
+    if stream_line_open:
+        print()
+        stream_line_open = False
+
+if first_load:
+    # Files written by the assistant; commits stage only these (and tracked files edited by hand)
+    change_tracker = ChangeTracker(CHANGE_MANIFEST_FILE)
+
+    # Background worker that owns the repository object and performs all git commits and pushes
+    git_worker = GitWorker('.', notify=info, tracker=change_tracker)
+    atexit.register(git_worker.stop)
+
+# Function to commit changes to git using GitPython
+def git_commit(commit_message):
+    """
+    Queues a commit of all changes in the current directory with the provided commit message.
+    The commit and push happen on the background git worker; failures are reported with info().
+    """
+    git_worker.commit(commit_message)
+    logging.info(f"Queued git commit: {commit_message}")
+    info("Assistant has queued a git commit and push.")
+
+# Function to automatically commit uncommitted changes at startup
+def auto_git_commit():
+    """
+    Queues a commit of any uncommitted changes at script startup.
+    """
+    git_worker.commit("Auto-commit uncommitted changes at startup.", only_if_dirty=True)
+    info("Assistant is checking for uncommitted changes in the background.")
+
+# Function to update or create readme.md with the provided content
+def update_readme(content):
+    """
+    Updates the readme.md file with the assistant's explanations and recent changes.
+    """
+    with open('readme.md', 'w') as f:
+        f.write(content)
+    change_tracker.track('readme.md')
+    logging.info("readme.md has been updated.")
+    info("Assistant has updated readme.md.")
+
+# Paged reader that keeps handles to the files the assistant is reading
+if first_load:
+    file_reader = FileReader(page_bytes=READ_PAGE_BYTES, max_bytes=READ_MAX_BYTES)
+
+# Function to describe why a file could not be read
+def read_error(file_path, error):
+    """
+    Logs the error and returns the message for the assistant: a directory or a permission problem is named as
+    such, anything else with the operating system's description.
+    """
+    logging.warning(f"Could not read '{file_path}': {error}")
+    if isinstance(error, IsADirectoryError):
+        return f"Error: '{file_path}' is a directory, not a file."
+    if isinstance(error, PermissionError):
+        return f"Error: permission denied reading '{file_path}'."
+    return f"Error: could not read '{file_path}': {error.strerror or error}."
+
+# Function to read the contents of a file
+def read_file(file_path, mode="page", start=None, end=None):
+    """
+    Reads part of a file given its path: a page (default the first), 'bytes' A-B, 'lines' A-B, 'head' N or 'tail' N.
+    Returns a compact preview with a handle for paging, or an error message if the file cannot be read.
+    """
+    try:
+        result = file_reader.read_path(file_path, mode, start, end)
+    except FileNotFoundError:
+        logging.warning(f"File '{file_path}' does not exist.")
+        info(f"Assistant attempted to read non-existent file '{file_path}'")
+        return f"Error: the file '{file_path}' does not exist."
+    except OSError as e:
+        return read_error(file_path, e)
+    logging.info(f"Read {result['description']} of '{file_path}' (bytes {result['start']}-{result['end']} of {result['size']}).")
+    info(f"Assistant is reading the file {file_path} ({result['description']})")
+    return format_result(result, tool_calling=USE_TOOL_CALLING)
+
+# Function to read another page of a file that was opened with read_file
+def read_page(handle_id, which="next"):
+    """
+    Reads the next, previous or a numbered page of a file handle returned by read_file.
+    Returns the preview, or an error message if the handle is unknown or the file no longer exists.
+    """
+    if isinstance(which, str) and which.isdigit():
+        which = int(which)
+    try:
+        result = file_reader.page(handle_id, which)
+    except (KeyError, FileNotFoundError):
+        logging.warning(f"Unknown or deleted file handle '{handle_id}'.")
+        return f"Error: the file handle '{handle_id}' is unknown or its file no longer exists."
+    except OSError as e:
+        return read_error(file_reader.get(handle_id).path, e)
+    logging.info(f"Read {result['description']} of '{result['path']}' through handle {handle_id}.")
+    info(f"Assistant is reading {result['description']} of {result['path']}")
+    return format_result(result, tool_calling=USE_TOOL_CALLING)
+
+# Function to list files in the current directory
+def list_files():
+    """
+    Lists files in the current directory.
+    """
+    files = os.listdir('.')
+    logging.info("Listed files in the current directory.")
+    info("Assistant is listing files in the current directory.")
+    return files
+
+if first_load:
+    # Warm Python workers for scripts and tests, started in the background so startup is not delayed
+    worker_pool = WorkerPool(size=WORKER_POOL_SIZE, max_jobs=WORKER_MAX_JOBS)
+    atexit.register(worker_pool.stop)
+    if USE_WORKER_POOL:
+        run_in_background("worker pool", worker_pool.start)
+    if not CAN_FORK:
+        logging.info("Fork is not available; every script and test file runs in a new Python process.")
+    # Workers for running the test suite in parallel, started the first time it runs
+    test_pool = WorkerPool(size=TEST_WORKERS, max_jobs=WORKER_MAX_JOBS)
+    atexit.register(test_pool.stop)
+
+# Function to run a Python script with the script limits, on a warm worker if the pool is enabled
+def execute_python(script_name, pool=None, **kwargs):
+    """
+    Runs the script with SCRIPT_WALL_TIMEOUT, SCRIPT_CPU_SECONDS and SCRIPT_MEMORY_BYTES unless other limits
+    are given and returns a RunResult.
+    pool: WorkerPool to use instead of worker_pool.
+    Other keyword arguments (args, cwd, on_output, on_line, max_output_bytes) are passed to the runner.
+    """
+    runner = (pool or worker_pool).run if USE_WORKER_POOL else run_sandboxed
+    kwargs.setdefault("wall_timeout", SCRIPT_WALL_TIMEOUT)
+    kwargs.setdefault("cpu_seconds", SCRIPT_CPU_SECONDS)
+    kwargs.setdefault("memory_bytes", SCRIPT_MEMORY_BYTES)
+    return runner(script_name, **kwargs)
+
+# Function to get the file in the 'test_log' folder for the output of a test file
+def test_log_path(test_file):
+    """
+    Returns 'test_log/<name>_results_<date>.test', creating the folder if needed.
+    """
+    if not os.path.exists('test_log'):
+        os.makedirs('test_log')  # Create test_log directory if it doesn't exist
+    date_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+    base_name = os.path.splitext(os.path.basename(test_file))[0]
+    output_file = f"test_log/{base_name}_results_{date_str}.test"
+    change_tracker.track(output_file)
+    return output_file
+
+# Function to run tests from a test file
+def run_tests(test_file):
+    """
+    Executes a Python test file, writing the full output to a file in the 'test_log' folder while it runs.
+    Returns the pass/fail counts and excerpts of the failing tests, or the end of the output if no
+    unittest or pytest summary was found.
+    """
+    output_file = test_log_path(test_file)
+    file_result = run_test_file(test_file, execute_python, output_file, max_output_bytes=SCRIPT_MAX_OUTPUT_BYTES)
+    if file_result.passed:
+        logging.info(f"Tests in '{test_file}' have been executed successfully. Results saved to '{output_file}'.")
+        info(f"Assistant has executed tests in '{test_file}' and saved results to '{output_file}'.")
+    else:
+        logging.error(f"An error occurred while running tests in '{test_file}'. Check '{output_file}' for details.")
+        info(f"Assistant encountered an error while running tests in '{test_file}'. See '{output_file}' for details.")
+
+    parser = file_result.parser
+    report = f"Tests in '{test_file}' {file_result.result.summary()}. Full output: '{output_file}'."
+    if not parser.found_summary():
+        return f"{report}\nNo test summary found; output:\n{file_result.result.output}"
+    report += f"\n{parser.framework}: {parser.summary()}"
+    excerpts = parser.failure_excerpts()
+    if excerpts:
+        report += f"\n\nFailures:\n{excerpts}"
+    return report
+
+# Function to run all test files in parallel
+def run_all_tests(directory='.'):
+    """
+    Runs every test file matching TEST_FILE_PATTERN in the directory, TEST_WORKERS at a time.
+    Returns the totals, per-file durations and excerpts of the failures.
+    """
+    test_files = discover_tests(directory, TEST_FILE_PATTERN)
+    info(f"Assistant is running {len(test_files)} test files on {min(TEST_WORKERS, len(test_files))} workers.")
+    results, wall_time = run_parallel(
+        test_files,
+        lambda path, **kwargs: execute_python(path, pool=test_pool, **kwargs),
+        workers=TEST_WORKERS,
+        log_path_for=test_log_path,
+        max_output_bytes=SCRIPT_MAX_OUTPUT_BYTES
+    )
+    report = format_report(results, wall_time)
+    logging.info(f"Test suite results:\n{report}")
+    return report
+
+# Function to record one API call in the telemetry and the log
+def record_api_call(call_type, model, start, ttft=None, usage=None, status="ok"):
+    """
+    Adds an API call that started at start (time.perf_counter()) to the telemetry and logs it as a structured
+    record with its call type, model, latency, time to first token, token counts and cost.
+    """
+    call = telemetry.record(
+        call_type,
+        model,
+        time.perf_counter() - start,
+        ttft=ttft,
+        prompt_tokens=getattr(usage, "prompt_tokens", None),
+        completion_tokens=getattr(usage, "completion_tokens", None),
+        cost=getattr(usage, "cost", None),  # OpenRouter reports the cost when usage accounting is on
+        status=status
+    )
+    logging.info(
+        f"API call '{call_type}' to {model}: {status} in {call['wall'] * 1000:.0f} ms.",
+        extra={
+            "call_type": call_type,
+            "model": model,
+            "latency_ms": round(call["wall"] * 1000, 1),
+            "ttft_ms": None if ttft is None else round(ttft * 1000, 1),
+            "prompt_tokens": call["prompt_tokens"],
+            "completion_tokens": call["completion_tokens"],
+            "cost": call["cost"],
+        }
+    )
+
+# Function to record a completed request, or wrap a streamed one so it is recorded when the stream ends
+def recorded_response(response, label, model, start, stream, measure):
+    """
+    Returns the response after recording it in the telemetry. A streamed response is wrapped with measure
+    (measure_stream or measure_stream_async), which records it when the stream ends.
+    """
+    if stream:
+        return measure(
+            response, start, lambda ttft, usage, status: record_api_call(label, model, start, ttft, usage, status)
+        )
+    record_api_call(label, model, start, usage=response.usage)
+    return response
+
+# Function to send a chat completion request
+def create_completion(call_type, label=None, **kwargs):
+    """
+    Sends a chat completion request with the timeout for its call type (a key of REQUEST_TIMEOUTS),
+    retrying transient errors with jittered backoff. The call is recorded in the telemetry under label
+    (default the call type); a streamed response is recorded when the stream ends.
+    """
+    from transport import call_with_retries
+    label = label or call_type
+    model = kwargs.get("model")
+    start = time.perf_counter()
+    try:
+        response = call_with_retries(
+            get_client().chat.completions.create,
+            attempts=API_RETRY_ATTEMPTS,
+            timeout=REQUEST_TIMEOUTS[call_type],
+            **kwargs
+        )
+    except Exception:
+        record_api_call(label, model, start, status="error")
+        raise
+    return recorded_response(response, label, model, start, kwargs.get("stream"), measure_stream)
+
+# Async version of create_completion used by the turn pipeline
+async def create_completion_async(call_type, label=None, **kwargs):
+    """
+    Sends a chat completion request with the async client, the timeout for its call type and retries,
+    recording it in the telemetry like create_completion.
+    """
+    from transport import call_with_retries_async
+    label = label or call_type
+    model = kwargs.get("model")
+    start = time.perf_counter()
+    try:
+        response = await call_with_retries_async(
+            get_async_client().chat.completions.create,
+            attempts=API_RETRY_ATTEMPTS,
+            timeout=REQUEST_TIMEOUTS[call_type],
+            **kwargs
+        )
+    except asyncio.CancelledError:
+        record_api_call(label, model, start, status="cancelled")
+        raise
+    except Exception:
+        record_api_call(label, model, start, status="error")
+        raise
+    return recorded_response(response, label, model, start, kwargs.get("stream"), measure_stream_async)
+
+# Function to store the reply of a helper request in the response cache
+def cache_helper_reply(model, messages, response):
+    """
+    Returns the stripped text of the helper response after storing it in the response cache.
+    """
+    helper_response = response.choices[0].message.content.strip()
+    response_cache.put(model, messages, helper_response)
+    return helper_response
+
+# Function to get a helper reply, answered from the response cache when possible
+def helper_completion(messages, model="openai/gpt-4o", label="helper"):
+    """
+    Returns the stripped reply of a helper prompt, using the on-disk response cache.
+    label: name of the call in the telemetry.
+    """
+    cached = response_cache.get(model, messages)
+    if cached is not None:
+        return cached
+    response = create_completion(
+        "helper",
+        label=label,
+        model=model,
+        messages=messages
+    )
+    return cache_helper_reply(model, messages, response)
+
+# Async version of helper_completion used by the turn pipeline
+async def helper_completion_async(messages, model="openai/gpt-4o", label="helper"):
+    """
+    Returns the stripped reply of a helper prompt using the async client and the on-disk response cache.
+    """
+    cached = response_cache.get(model, messages)
+    if cached is not None:
+        return cached
+    response = await create_completion_async(
+        "helper",
+        label=label,
+        model=model,
+        messages=messages
+    )
+    return cache_helper_reply(model, messages, response)
+
+# Function to collect the text and tool calls of a streamed reply
+def accumulate_chunk(chunk, parts, tool_calls, on_chunk):
+    """
+    Adds one streamed chunk to the text parts and tool calls collected so far, passing new text to on_chunk.
+    """
+    if not chunk.choices:
+        return
+    delta = chunk.choices[0].delta
+    if delta.content:
+        parts.append(delta.content)
+        on_chunk(delta.content)
+    for call in delta.tool_calls or []:
+        entry = tool_calls.setdefault(call.index, {"id": None, "type": "function", "function": {"name": "", "arguments": ""}})
+        if call.id:
+            entry["id"] = call.id
+        if call.function is not None:
+            entry["function"]["name"] += call.function.name or ""
+            entry["function"]["arguments"] += call.function.arguments or ""
+
+# Function to build the assistant message that is added to the conversation
+def assistant_message(content, tool_calls=None):
+    """
+    Returns the assistant message with its text and, if any, the tool calls it requested.
+    """
+    message = {"role": "assistant", "content": (content or "").strip()}
+    if tool_calls:
+        message["tool_calls"] = tool_calls
+    logging.info(f"Assistant response: {message['content']}")
+    for tool_call in tool_calls or []:
+        logging.info(f"Assistant tool call: {tool_call['function']['name']}({tool_call['function']['arguments']})")
+    return message
+
+# Function to get the arguments for the reply request
+def reply_arguments(conversation):
+    """
+    Returns the keyword arguments of a reply request, including the tool definitions when tool calling is enabled.
+    """
+    arguments = {"model": "openai/gpt-4o", "messages": conversation}
+    if USE_TOOL_CALLING:
+        arguments["tools"] = tool_registry.schemas()
+    return arguments
+
+# Function to build the assistant message of a reply that was not streamed
+def response_message(response):
+    """
+    Returns the assistant message with the text and tool calls of a complete reply.
+    """
+    message = response.choices[0].message
+    return assistant_message(message.content, [call.model_dump() for call in message.tool_calls or []])
+
+# Function to build the assistant message of a streamed reply
+def streamed_message(parts, tool_calls):
+    """
+    Returns the assistant message from the text parts and tool calls collected by accumulate_chunk.
+    """
+    return assistant_message("".join(parts), [tool_calls[index] for index in sorted(tool_calls)])
+
+# Function to continue the conversation normally
+def continue_conversation(conversation, on_chunk=None):
+    """
+    Gets the assistant's reply in normal conversation.
+    If on_chunk is given, the reply is streamed and each text chunk is passed to it as it arrives.
+    Returns the assistant message: {"role": "assistant", "content": ...} plus "tool_calls" if tools were requested.
+    """
+    if on_chunk is None:
+        return response_message(create_completion("reply", **reply_arguments(conversation)))
+    stream = create_completion(
+        "reply", stream=True, stream_options={"include_usage": True}, **reply_arguments(conversation)
+    )
+    parts = []
+    tool_calls = {}
+    for chunk in stream:
+        accumulate_chunk(chunk, parts, tool_calls, on_chunk)
+    return streamed_message(parts, tool_calls)
+
+# Async version of continue_conversation used by the turn pipeline
+async def continue_conversation_async(conversation, on_chunk=None):
+    """
+    Gets the assistant's reply in normal conversation using the async client.
+    If on_chunk is given, the reply is streamed and each text chunk is passed to it as it arrives.
+    Returns the assistant message like continue_conversation.
+    """
+    if on_chunk is None:
+        return response_message(await create_completion_async("reply", **reply_arguments(conversation)))
+    stream = await create_completion_async(
+        "reply", stream=True, stream_options={"include_usage": True}, **reply_arguments(conversation)
+    )
+    parts = []
+    tool_calls = {}
+    async for chunk in stream:
+        accumulate_chunk(chunk, parts, tool_calls, on_chunk)
+    return streamed_message(parts, tool_calls)
+
+# Function to keep only the user and assistant text of a list of messages
+def plain_messages(messages):
+    """
+    Returns the user and assistant messages that have text, without tool calls or tool results.
+    Helper prompts use this so a window never starts with a tool result that lost its tool call.
+    """
+    return [
+        {"role": message["role"], "content": message["content"]}
+        for message in messages
+        if message["role"] in ("user", "assistant") and message.get("content")
+    ]
+
+# Function to fold older messages into the running conversation summary
+def summarize_conversation(previous_summary, messages):
+    """
+    Uses an AI helper to extend the running summary with messages that left the context window.
+    Returns the updated summary text.
+    """
+    transcript = "\n".join(
+        f"{message['role']}: {message.get('content') or ''}"
+        + "".join(f" [calls {call['function']['name']}]" for call in message.get("tool_calls", []))
+        for message in messages
+    )
+    summary_prompt = f"""Current summary:
+
+{previous_summary or "(empty)"}
+
+New messages:
+
+{transcript}
+"""
+    logging.info(f"Summarizing {len(messages)} messages that left the context window.")
+    info("Assistant is summarizing older messages.")
+    response = create_completion(
+        "helper",
+        label="summary",
+        model="openai/gpt-4o",
+        messages=[
+            {"role": "system", "content": "Update the summary of a conversation with the new messages. Keep facts, decisions, file names and open tasks. Reply with the updated summary only, in under 300 words."},
+            {"role": "user", "content": summary_prompt}
+        ]
+    )
+    summary = response.choices[0].message.content.strip()
+    logging.info(f"Conversation summary: {summary}")
+    return summary
+
+# Context window that keeps reply requests under CONTEXT_TOKEN_BUDGET; its rolling summary survives a reload
+if first_load:
+    context_window = ContextWindow(
+        CONTEXT_TOKEN_BUDGET,
+        summarize_conversation,
+        min_recent_messages=CONTEXT_MIN_RECENT_MESSAGES
+    )
+context_window.summarize = summarize_conversation
+
+# Function to get the assistant's reply and show it to the user
+def respond(conversation):
+    """
+    Gets the assistant's reply and says it, streaming it if STREAM_RESPONSES is enabled.
+    Returns the assistant message.
+    """
+    messages = context_window.build(conversation)
+    if STREAM_RESPONSES:
+        message = continue_conversation(messages, on_chunk=say_stream)
+        say_stream_end()
+    else:
+        message = continue_conversation(messages)
+        if message["content"]:
+            say(message["content"])
+    return message
+
+# Function to run the tools the assistant called and get its follow-up replies
+def run_tool_calls(conversation, message):
+    """
+    Executes the tool calls of the assistant message, adds the results to the conversation and asks for
+    the follow-up reply, repeating while the assistant keeps calling tools (at most TOOL_MAX_ROUNDS times).
+    Returns the last assistant message.
+    """
+    rounds = 0
+    while message.get("tool_calls") and rounds < TOOL_MAX_ROUNDS:
+        rounds += 1
+        for tool_call in message["tool_calls"]:
+            info(f"Assistant is calling {tool_call['function']['name']}({tool_call['function']['arguments']})")
+        results = tool_registry.execute_tool_calls(message["tool_calls"])
+        for result in results:
+            logging.info(f"Tool result for {result['tool_call_id']}: {result['content']}")
+        conversation.extend(results)
+        message = respond(conversation)
+        conversation.append(message)
+    return message
+
+# Function to run the text commands of an assistant reply when tool calling is off
+def run_text_commands(conversation, message):
+    """
+    Runs every command in the reply (reads concurrently, writes and scripts in order), sends all results back
+    in a single follow-up message and asks for the next reply, repeating while the assistant keeps issuing
+    commands (at most TOOL_MAX_ROUNDS times).
+    Returns the last assistant message, or None if the first reply contained no commands.
+    """
+    rounds = 0
+    while rounds < TOOL_MAX_ROUNDS:
+        results = command_executor.run(message.get("content") or "")
+        if not results:
+            break
+        rounds += 1
+        for command_text, result in results:
+            logging.info(f"Command result for {command_text}: {result}")
+            say(f"{command_text}\n{result}")
+        conversation.append({
+            "role": "system",
+            "content": "Results of the commands in your last reply:\n\n" + "\n\n".join(
+                f"{command_text}\n{result}" for command_text, result in results
+            ),
+        })
+        message = respond(conversation)
+        conversation.append(message)
+    return message if rounds else None
+
+# Function to build the prompt for the code update check
+def build_code_update_prompt(conversation):
+    """
+    Returns the helper messages used to check if the user wants to update the code.
+    """
+    return [
+        {"role": "system", "content": "Return '1' if the user is asking to update the code with new features, otherwise return '0'."},
+    ] + plain_messages(conversation)[-CONVERSATION_WINDOW_FOR_CODE_UPDATE:]  # Include last N messages
+
+# Function to check if the user wants to update the code, run by the turn pipeline
+async def check_for_code_update_async(conversation):
+    """
+    Uses an AI assistant to check if the user wants to update the code using the async client.
+    Obvious non-update turns are decided by the local classifier without a request.
+    Returns True if code update is requested, False otherwise.
+    """
+    local_decision = intent_classifier.classify(conversation)
+    if local_decision is not None:
+        return local_decision
+    helper_prompt = build_code_update_prompt(conversation)
+    logging.info("Checking if code update is needed.")
+    info("Assistant is checking if code update is needed.")
+    helper_response = await helper_completion_async(helper_prompt, label="update_check")
+    logging.info(f"Helper response: {helper_response}")
+    code_update_needed = '1' in helper_response
+    intent_classifier.learn(conversation[-1]["content"], code_update_needed)
+    return code_update_needed
+
+# Helper to time a coroutine so the turn pipeline can report savings
+async def timed(coroutine):
+    """
+    Awaits the coroutine and returns its result together with the elapsed seconds.
+    """
+    start = time.perf_counter()
+    result = await coroutine
+    return result, time.perf_counter() - start
+
+# Function to run one user turn with the intent check and the reply in parallel
+async def run_turn(conversation):
+    """
+    Fires the code update check and the normal reply at the same time.
+    Returns (code_update_needed, reply message). The reply is cancelled when an update is detected.
+    With STREAM_RESPONSES, chunks are held back until the check is done and then said as they arrive.
+    """
+    turn_start = time.perf_counter()
+    chunks = asyncio.Queue()
+
+    async def reply():
+        try:
+            # Building the window may summarize older turns, so it runs in a thread alongside the check
+            messages = await asyncio.to_thread(context_window.build, conversation)
+            on_chunk = chunks.put_nowait if STREAM_RESPONSES else None
+            return await continue_conversation_async(messages, on_chunk=on_chunk)
+        finally:
+            chunks.put_nowait(None)  # Marks the end of the stream
+
+    check_task = asyncio.create_task(timed(check_for_code_update_async(conversation)))
+    reply_task = asyncio.create_task(timed(reply()))
+    try:
+        code_update_needed, check_time = await check_task
+    except BaseException:
+        reply_task.cancel()
+        raise
+
+    if code_update_needed:
+        # The speculative reply is not needed when the user wants a code update
+        reply_task.cancel()
+        try:
+            await reply_task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logging.warning(f"Discarded reply failed: {e}")
+        logging.info(f"Turn pipeline: update detected after {check_time:.3f}s, reply discarded.")
+        return True, None
+
+    if STREAM_RESPONSES:
+        # Say what arrived while the check was running, then the rest of the stream
+        while (chunk := await chunks.get()) is not None:
+            say_stream(chunk)
+        say_stream_end()
+    reply, reply_time = await reply_task
+    wall_time = time.perf_counter() - turn_start
+    serial_time = check_time + reply_time
+    logging.info(
+        f"Turn pipeline: check {check_time:.3f}s, reply {reply_time:.3f}s, "
+        f"wall {wall_time:.3f}s, saved {serial_time - wall_time:.3f}s versus serial."
+    )
+    return False, reply
+
+# Function to get the new requirements from the conversation
+def get_requirements(conversation, last_update_index):
+    """
+    Uses an AI assistant to extract a list of requirements added since the last update.
+    Returns the requirements as a string.
+    """
+    # Prepare the messages for the requirements assistant
+    recent_conversation = plain_messages(conversation[last_update_index:])  # Messages since last update
+    requirements_prompt = [
+        {"role": "system", "content": "List the new requirements added since the last code update."},
+    ] + recent_conversation
+    logging.info("Extracting new requirements.")
+    info("Assistant is extracting new requirements.")
+    # Call the requirements assistant
+    requirements_response = helper_completion(requirements_prompt, label="requirements")
+    logging.info(f"Requirements extracted: {requirements_response}")
+    return requirements_response
+
+# Function to get the new version number using semantic versioning
+def get_new_version(current_version, requirements):
+    """
+    Uses an AI helper to determine the new version number based on the changes.
+    Returns the new version number as a string.
+    """
+    # Prepare the prompt for the version assistant, include details about the changes
+    version_prompt = f"""The current version is {current_version}. Based on the recent changes described below, determine the next version number following semantic versioning and explain your reasoning.
+
+Recent changes:
+
+{requirements}
+
+"""
+    logging.info("Determining new version number.")
+    info("Assistant is determining new version number.")
+    # Call the version assistant
+    assistant_response = helper_completion([
+        {"role": "system", "content": "Determine the next version number following semantic versioning and explain your reasoning."},
+        {"role": "user", "content": version_prompt}
+    ], label="version")
+    logging.info(f"Assistant response: {assistant_response}")
+    # Extract version number and reasoning
+    lines = assistant_response.split('\n', 1)
+    new_version_line = lines[0]
+    reasoning = lines[1] if len(lines) > 1 else ""
+    # Extract new version number from the first line
+    new_version_match = re.search(r'(\d+\.\d+\.\d+)', new_version_line)
+    if new_version_match:
+        new_version = new_version_match.group(1)
+    else:
+        new_version = current_version  # Fallback to current version if not found
+    # Assistant should say: Assistant decided on version x.y.z because {{reasons_here}}
+    info(f"Assistant decided on version {new_version} because {reasoning}")
+    return new_version
+
+# Function to ask the code update model for the complete updated file
+def request_full_code_update(requirements, current_code):
+    """
+    Sends the whole script to the code update model and returns the complete updated code.
+    """
+    # Prepare the prompt for the code update
+    code_update_prompt = f"""Update the following code according to the requirements below:
+
+Requirements:
+
+{requirements}
+
+Code:
+
+{current_code}
+
+Please provide the updated code and only the code."""
+
+    logging.info("Requesting code update from AI assistant.")
+
+    # Send the prompt to the code update model
+    code_response = create_completion(
+        "code_update",
+        label="code_update_full",
+        model="openai/o1-preview",
+        messages=[
+            {"role": "system", "content": "You are a helpful assistant that updates code based on requirements."},
+            {"role": "user", "content": code_update_prompt}
+        ]
+    )
+
+    updated_code = code_response.choices[0].message.content.strip()
+    # Remove any markdown code blocks if present
+    updated_code = re.sub(r'^```(?:python)?\n(.*?)\n```$', r'\1', updated_code, flags=re.DOTALL)
+    logging.info("Received updated code from AI assistant.")
+    return updated_code
+
+# Function to ask the code update model for a diff and apply it locally
+def request_patch_code_update(requirements, script_filename, current_code):
+    """
+    Asks the code update model for a unified diff, applies it to the current code and checks that it compiles.
+    Raises PatchError or SyntaxError if the diff cannot be used.
+    """
+    file_name = os.path.basename(script_filename)
+    logging.info("Requesting code update diff from AI assistant.")
+    code_response = create_completion(
+        "code_update",
+        label="code_update_diff",
+        model="openai/o1-preview",
+        messages=[
+            {"role": "system", "content": "You are a helpful assistant that updates code based on requirements and replies with unified diffs."},
+            {"role": "user", "content": build_patch_prompt(requirements, file_name, current_code)}
+        ]
+    )
+    diff_text = code_response.choices[0].message.content.strip()
+    logging.info(f"Received code update diff from AI assistant:\n{diff_text}")
+    updated_code = apply_patch(current_code, diff_text, file_name)
+    logging.info("Applied the code update diff and compiled the result.")
+    return updated_code
+
+# Function to get the updated code according to SELF_UPDATE_MODE
+def request_code_update(requirements, script_filename, current_code):
+    """
+    Returns the updated code, preferring a diff and falling back to the complete file if the diff cannot be applied.
+    """
+    if SELF_UPDATE_MODE == "diff":
+        try:
+            return request_patch_code_update(requirements, script_filename, current_code)
+        except (PatchError, SyntaxError) as e:
+            logging.warning(f"Diff-based code update failed, requesting the complete file instead: {e}")
+            info(f"Assistant could not apply the code update diff ({e}), requesting the complete file instead.")
+    return request_full_code_update(requirements, current_code)
+
+# Function to check updated code before it is installed
+def validate_code_update(updated_code, script_filename, entry_script):
+    """
+    Compiles the updated version of script_filename, starts entry_script with it without network access
+    and runs the tests against it on the test workers. Returns a ValidationResult.
+    """
+    info("Assistant is validating the updated code: compile, start without network access, run the tests.")
+    validation = validate_update(
+        updated_code,
+        script_filename,
+        lambda path, **kwargs: execute_python(path, pool=test_pool, **kwargs),
+        test_pattern=TEST_FILE_PATTERN,
+        import_timeout=UPDATE_STARTUP_TIMEOUT,
+        test_workers=TEST_WORKERS,
+        entry_script=entry_script
+    )
+    logging.info(f"Validation of the updated code ({validation.stage}):\n{validation.report}")
+    return validation
+
+# Function to write a new script
+def write_script(script_name, script_code):
+    """
+    Writes a new script with the given name and code.
+    """
+    with open(script_name, 'w') as f:
+        f.write(script_code)
+    change_tracker.track(script_name)
+    logging.info(f"New script '{script_name}' has been written.")
+    info(f"Assistant has written a new script '{script_name}'.")
+    return f"Script '{script_name}' has been written."
+
+# Function to run a script
+def run_script(script_name):
+    """
+    Runs the script with the given name in a child process with time and memory limits, showing its output live.
+    Returns the exit status, duration, peak memory and captured output.
+    """
+    if not os.path.isfile(script_name):
+        return f"Script '{script_name}' does not exist."
+    info(f"Assistant is running the script '{script_name}':")
+    try:
+        result = execute_python(
+            script_name,
+            max_output_bytes=SCRIPT_MAX_OUTPUT_BYTES,
+            on_output=lambda line: info(f"  {line}")
+        )
+    except OSError as e:
+        logging.error(f"Could not start script '{script_name}': {e}")
+        return f"Script '{script_name}' could not be started: {e}"
+    logging.info(f"Script '{script_name}' {result.summary()}.")
+    if result.returncode == 0:
+        info(f"Assistant has executed the script '{script_name}'.")
+    else:
+        info(f"Assistant encountered an error while running script '{script_name}': it {result.summary()}.")
+    return f"Script '{script_name}' {result.summary()}.\nOutput:\n{result.output}"
+
+# Set when the code on disk changed; the chat loop then reloads this module, or restarts, after the turn
+if first_load:
+    code_changed = False
+
+# Function for self-upgrade
+def self_upgrade():
+    """
+    Function to update the assistant's code by pulling the latest changes from the git repository.
+    The new code is loaded after the current turn.
+    """
+    global code_changed
+    try:
+        # Fetch remote changes on the git worker, after any pending commits
+        git_worker.call(lambda repo: repo.remote(name='origin').pull())
+        logging.info("Assistant has been upgraded to the latest version.")
+        say("Assistant has been upgraded to the latest version.")
+        code_changed = True
+        return "Pulled the latest version; it is loaded after this turn."
+    except Exception as e:
+        logging.error(f"Self-upgrade failed: {e}")
+        say(f"Self-upgrade failed: {e}")
+        return f"Self-upgrade failed: {e}"
+
+# Files rewritten by self-updates: this module, which is reloaded without restarting, and the chat loop in
+# chatbot.py, which load_code_changes() in chatbot.py loads by asking to restart. The other modules only change
+# through self_upgrade (git pull) or by hand.
+update_target = os.path.relpath(os.path.abspath(__file__))
+chat_loop_target = os.path.relpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chatbot.py'))
+
+# Versions of the update targets: proposed updates and the code each installed update replaced
+if first_load:
+    backup_store = BackupStore(
+        BACKUP_DIR,
+        snapshot_every=BACKUP_SNAPSHOT_EVERY,
+        keep_versions=BACKUP_KEEP_VERSIONS,
+        keep_days=BACKUP_KEEP_DAYS,
+        on_write=change_tracker.track
+    )
+    script_installer = ScriptInstaller(update_target, backup_store)
+    chat_loop_installer = ScriptInstaller(chat_loop_target, backup_store)
+    last_installer = None  # Installer of the last update in this session, which rollback_update() undoes
+
+# Function to decide which file a code update changes
+def choose_update_target(requirements):
+    """
+    Uses an AI helper to decide whether the requirements need a change to the chat loop or to this module.
+    Returns (script_filename, ScriptInstaller).
+    """
+    target_prompt = [
+        {"role": "system", "content": f"The assistant's code is split in two files. '{chat_loop_target}' holds the chat loop: reading the user's input, running each turn, the code update flow and restarting. '{update_target}' holds everything else: settings, prompts, API calls and tools. Return '1' if the requirements below can only be met by changing '{chat_loop_target}', otherwise return '0'."},
+        {"role": "user", "content": requirements}
+    ]
+    target_response = helper_completion(target_prompt, label="update_target")
+    if '1' in target_response and os.path.isfile(chat_loop_target):
+        logging.info(f"The code update changes the chat loop in '{chat_loop_target}'.")
+        return chat_loop_target, chat_loop_installer
+    return update_target, script_installer
+
+# Function to install a validated code update
+def install_update(installer, code):
+    """
+    Replaces the installer's script with code, keeping the current version for rollback_update().
+    """
+    global last_installer
+    installer.install(code)
+    change_tracker.track(installer.script_filename)
+    last_installer = installer
+
+# Function to undo the last self-update
+def rollback_update():
+    """
+    Restores the version of the code from before the last self-update and commits it.
+    The restored code is loaded after the current turn; a restored chat loop asks for a restart.
+    """
+    global code_changed, last_installer
+    # After a restart the last installer is not known; the update of this module is undone first
+    installer = last_installer or next(
+        (candidate for candidate in (script_installer, chat_loop_installer) if candidate.can_roll_back()), None
+    )
+    if installer is None or not installer.rollback():
+        return "There is no previous version to roll back to."
+    last_installer = None
+    change_tracker.track(installer.script_filename)
+    git_commit("Rolled back the last code update.")
+    info(f"Assistant has restored the previous version of '{installer.script_filename}'.")
+    code_changed = True
+    return "The previous version has been restored; it is loaded after this turn."
+
+# Function to write a stored version of the code to a file
+def export_backup(version, filename):
+    """
+    Writes backup version number version from the backup store to filename.
+    """
+    entry = backup_store.get(int(version))
+    if entry is None:
+        return f"There is no backup version {version}; the versions are listed in '{backup_store.index_path}'."
+    write_script(filename, backup_store.read(entry["hash"]))
+    return f"Backup version {version} of '{entry['script']}' ({entry['label']}, {entry['time']}) has been written to '{filename}'."
+
+# Function to show the latency, token and cost statistics of the API calls
+def show_stats():
+    """
+    Returns the p50/p95/p99 wall time and time to first token, token totals and cost of the recent API calls
+    by call type.
+    """
+    return telemetry.format_stats()
+
+# Function that asks the user; chat_loop in chatbot.py replaces it with its own, e.g. scripted turns
+if first_load:
+    read_input = input
+
+# Function to ask the user before running a tool that needs approval
+def confirm_tool(name, arguments):
+    """
+    Asks the user to approve a tool call. Returns True if the user typed 'yes'.
+    """
+    say(f"I want to run {name} with {arguments}. Type 'yes' to proceed or anything else to cancel.")
+    permission = read_input("User: ").strip().lower()
+    return permission == "yes"
+
+# Tools the assistant can call through the API
+tool_registry = ToolRegistry(confirm=confirm_tool)
+tool_registry.register(
+    "read_file", read_file,
+    "Read part of a file: a page (default the first), 'bytes' or 'lines' from start to end, or 'head'/'tail' with start lines. "
+    "Returns a preview with a handle for read_page.",
+    {
+        "file_path": {"type": "string"},
+        "mode": {"type": "string", "enum": ["page", "bytes", "lines", "head", "tail"]},
+        "start": {"type": "integer"},
+        "end": {"type": "integer"},
+    },
+    required=["file_path"]
+)
+tool_registry.register(
+    "read_page", read_page,
+    "Read the next, previous or a numbered page of a file opened with read_file.",
+    {
+        "handle_id": {"type": "string"},
+        "which": {"type": "string", "description": "'next', 'prev' or a page number"},
+    },
+    required=["handle_id"]
+)
+tool_registry.register("list_files", list_files, "List the files in the current directory.")
+tool_registry.register(
+    "write_script", write_script,
+    "Write a script file with the given name and code.",
+    {"script_name": {"type": "string"}, "script_code": {"type": "string"}},
+    required=["script_name", "script_code"],
+    mutating=True
+)
+tool_registry.register(
+    "run_script", run_script,
+    "Run a Python script.",
+    {"script_name": {"type": "string"}},
+    required=["script_name"],
+    mutating=True,
+    confirm=True
+)
+tool_registry.register(
+    "run_tests", run_tests,
+    "Run a Python test file and return its output.",
+    {"test_file": {"type": "string"}},
+    required=["test_file"],
+    mutating=True
+)
+tool_registry.register(
+    "run_all_tests", run_all_tests,
+    "Run all test_*.py files in a directory in parallel and return the totals, per-file durations and failures.",
+    {"directory": {"type": "string", "description": "Directory with the test files, default the current one"}},
+    mutating=True
+)
+tool_registry.register(
+    "show_stats", show_stats,
+    "Show latency percentiles, time to first token, token counts and cost of the assistant's API calls by call type."
+)
+tool_registry.register(
+    "export_backup", export_backup,
+    "Write a stored version of the assistant's code to a file; the versions are listed in code_backups/index.json.",
+    {"version": {"type": "integer"}, "filename": {"type": "string"}},
+    required=["version", "filename"],
+    mutating=True
+)
+tool_registry.register(
+    "rollback_update", rollback_update,
+    "Restore the assistant's code from before the last self-update.",
+    mutating=True,
+    confirm=True
+)
+tool_registry.register(
+    "self_upgrade", self_upgrade,
+    "Pull the latest version of the assistant from git and load it.",
+    mutating=True,
+    confirm=True
+)
+
+# Text commands (/read, /ls, /write, ...) found in replies when tool calling is off
+command_executor = CommandExecutor(tool_registry)
+
+# Values of RESTART_SETTINGS the running objects were created with
+if first_load:
+    created_settings = {name: globals()[name] for name in RESTART_SETTINGS}
+
+# Function to replace a worker pool whose size setting changed
+def resized_pool(pool, size):
+    """
+    Returns pool with the current WORKER_MAX_JOBS, or a new pool of the given size if its size differs;
+    the old pool's workers are stopped.
+    """
+    pool.max_jobs = WORKER_MAX_JOBS
+    if pool.size == size:
+        return pool
+    pool.stop()
+    new_pool = WorkerPool(size=size, max_jobs=WORKER_MAX_JOBS)
+    atexit.register(new_pool.stop)
+    return new_pool
+
+# Function to give the objects that survive a reload the settings of the reloaded code
+def apply_settings():
+    """
+    Applies the constants of this version of the module to the objects created on the first load.
+    Returns the names of the RESTART_SETTINGS that changed since then, which only take effect after a restart.
+    """
+    global worker_pool, test_pool
+    context_window.token_budget = CONTEXT_TOKEN_BUDGET
+    context_window.min_recent_messages = CONTEXT_MIN_RECENT_MESSAGES
+    intent_classifier.threshold = LOCAL_INTENT_THRESHOLD
+    response_cache.ttl = RESPONSE_CACHE_TTL
+    response_cache.max_entries = RESPONSE_CACHE_MAX_ENTRIES
+    telemetry.configure(TELEMETRY_CAPACITY, MODEL_PRICES)
+    file_reader.configure(READ_PAGE_BYTES, READ_MAX_BYTES)
+    backup_store.snapshot_every = BACKUP_SNAPSHOT_EVERY
+    backup_store.keep_versions = BACKUP_KEEP_VERSIONS
+    backup_store.keep_days = BACKUP_KEEP_DAYS
+    worker_pool = resized_pool(worker_pool, WORKER_POOL_SIZE)
+    test_pool = resized_pool(test_pool, TEST_WORKERS)
+    if USE_WORKER_POOL and not worker_pool.started:
+        threading.Thread(target=worker_pool.start, name="worker-pool-start", daemon=True).start()
+    changed = [name for name in RESTART_SETTINGS if globals()[name] != created_settings.get(name, globals()[name])]
+    logging.info(f"Applied the reloaded settings; settings that need a restart: {', '.join(changed) or 'none'}.")
+    return changed
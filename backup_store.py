@@ -0,0 +1,202 @@
+import difflib  # For the line deltas between versions
+import hashlib  # For naming blobs by their contents
+import json  # For the index and the blob contents
+import logging  # For logging activities
+import lzma  # For compressing blobs
+import os  # For file paths
+import threading  # For serializing writes from tool threads
+from datetime import datetime, timedelta  # For version timestamps and the retention period
+
+from file_utils import write_atomically  # For writing the index and blobs in one step
+
+
+class BackupStore:
+    """
+    Content-addressed store of script versions.
+    Each distinct content is stored once, as an lzma-compressed blob named by its SHA-256. A blob holds either the
+    full text or the line delta against the previous version of the same script, with a full snapshot every
+    snapshot_every versions so reading a version never applies more than that many deltas.
+    index.json maps version numbers to (script, hash, time, label) and holds named references such as the
+    rollback target of a script, so a version or reference is found with one dictionary lookup.
+    """
+
+    def __init__(self, directory='code_backups', snapshot_every=10, keep_versions=100, keep_days=90, on_write=None):
+        """
+        keep_versions, keep_days: versions beyond the latest keep_versions that are also older than keep_days are
+        pruned after each new version, except those named by a reference.
+        on_write: callable(path) called for every file the store writes, e.g. ChangeTracker.track.
+        """
+        self.directory = directory
+        self.objects_dir = os.path.join(directory, "objects")
+        self.index_path = os.path.join(directory, "index.json")
+        self.snapshot_every = snapshot_every
+        self.keep_versions = keep_versions
+        self.keep_days = keep_days
+        self.on_write = on_write
+        self.lock = threading.RLock()
+        self.versions = []  # Index entries, oldest first
+        self.by_version = {}  # Version number -> index entry
+        self.blobs = {}  # Hash -> {"base": hash or None, "depth": deltas to apply, "size": compressed bytes}
+        self.heads = {}  # Script -> hash of its latest version, the base of the next delta
+        self.refs = {}  # Name -> hash
+        self.next_version = 1
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.error(f"Could not read the backup index '{self.index_path}': {e}")
+            return
+        self.versions = index.get("versions", [])
+        self.blobs = index.get("blobs", {})
+        self.refs = index.get("refs", {})
+        self.next_version = index.get("next_version", len(self.versions) + 1)
+        for entry in self.versions:
+            self.by_version[entry["version"]] = entry
+            self.heads[entry["script"]] = entry["hash"]
+
+    def _write_atomically(self, path, data):
+        write_atomically(path, data)
+        if self.on_write:
+            self.on_write(path)
+
+    def _save_index(self):
+        index = {"next_version": self.next_version, "versions": self.versions, "blobs": self.blobs, "refs": self.refs}
+        self._write_atomically(self.index_path, json.dumps(index, indent=1).encode('utf-8'))
+
+    def blob_path(self, content_hash):
+        return os.path.join(self.objects_dir, content_hash[:2], content_hash[2:] + ".xz")
+
+    def _write_blob(self, content_hash, text, base):
+        """
+        Stores text as a delta against base if that is smaller than the full text, otherwise in full.
+        """
+        full = lzma.compress(json.dumps({"text": text}).encode('utf-8'))
+        data, depth = full, 0
+        if base is not None and self.blobs[base]["depth"] + 1 < self.snapshot_every:
+            base_lines = self.read(base).splitlines(keepends=True)
+            lines = text.splitlines(keepends=True)
+            operations = []
+            matcher = difflib.SequenceMatcher(None, base_lines, lines, autojunk=False)
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+                if tag == "equal":
+                    operations.append([i1, i2])  # Lines copied from the base
+                elif tag != "delete":
+                    operations.append(lines[j1:j2])  # New lines
+            delta = lzma.compress(json.dumps({"base": base, "delta": operations}).encode('utf-8'))
+            if len(delta) < len(full):
+                data, depth = delta, self.blobs[base]["depth"] + 1
+        if depth == 0:
+            base = None
+        self._write_atomically(self.blob_path(content_hash), data)
+        self.blobs[content_hash] = {"base": base, "depth": depth, "size": len(data)}
+
+    def add(self, text, script, label=""):
+        """
+        Records text as a new version of script and returns its index entry. Content that is already stored
+        only adds an index entry.
+        """
+        content_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        with self.lock:
+            if content_hash not in self.blobs:
+                self._write_blob(content_hash, text, self.heads.get(script))
+            entry = {
+                "version": self.next_version,
+                "script": script,
+                "hash": content_hash,
+                "time": datetime.now().isoformat(timespec='seconds'),
+                "label": label,
+            }
+            self.next_version += 1
+            self.versions.append(entry)
+            self.by_version[entry["version"]] = entry
+            self.heads[script] = content_hash
+            self.prune()
+            self._save_index()
+        logging.info(f"Stored version {entry['version']} of '{script}' ({label}) as blob {content_hash[:12]}.")
+        return entry
+
+    def read(self, content_hash):
+        """
+        Returns the text stored under content_hash, applying its chain of deltas.
+        """
+        chain = []
+        with self.lock:
+            while True:
+                with open(self.blob_path(content_hash), 'rb') as f:
+                    blob = json.loads(lzma.decompress(f.read()))
+                if "text" in blob:
+                    break
+                chain.append(blob["delta"])
+                content_hash = blob["base"]
+        lines = blob["text"].splitlines(keepends=True)
+        for operations in reversed(chain):
+            new_lines = []
+            for operation in operations:
+                if isinstance(operation[0], int):
+                    new_lines.extend(lines[operation[0]:operation[1]])
+                else:
+                    new_lines.extend(operation)
+            lines = new_lines
+        return "".join(lines)
+
+    def get(self, version):
+        """
+        Returns the index entry of a version number, or None.
+        """
+        return self.by_version.get(version)
+
+    def latest(self, script, label=None):
+        """
+        Returns the index entry of the latest version of script, optionally with the given label, or None.
+        """
+        for entry in reversed(self.versions):
+            if entry["script"] == script and (label is None or entry["label"] == label):
+                return entry
+        return None
+
+    def set_ref(self, name, content_hash):
+        """
+        Points the reference name at content_hash, or removes it if content_hash is None.
+        """
+        with self.lock:
+            if content_hash is None:
+                self.refs.pop(name, None)
+            else:
+                self.refs[name] = content_hash
+            self._save_index()
+
+    def get_ref(self, name):
+        return self.refs.get(name)
+
+    def prune(self):
+        """
+        Removes versions outside the retention policy and the blobs no kept version or reference needs.
+        Returns the number of blobs removed.
+        """
+        with self.lock:
+            cutoff = (datetime.now() - timedelta(days=self.keep_days)).isoformat(timespec='seconds')
+            recent = {entry["version"] for entry in self.versions[-self.keep_versions:]} if self.keep_versions else set()
+            kept = [entry for entry in self.versions if entry["time"] >= cutoff or entry["version"] in recent]
+            if len(kept) == len(self.versions):
+                return 0
+            self.versions = kept
+            self.by_version = {entry["version"]: entry for entry in kept}
+            # Keep the bases of kept deltas, as well as the kept versions and references themselves
+            needed = set()
+            for content_hash in [entry["hash"] for entry in kept] + list(self.refs.values()) + list(self.heads.values()):
+                while content_hash is not None and content_hash not in needed:
+                    needed.add(content_hash)
+                    content_hash = self.blobs.get(content_hash, {}).get("base")
+            removed = [content_hash for content_hash in self.blobs if content_hash not in needed]
+            for content_hash in removed:
+                del self.blobs[content_hash]
+                path = self.blob_path(content_hash)
+                if os.path.exists(path):
+                    os.remove(path)
+            logging.info(f"Pruned the backups to {len(kept)} versions, removing {len(removed)} blobs.")
+            return len(removed)
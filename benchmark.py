@@ -0,0 +1,445 @@
+# End-to-end benchmark of the chat loop against a local stand-in for the chat completions API.
+# Runs scripted user turns through chatbot.chat_loop() in a scratch directory and reports, per turn, the wall
+# time, the time spent waiting for the API, the local overhead, the number of API round trips and the bytes sent.
+#
+#   python benchmark.py --latency 0.2 --tokens-per-second 60 --output run.json
+#   python benchmark.py --baseline run.json          # compare with an earlier run
+
+import argparse  # For the command line options
+import asyncio  # For the delays of the async stand-in
+import cProfile  # For breaking the local time of a turn down
+import contextlib  # For hiding the assistant's output while the turns run
+import io  # For the hidden output
+import json  # For the request and response bodies and the result files
+import os  # For the scratch directory
+import pstats  # For reading the profiles of the turns
+import shutil  # For removing the scratch directory
+import sys  # For finding the modules of the assistant
+import tempfile  # For the scratch directory
+import threading  # For counting requests from the turn pipeline's threads
+import time  # For timing the turns and simulating latency
+
+import httpx  # For MockTransport and the stand-in's responses
+from openai import AsyncOpenAI, OpenAI  # For the clients the assistant uses
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import structured_log  # For the same logging setup as the chat program
+from telemetry import percentile  # For the summary percentiles
+
+STUB_URL = "http://llm.stub/v1"
+UPDATE_CHECK_PROMPT = "Return '1' if the user is asking to update the code"
+
+# Kinds of local work in a profiled turn, each with markers matched against the source file (or the name of a
+# built-in) of every function; the first category that matches is used. "waiting" is time the chat thread
+# spends in the event loop or blocked on the stand-in's responses or on other threads rather than working.
+PROFILE_CATEGORIES = (
+    ("waiting", ("/asyncio/", "selectors", "threading", "acquire", "sleep", "/benchmark.py", "/replay.py")),
+    ("API client", ("/openai/", "/httpx/", "/httpcore/", "/pydantic", "/anyio/", "/h11/")),
+    ("logging", ("/logging/", "structured_log")),
+    ("git", ("git_worker", "subprocess")),
+    ("file I/O", ("session_store", "backup_store", "telemetry", "response_cache", "_io.", "io.open", "posix",
+                  "/os.py", "genericpath", "shutil", "tempfile", "lzma")),
+    ("parsing", ("/json/", "_json", "/re/", "re.Pattern", "_sre", "command_executor", "intent_classifier",
+                 "file_reader", "patch_update", "difflib")),
+    ("context", ("context_window", "tiktoken")),
+)
+
+# User turns sent when no script file is given
+DEFAULT_TURNS = [
+    "Hi Sam, what can you do?",
+    "Explain the difference between a list and a tuple in Python.",
+    "What is a generator and when should I use one?",
+    "Give me an example of a context manager.",
+    "How do I read a large file line by line?",
+    "What does the GIL mean for threads?",
+    "Summarize what we talked about so far.",
+    "Thanks, that is all for now.",
+]
+
+
+class StubLLM:
+    """
+    Stand-in for the chat completions API, used through httpx.MockTransport by both OpenAI clients.
+    Each response waits latency seconds before its headers and then produces tokens_per_second tokens,
+    streamed as server-sent events when the request asks for a stream. Every request is recorded with its
+    start and end time and the bytes sent and received.
+    """
+
+    def __init__(self, latency=0.2, tokens_per_second=60.0, reply_tokens=30, helper_reply="0"):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.reply_tokens = reply_tokens
+        self.helper_reply = helper_reply
+        self.requests = []  # {"start", "end", "sent", "received", "stream"}
+        self.lock = threading.Lock()
+        self.turn = 0  # Number of the turn being run, set by run_benchmark()
+
+    def answer(self, body):
+        """
+        Returns the text of the reply: helper_reply for the code update check, otherwise reply_tokens words.
+        """
+        system = next((m.get("content") or "" for m in body.get("messages", []) if m.get("role") == "system"), "")
+        if system.startswith(UPDATE_CHECK_PROMPT):
+            return self.helper_reply
+        return " ".join(f"word{index}" for index in range(self.reply_tokens))
+
+    def respond(self, body):
+        """
+        Returns (text of the reply, seconds before the response starts).
+        """
+        return self.answer(body), self.latency
+
+    def _begin(self, request):
+        body = json.loads(request.content or b"{}")
+        record = {"start": time.perf_counter(), "end": None, "sent": len(request.content), "received": 0,
+                  "stream": bool(body.get("stream"))}
+        with self.lock:
+            self.requests.append(record)
+        text, latency = self.respond(body)
+        tokens = [token + " " for token in text.split(" ")]
+        tokens[-1] = tokens[-1].rstrip()
+        usage = {"prompt_tokens": len(request.content) // 4, "completion_tokens": len(tokens),
+                 "total_tokens": len(request.content) // 4 + len(tokens)}
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+        return body, record, tokens, usage, include_usage, latency
+
+    def _completion(self, body, tokens, usage):
+        return json.dumps({
+            "id": "stub", "object": "chat.completion", "created": 0, "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}],
+            "usage": usage,
+        }).encode('utf-8')
+
+    def _events(self, body, tokens, usage, include_usage):
+        """
+        Yields (delay before the event, event bytes) for a streamed reply.
+        """
+        def event(choices, **extra):
+            chunk = {"id": "stub", "object": "chat.completion.chunk", "created": 0, "model": body.get("model"),
+                     "choices": choices, **extra}
+            return f"data: {json.dumps(chunk)}\n\n".encode('utf-8')
+        yield 0, event([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+        for token in tokens:
+            yield 1 / self.tokens_per_second, event([{"index": 0, "delta": {"content": token}, "finish_reason": None}])
+        yield 0, event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if include_usage:
+            yield 0, event([], usage=usage)
+        yield 0, b"data: [DONE]\n\n"
+
+    def _finish(self, record, received):
+        record["received"] += received
+        record["end"] = time.perf_counter()
+
+    def handle(self, request):
+        """
+        Handler for the blocking client.
+        """
+        body, record, tokens, usage, include_usage, latency = self._begin(request)
+        time.sleep(latency)
+        if not record["stream"]:
+            time.sleep(len(tokens) / self.tokens_per_second)
+            content = self._completion(body, tokens, usage)
+            self._finish(record, len(content))
+            return httpx.Response(200, content=content, headers={"content-type": "application/json"})
+
+        def stream():
+            received = 0
+            try:
+                for delay, data in self._events(body, tokens, usage, include_usage):
+                    time.sleep(delay)
+                    received += len(data)
+                    yield data
+            finally:
+                self._finish(record, received)
+        return httpx.Response(200, content=stream(), headers={"content-type": "text/event-stream"})
+
+    async def handle_async(self, request):
+        """
+        Handler for the async client.
+        """
+        body, record, tokens, usage, include_usage, latency = self._begin(request)
+        await asyncio.sleep(latency)
+        if not record["stream"]:
+            await asyncio.sleep(len(tokens) / self.tokens_per_second)
+            content = self._completion(body, tokens, usage)
+            self._finish(record, len(content))
+            return httpx.Response(200, content=content, headers={"content-type": "application/json"})
+
+        async def stream():
+            received = 0
+            try:
+                for delay, data in self._events(body, tokens, usage, include_usage):
+                    await asyncio.sleep(delay)
+                    received += len(data)
+                    yield data
+            finally:
+                self._finish(record, received)
+        return httpx.Response(200, content=stream(), headers={"content-type": "text/event-stream"})
+
+
+# Function to add up the time covered by a list of intervals
+def covered_time(intervals):
+    """
+    Returns the total length of the union of (start, end) intervals, so calls running in parallel count once.
+    """
+    total = 0
+    current_start = current_end = None
+    for start, end in sorted(intervals):
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        total += current_end - current_start
+    return total
+
+
+# Function to break the time of a profiled turn down into the kinds of local work
+def profile_categories(profiler):
+    """
+    Returns a dictionary of category -> seconds of the profiled functions' own time. A function is in the first
+    of PROFILE_CATEGORIES that matches its source file or built-in name, and other functions of the assistant
+    are "other". The time of a library function that matches none (e.g. typing or isinstance) is shared among
+    the categories of its callers.
+    """
+    stats = pstats.Stats(profiler).stats
+    own_directory = os.path.dirname(os.path.abspath(__file__))
+    shares = {}
+
+    def category_shares(key, callees=frozenset()):
+        """
+        Returns {category: fraction} of the time of the function key; empty if it is only called from callees,
+        the functions whose shares are being worked out.
+        """
+        if key in shares:
+            return shares[key]
+        filename, _, name = key
+        where = f"{filename} {name}".replace(os.sep, "/")
+        category = next((category for category, markers in PROFILE_CATEGORIES
+                         if any(marker in where for marker in markers)), None)
+        if category is None and filename.startswith(own_directory):
+            category = "other"
+        callers = {caller: values for caller, values in stats[key][4].items() if caller in stats}
+        if category is not None or not callers:
+            shares[key] = {category or "other": 1.0}
+            return shares[key]
+        # Weighted by the time spent in the function from each caller, or by the number of calls
+        result = {}
+        total = 0
+        for caller, values in callers.items():
+            if caller in callees:
+                continue
+            caller_shares = category_shares(caller, callees | {key})
+            weight = values[2] or values[1]
+            if caller_shares:
+                total += weight
+            for caller_category, fraction in caller_shares.items():
+                result[caller_category] = result.get(caller_category, 0) + fraction * weight
+        if not total:
+            return {} if callees else {"other": 1.0}
+        shares[key] = {category: weight / total for category, weight in result.items()}
+        return shares[key]
+
+    categories = {}
+    for key, (_, _, own_time, _, _) in stats.items():
+        for category, fraction in category_shares(key).items():
+            categories[category] = categories.get(category, 0) + own_time * fraction
+    return categories
+
+
+# Function to plug the stand-in into the assistant's API clients
+def install_stub(assistant, stub):
+    """
+    Replaces the assistant's OpenAI clients with clients that send every request to the stand-in.
+    """
+    with assistant.client_lock:
+        assistant.client = OpenAI(
+            base_url=STUB_URL, api_key="benchmark", max_retries=0,
+            http_client=httpx.Client(transport=httpx.MockTransport(stub.handle))
+        )
+        assistant.async_client = AsyncOpenAI(
+            base_url=STUB_URL, api_key="benchmark", max_retries=0,
+            http_client=httpx.AsyncClient(transport=httpx.MockTransport(stub.handle_async))
+        )
+
+
+# Function to run the scripted turns through the chat loop
+def run_benchmark(turns, latency=0.2, tokens_per_second=60.0, reply_tokens=30, verbose=False, stub=None, profile=False):
+    """
+    Runs the turns through chatbot.chat_loop() in a scratch directory, with the API replaced by a StubLLM.
+    Questions that ask for 'yes' (code updates, tool calls, restarts) are answered 'no', so a run never
+    changes the assistant's code.
+    stub: a StubLLM (or subclass) to use instead of one built from latency, tokens_per_second and reply_tokens.
+    profile: if True, each turn is run under cProfile and its local time is broken down with profile_categories().
+    Returns a list with one dictionary of measurements per turn.
+    """
+    if stub is None:
+        stub = StubLLM(latency=latency, tokens_per_second=tokens_per_second, reply_tokens=reply_tokens)
+    original_dir = os.getcwd()
+    work_dir = tempfile.mkdtemp(prefix="sam_benchmark_")
+    os.chdir(work_dir)
+    listener = structured_log.start_logging(os.path.join('logs', 'sam.jsonl'))
+    results = []
+    try:
+        import chatbot  # Imports the assistant module as well
+        assistant = chatbot.assistant
+        install_stub(assistant, stub)
+        script = iter(turns)
+        turn = {}
+
+        def end_turn():
+            if not turn:
+                return
+            end = time.perf_counter()
+            if profile:
+                turn["profiler"].disable()
+            with stub.lock:
+                requests = [record for record in stub.requests if record["start"] >= turn["start"]]
+            calls = [call for call in list(assistant.telemetry.calls) if call["time"] >= turn["wall_start"]]
+            api_time = covered_time([(record["start"], record["end"] or end) for record in requests])
+            wall = end - turn["start"]
+            reply_ttft = [call["ttft"] for call in calls if call["call_type"] == "reply" and call["ttft"] is not None]
+            results.append({
+                "turn": len(results) + 1,
+                "wall": wall,
+                "api_time": api_time,
+                "local_time": wall - api_time,
+                "round_trips": len(requests),
+                "bytes_sent": sum(record["sent"] for record in requests),
+                "bytes_received": sum(record["received"] for record in requests),
+                "reply_ttft": reply_ttft[0] if reply_ttft else None,
+                "calls": {call["call_type"]: call["wall"] for call in calls},
+            })
+            if profile:
+                results[-1]["profile"] = profile_categories(turn["profiler"])
+            turn.clear()
+
+        # Questions said since the last input; the chat loop asks them with the same prompt as a new turn
+        questions = []
+        say = assistant.say
+
+        def watch_say(message):
+            if "Type 'yes'" in message:
+                questions.append(message)
+            say(message)
+
+        def read_input(prompt=""):
+            if questions:
+                questions.clear()
+                return "no"
+            end_turn()
+            try:
+                text = next(script)
+            except StopIteration:
+                raise EOFError()
+            stub.turn = len(results) + 1
+            turn.update(start=time.perf_counter(), wall_start=time.time())
+            if profile:
+                turn["profiler"] = cProfile.Profile()
+                turn["profiler"].enable()
+            return text
+
+        output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+        assistant.say = watch_say
+        try:
+            with output:
+                conversation, last_update_index = chatbot.open_conversation()
+                try:
+                    chatbot.chat_loop(conversation, last_update_index, read_input=read_input)
+                except EOFError:
+                    pass
+        finally:
+            assistant.say = say
+        chatbot.session_store.close()
+    finally:
+        listener.stop()
+        os.chdir(original_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+# Function to summarize the turns of a run
+def summarize(results):
+    """
+    Returns p50/p95 of the per-turn times in milliseconds and the mean round trips and bytes per turn.
+    """
+    summary = {}
+    for key in ("wall", "api_time", "local_time", "reply_ttft"):
+        values = [result[key] * 1000 for result in results if result[key] is not None]
+        summary[f"{key}_p50_ms"] = percentile(values, 50)
+        summary[f"{key}_p95_ms"] = percentile(values, 95)
+    for key in ("round_trips", "bytes_sent", "bytes_received"):
+        summary[f"{key}_per_turn"] = sum(result[key] for result in results) / len(results) if results else None
+    return summary
+
+
+# Function to print the measurements of a run
+def format_report(results, summary, baseline=None):
+    """
+    Returns the per-turn table and the summary, compared with the summary of a baseline run if given.
+    """
+    lines = [
+        f"{'turn':>4} {'wall ms':>9} {'api ms':>9} {'local ms':>9} {'ttft ms':>8} {'trips':>5} {'sent':>8} {'recv':>8}  calls (s)",
+    ]
+    for result in results:
+        ttft = "-" if result["reply_ttft"] is None else f"{result['reply_ttft'] * 1000:.0f}"
+        calls = ", ".join(f"{name} {wall:.2f}" for name, wall in result["calls"].items())
+        lines.append(
+            f"{result['turn']:>4} {result['wall'] * 1000:>9.1f} {result['api_time'] * 1000:>9.1f} "
+            f"{result['local_time'] * 1000:>9.1f} {ttft:>8} {result['round_trips']:>5} "
+            f"{result['bytes_sent']:>8} {result['bytes_received']:>8}  {calls}"
+        )
+    lines.append("")
+    for key, value in summary.items():
+        line = f"{key:<26} {'-' if value is None else f'{value:.1f}':>10}"
+        previous = (baseline or {}).get(key)
+        if value is not None and previous:
+            line += f"   baseline {previous:.1f} ({(value - previous) / previous * 100:+.1f}%)"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the chat loop against a local stand-in for the API.")
+    parser.add_argument("--turns", help="File with one user message per line (default: a built-in script)")
+    parser.add_argument("--repeat", type=int, default=1, help="Times the script is run through in one session")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before each response starts")
+    parser.add_argument("--tokens-per-second", type=float, default=60.0, help="Speed of the generated tokens")
+    parser.add_argument("--reply-tokens", type=int, default=30, help="Tokens in each reply")
+    parser.add_argument("--output", help="Write the measurements to this JSON file")
+    parser.add_argument("--baseline", help="JSON file of an earlier run to compare with")
+    parser.add_argument("--verbose", action="store_true", help="Show the assistant's output")
+    options = parser.parse_args()
+
+    if options.turns:
+        with open(options.turns, 'r', encoding='utf-8') as f:
+            turns = [line.rstrip('\n') for line in f if line.strip()]
+    else:
+        turns = DEFAULT_TURNS
+    baseline = None
+    if options.baseline:
+        with open(options.baseline, 'r') as f:
+            baseline = json.load(f)["summary"]
+
+    results = run_benchmark(
+        turns * options.repeat,
+        latency=options.latency,
+        tokens_per_second=options.tokens_per_second,
+        reply_tokens=options.reply_tokens,
+        verbose=options.verbose
+    )
+    summary = summarize(results)
+    print(format_report(results, summary, baseline))
+    if options.output:
+        settings = {"latency": options.latency, "tokens_per_second": options.tokens_per_second,
+                    "reply_tokens": options.reply_tokens, "turns": len(results)}
+        with open(options.output, 'w') as f:
+            json.dump({"settings": settings, "summary": summary, "turns": results}, f, indent=1)
+        print(f"Results written to '{options.output}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import re  # For finding commands in replies
+
+from file_reader import parse_page_arguments, parse_read_arguments  # For /read and /page arguments
+
+COMMAND_PATTERN = re.compile(r"(?<![\w/.])/(read|page|ls|write|execute|stats|self-upgrade)\b", re.IGNORECASE)
+FENCED_CODE_PATTERN = re.compile(r"\s*```[\w-]*\n(.*?)\n?```", re.DOTALL)
+
+
+# Function to split the argument of a /write command into the file name and the code
+def parse_write_arguments(text):
+    """
+    Parses '<filename>' followed by the code on the next lines, optionally in a markdown code block.
+    Returns (filename, code, consumed) where consumed is the number of characters used, or None if incomplete.
+    """
+    first_line_end = text.find('\n')
+    if first_line_end == -1:
+        return None
+    filename = text[:first_line_end].strip().strip('`\'":')
+    rest = text[first_line_end + 1:]
+    fenced = FENCED_CODE_PATTERN.match(rest)
+    if fenced:
+        return filename, fenced.group(1), first_line_end + 1 + fenced.end()
+    # Without a code block the code runs to the end of the reply
+    return filename, rest, len(text)
+
+
+# Function to find every command in an assistant reply
+def extract_commands(response):
+    """
+    Returns the commands in the reply as a list of (command_text, tool_name, arguments).
+    arguments is None if the command could not be parsed; the code of a /write is not searched for commands.
+    """
+    commands = []
+    position = 0
+    while True:
+        match = COMMAND_PATTERN.search(response, position)
+        if match is None:
+            return commands
+        command = match.group(1).lower()
+        rest = response[match.end():]
+        line = rest.split('\n', 1)[0]
+        position = match.end()
+        if command == "read":
+            arguments = parse_read_arguments(line)
+            call = ("read_file", None if arguments is None else dict(zip(("file_path", "mode", "start", "end"), arguments)))
+        elif command == "page":
+            arguments = parse_page_arguments(line)
+            call = ("read_page", None if arguments is None else {"handle_id": arguments[0], "which": arguments[1]})
+        elif command == "ls":
+            call = ("list_files", {})
+        elif command == "stats":
+            call = ("show_stats", {})
+        elif command == "execute":
+            script_name = line.strip().split()[0].strip('`\'",;.') if line.strip() else ""
+            call = ("run_script", {"script_name": script_name} if script_name else None)
+        elif command == "write":
+            arguments = parse_write_arguments(rest)
+            if arguments is None:
+                call = ("write_script", None)
+            else:
+                filename, code, consumed = arguments
+                call = ("write_script", {"script_name": filename, "script_code": code} if filename else None)
+                position = match.end() + consumed
+        else:
+            call = ("self_upgrade", {})
+        text = f"/{command}" if command in ("ls", "stats", "self-upgrade") else f"/{command} {line.strip()}".strip()
+        commands.append((text, *call))
+
+
+class CommandExecutor:
+    """
+    Runs all the commands of a reply through the tool registry: independent reads run concurrently,
+    writes and script runs one at a time in the order they appear.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def run(self, response):
+        """
+        Extracts and runs every command in the reply.
+        Returns a list of (command_text, result) in the order the commands appear.
+        """
+        commands = extract_commands(response)
+        valid = [(name, arguments) for _, name, arguments in commands if arguments is not None]
+        results = iter(self.registry.execute(valid))
+        return [
+            (text, next(results) if arguments is not None else "Error: could not parse the arguments of this command.")
+            for text, _, arguments in commands
+        ]
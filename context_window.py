@@ -0,0 +1,144 @@
+import logging  # For logging activities
+import threading  # For serializing builds from the turn pipeline's threads
+
+# Tokens added by the chat format for every message (role, separators)
+MESSAGE_TOKEN_OVERHEAD = 4
+
+# Encoding used when tiktoken is installed; loaded on first use because it is slow to import
+_encoding = None
+_encoding_loaded = False
+
+# Function to load the tiktoken encoding if tiktoken is installed
+def _get_encoding():
+    """
+    Returns the tiktoken encoding, or None if tiktoken is not installed.
+    """
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        try:
+            import tiktoken  # Optional, gives exact token counts for OpenAI models
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except ImportError:
+            _encoding = None
+        _encoding_loaded = True
+    return _encoding
+
+# Function to count the tokens of a single message
+def count_tokens(message):
+    """
+    Returns the number of tokens used by a chat message.
+    Uses tiktoken if it is installed, otherwise estimates about four characters per token.
+    """
+    content = message.get("content") or ""
+    for tool_call in message.get("tool_calls") or []:
+        content += tool_call["function"]["name"] + tool_call["function"]["arguments"]
+    if _get_encoding() is not None:
+        return len(_encoding.encode(content)) + MESSAGE_TOKEN_OVERHEAD
+    return len(content) // 4 + 1 + MESSAGE_TOKEN_OVERHEAD
+
+
+class ContextWindow:
+    """
+    Keeps the messages sent to the model under a token budget.
+    The system message is always kept, followed by a running summary of older turns and the most recent messages.
+    The summary is only extended with the messages that fall out of the window, never rebuilt from scratch.
+    """
+
+    def __init__(self, token_budget, summarize, min_recent_messages=4, low_watermark=0.75, count=count_tokens):
+        """
+        token_budget: maximum number of tokens for the messages sent to the model.
+        summarize: callable(previous_summary, messages) returning the updated summary text.
+        min_recent_messages: number of latest messages that are never summarized.
+        low_watermark: when the window slides it is trimmed to this share of the budget, so summaries happen in batches.
+        """
+        self.token_budget = token_budget
+        self.summarize = summarize
+        self.min_recent_messages = min_recent_messages
+        self.low_watermark = low_watermark
+        self.count = count
+        self.token_counts = []  # Token count of every message in the conversation, by index
+        self.summary = ""  # Running summary of conversation[1:summarized_upto]
+        self.summary_tokens = 0
+        self.summarized_upto = 1  # Index of the first message that is not in the summary
+        # A cancelled reply cannot stop the thread building its window, so a following build waits for it
+        self.lock = threading.Lock()
+
+    def reset(self):
+        """
+        Forgets the cached token counts and summary, e.g. when a new conversation is started.
+        """
+        with self.lock:
+            self._reset()
+
+    def _reset(self):
+        self.token_counts = []
+        self.summary = ""
+        self.summary_tokens = 0
+        self.summarized_upto = 1
+
+    def _update_counts(self, conversation):
+        """
+        Counts tokens only for the messages appended since the last call.
+        """
+        if len(conversation) < len(self.token_counts):
+            self._reset()
+        for message in conversation[len(self.token_counts):]:
+            self.token_counts.append(self.count(message))
+
+    def total_tokens(self, conversation):
+        """
+        Returns the number of tokens of the whole conversation.
+        """
+        with self.lock:
+            self._update_counts(conversation)
+            return sum(self.token_counts)
+
+    def _window_start(self, conversation, budget):
+        """
+        Returns the index of the oldest message that fits in the budget, counting back from the latest one.
+        """
+        start = len(conversation)
+        used = 0
+        latest_allowed = len(conversation) - self.min_recent_messages
+        while start > self.summarized_upto:
+            tokens = self.token_counts[start - 1]
+            if used + tokens > budget and start <= latest_allowed:
+                break
+            used += tokens
+            start -= 1
+        return start
+
+    def build(self, conversation):
+        """
+        Returns the messages to send to the model for the given conversation.
+        """
+        with self.lock:
+            return self._build(conversation)
+
+    def _build(self, conversation):
+        self._update_counts(conversation)
+        system_tokens = self.token_counts[0] if conversation else 0
+        available = self.token_budget - system_tokens - self.summary_tokens
+        start = self._window_start(conversation, available)
+
+        if start > self.summarized_upto:
+            # The window has to slide; trim to the low watermark so the next few turns fit without another summary
+            start = self._window_start(conversation, int(available * self.low_watermark))
+            # Tool results cannot be sent without the assistant message that called them
+            while start < len(conversation) - 1 and conversation[start].get("role") == "tool":
+                start += 1
+            evicted = conversation[self.summarized_upto:start]
+            logging.info(f"Context window: summarizing {len(evicted)} older messages.")
+            self.summary = self.summarize(self.summary, evicted)
+            self.summary_tokens = self.count({"content": self.summary})
+            self.summarized_upto = start
+
+        messages = conversation[:1]
+        if self.summary:
+            messages = messages + [{"role": "system", "content": f"Summary of the earlier conversation:\n{self.summary}"}]
+        window = messages + conversation[self.summarized_upto:]
+        logging.info(
+            f"Context window: {len(window)} of {len(conversation)} messages, "
+            f"{system_tokens + self.summary_tokens + sum(self.token_counts[self.summarized_upto:])} tokens."
+        )
+        return window
@@ -0,0 +1,307 @@
+import mmap  # For reading pages without loading whole files
+import os  # For file sizes and modification times
+import re  # For parsing /read and /page arguments
+import threading  # For reads running concurrently on the tool registry's threads
+from collections import OrderedDict  # For evicting the least recently used handles
+
+LINE_CHECKPOINT_INTERVAL = 1000  # A line offset is remembered every this many lines
+
+READ_ARGUMENTS_PATTERN = re.compile(
+    r"^\s*[`'\"]?(?P<path>[^\s`'\",;]+)[`'\"]?[,;:]?"
+    r"(?:\s+(?P<mode>lines|bytes|head|tail|page)(?:\s+(?P<start>\d+)(?:\s*-\s*(?P<end>\d+))?)?)?",
+    re.IGNORECASE
+)
+PAGE_ARGUMENTS_PATTERN = re.compile(r"^\s*(?P<handle>\w+)(?:\s+(?P<which>next|prev|previous|\d+))?", re.IGNORECASE)
+
+
+# Function to parse the arguments of a /read command
+def parse_read_arguments(text):
+    """
+    Parses '<path> [lines A-B | bytes A-B | head N | tail N | page N]' from the first line of text.
+    Returns (path, mode, start, end) or None if there is no path; numbers not given are None.
+    """
+    first_line = text.strip().split('\n', 1)[0] if text.strip() else ""
+    match = READ_ARGUMENTS_PATTERN.match(first_line)
+    if not match:
+        return None
+    path = match.group("path")
+    if path.endswith('.') and not os.path.exists(path):
+        path = path.rstrip('.')  # End of a sentence, not part of the name
+    mode = (match.group("mode") or "page").lower()
+    start = int(match.group("start")) if match.group("start") else None
+    end = int(match.group("end")) if match.group("end") else None
+    return path, mode, start, end
+
+
+# Function to parse the arguments of a /page command
+def parse_page_arguments(text):
+    """
+    Parses '<handle> [next | prev | N]' and returns (handle, which), where which is 'next', 'prev' or a page number.
+    Returns None if there is no handle.
+    """
+    match = PAGE_ARGUMENTS_PATTERN.match(text.strip().split('\n', 1)[0] if text.strip() else "")
+    if not match:
+        return None
+    which = (match.group("which") or "next").lower()
+    if which == "previous":
+        which = "prev"
+    return match.group("handle"), int(which) if which.isdigit() else which
+
+
+class FileHandle:
+    """
+    An open file the assistant is paging through, with cached page and line offsets.
+    """
+
+    def __init__(self, handle_id, path):
+        self.handle_id = handle_id
+        self.path = path
+        self.size = None
+        self.mtime = None
+        self.page_starts = [0]  # Byte offset where each page starts, filled in as pages are read
+        self.line_checkpoints = [0]  # Byte offset of lines 1, 1 + interval, 1 + 2 * interval, ...
+        self.current_page = None
+        self.lock = threading.Lock()  # Held while a read uses or updates the cached offsets
+
+    def refresh(self):
+        """
+        Forgets cached offsets if the file changed since they were computed.
+        """
+        stat = os.stat(self.path)
+        if (stat.st_size, stat.st_mtime) != (self.size, self.mtime):
+            self.size, self.mtime = stat.st_size, stat.st_mtime
+            self.page_starts = [0]
+            self.line_checkpoints = [0]
+            self.current_page = None
+
+
+class FileReader:
+    """
+    Serves files to the assistant in pages, byte ranges, line ranges and head/tail views.
+    Files are memory mapped only for the duration of each read, so nothing is loaded in full
+    and the files are not kept locked.
+    """
+
+    def __init__(self, page_bytes=4096, max_bytes=16384, max_handles=20):
+        """
+        page_bytes: approximate size of a page; pages end at a line break when possible.
+        max_bytes: maximum number of bytes returned by any single read.
+        max_handles: number of open handles kept; the least recently used ones are dropped.
+        """
+        self.page_bytes = page_bytes
+        self.max_bytes = max_bytes
+        self.max_handles = max_handles
+        self.handles = OrderedDict()
+        self.next_id = 1
+        self.lock = threading.Lock()  # Guards handles and next_id
+
+    def configure(self, page_bytes, max_bytes):
+        """
+        Changes the page size and read limit, e.g. after the settings were reloaded. Open handles are kept;
+        their page offsets are computed again for the new page size.
+        """
+        with self.lock:
+            handles = list(self.handles.values())
+            self.max_bytes = max_bytes
+            if page_bytes == self.page_bytes:
+                return
+            self.page_bytes = page_bytes
+        for handle in handles:
+            with handle.lock:
+                handle.page_starts = [0]
+                handle.current_page = None
+
+    def open(self, path):
+        """
+        Returns the handle for path, reusing an existing one.
+        Raises IsADirectoryError for a directory and FileNotFoundError if nothing exists at path.
+        """
+        if os.path.isdir(path):
+            raise IsADirectoryError(path)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(path)
+        with self.lock:
+            for handle in self.handles.values():
+                if os.path.abspath(handle.path) == os.path.abspath(path):
+                    self.handles.move_to_end(handle.handle_id)
+                    return handle
+            handle = FileHandle(f"f{self.next_id}", path)
+            self.next_id += 1
+            self.handles[handle.handle_id] = handle
+            while len(self.handles) > self.max_handles:
+                self.handles.popitem(last=False)
+        return handle
+
+    def get(self, handle_id):
+        """
+        Returns the open handle with the given id. Raises KeyError if it is unknown.
+        """
+        with self.lock:
+            handle = self.handles[handle_id]
+            self.handles.move_to_end(handle_id)
+        return handle
+
+    def _map(self, handle):
+        """
+        Returns a read-only memory map of the file, or None if the file is empty.
+        """
+        handle.refresh()
+        if handle.size == 0:
+            return None
+        with open(handle.path, 'rb') as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _page_bounds(self, handle, mapped, number):
+        """
+        Returns (start, end) of page number (1-based), computing earlier page boundaries as needed.
+        Returns None if the page is past the end of the file.
+        """
+        while len(handle.page_starts) < number and handle.page_starts[-1] < handle.size:
+            start = handle.page_starts[-1]
+            end = min(start + self.page_bytes, handle.size)
+            if end < handle.size:
+                newline = mapped.rfind(b'\n', start, end)
+                if newline >= start:
+                    end = newline + 1
+            handle.page_starts.append(end)
+        start = handle.page_starts[number - 1] if number <= len(handle.page_starts) else handle.size
+        if start >= handle.size:
+            return None
+        end = min(start + self.page_bytes, handle.size)
+        if end < handle.size:
+            newline = mapped.rfind(b'\n', start, end)
+            if newline >= start:
+                end = newline + 1
+        return start, end
+
+    def _line_offset(self, handle, mapped, line):
+        """
+        Returns the byte offset where the given 1-based line starts, or the file size if it is past the end.
+        """
+        checkpoint = min((line - 1) // LINE_CHECKPOINT_INTERVAL, len(handle.line_checkpoints) - 1)
+        offset = handle.line_checkpoints[checkpoint]
+        current = checkpoint * LINE_CHECKPOINT_INTERVAL + 1
+        while current < line:
+            newline = mapped.find(b'\n', offset)
+            if newline == -1:
+                return handle.size
+            offset = newline + 1
+            current += 1
+            if (current - 1) % LINE_CHECKPOINT_INTERVAL == 0 and (current - 1) // LINE_CHECKPOINT_INTERVAL == len(handle.line_checkpoints):
+                handle.line_checkpoints.append(offset)
+        return offset
+
+    def _result(self, handle, mapped, start, end, description):
+        """
+        Decodes the byte range (capped at max_bytes) and returns the result dictionary.
+        """
+        truncated = end - start > self.max_bytes
+        end = min(end, start + self.max_bytes)
+        text = mapped[start:end].decode('utf-8', errors='replace') if mapped is not None else ""
+        return {
+            "handle": handle.handle_id,
+            "path": handle.path,
+            "size": handle.size,
+            "start": start,
+            "end": end,
+            "description": description,
+            "truncated": truncated,
+            "text": text,
+        }
+
+    def read(self, handle, mode="page", start=None, end=None):
+        """
+        Reads part of the file:
+        page N (default next page), bytes A-B, lines A-B, head N lines or tail N lines.
+        Returns a dictionary with the text, byte range and a description of what was read.
+        """
+        with handle.lock:
+            return self._read(handle, mode, start, end)
+
+    def _read(self, handle, mode, start, end):
+        mapped = self._map(handle)
+        try:
+            if mapped is None:
+                return self._result(handle, None, 0, 0, "empty file")
+            if mode == "bytes":
+                first = min(start or 0, handle.size)
+                last = min(end + 1 if end is not None else first + self.page_bytes, handle.size)
+                return self._result(handle, mapped, first, max(first, last), f"bytes {first}-{max(first, last) - 1}")
+            if mode == "lines":
+                first_line = max(start or 1, 1)
+                last_line = end if end is not None else first_line + 49
+                first = self._line_offset(handle, mapped, first_line)
+                last = self._line_offset(handle, mapped, last_line + 1)
+                return self._result(handle, mapped, first, last, f"lines {first_line}-{last_line}")
+            if mode == "head":
+                count = start or 20
+                return self._result(handle, mapped, 0, self._line_offset(handle, mapped, count + 1), f"first {count} lines")
+            if mode == "tail":
+                count = start or 20
+                first = handle.size
+                # Skip a final newline so it does not count as an empty last line
+                search_end = handle.size - 1 if mapped[handle.size - 1:handle.size] == b'\n' else handle.size
+                for _ in range(count):
+                    newline = mapped.rfind(b'\n', 0, search_end)
+                    if newline == -1:
+                        first = 0
+                        break
+                    first = newline + 1
+                    search_end = newline
+                return self._result(handle, mapped, first, handle.size, f"last {count} lines")
+            # Pages
+            if start is None:
+                start = handle.current_page + 1 if handle.current_page else 1
+            number = max(start, 1)
+            bounds = self._page_bounds(handle, mapped, number)
+            if bounds is None:
+                return self._result(handle, mapped, handle.size, handle.size, f"page {number} (past the end of the file)")
+            handle.current_page = number
+            return self._result(handle, mapped, bounds[0], bounds[1], f"page {number}")
+        finally:
+            if mapped is not None:
+                mapped.close()
+
+    def read_path(self, path, mode="page", start=None, end=None):
+        """
+        Opens path (or reuses its handle) and reads part of it, see read().
+        """
+        handle = self.open(path)
+        if mode == "page" and start is None:
+            start = 1  # A new /read starts from the beginning
+        return self.read(handle, mode, start, end)
+
+    def page(self, handle_id, which="next"):
+        """
+        Reads the next, previous or a numbered page of an open handle.
+        """
+        handle = self.get(handle_id)
+        with handle.lock:
+            if which == "next":
+                number = (handle.current_page or 0) + 1
+            elif which == "prev":
+                number = max((handle.current_page or 2) - 1, 1)
+            else:
+                number = which
+            return self._read(handle, "page", number, None)
+
+
+# Function to format a read result for the user and the conversation
+def format_result(result, tool_calling=False):
+    """
+    Returns a compact preview: a header with the handle and byte range, the text and a paging hint.
+    tool_calling: word the hint as read_page/read_file tool calls instead of /page and /read commands.
+    """
+    byte_range = f"bytes {result['start']}-{result['end'] - 1}" if result["end"] > result["start"] else "no bytes"
+    header = f"'{result['path']}' ({result['size']} bytes, handle {result['handle']}): {result['description']}, {byte_range}"
+    lines = [header, result["text"].rstrip('\n')]
+    if result["truncated"]:
+        lines.append(f"[truncated to {result['end'] - result['start']} bytes]")
+    if result["end"] < result["size"] and tool_calling:
+        lines.append(
+            f"[more: read_page with handle_id '{result['handle']}' and which 'next', or read_file with mode "
+            f"'lines' or 'bytes' and start/end, or mode 'head' or 'tail' and start N]"
+        )
+    elif result["end"] < result["size"]:
+        lines.append(f"[more: '/page {result['handle']} next', or '/read {result['path']} lines A-B | bytes A-B | head N | tail N']")
+    return "\n".join(lines)
@@ -0,0 +1,26 @@
+import os  # For file paths and atomic replacement
+import shutil  # For keeping the permissions of a replaced file
+import tempfile  # For the temporary file of a replacement
+
+
+# Function to replace a file in one step, so it is never seen half written
+def write_atomically(path, data, prefix=".tmp_", suffix=""):
+    """
+    Writes data (bytes or text) to a temporary file in the directory of path, flushes it to disk and moves it
+    over path. An existing file keeps its permissions.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temporary_path = tempfile.mkstemp(dir=directory, prefix=prefix, suffix=suffix)
+    try:
+        with os.fdopen(descriptor, 'wb' if isinstance(data, bytes) else 'w') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            shutil.copymode(path, temporary_path)
+        os.replace(temporary_path, path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
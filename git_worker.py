@@ -0,0 +1,234 @@
+import json  # For the change tracker manifest
+import logging  # For logging activities
+import os  # For file modification times
+import queue  # For the job queue
+import threading  # For the background worker thread
+import time  # For the coalescing delay
+from concurrent.futures import Future  # For returning results of git calls
+
+
+class ChangeTracker:
+    """
+    Remembers the files SAM itself wrote and their modification times, so commits can stage
+    only those paths instead of scanning the whole working tree.
+    The list is saved to a small JSON manifest so changes from a previous session are still committed.
+    """
+
+    def __init__(self, manifest_path, repo_path='.'):
+        self.manifest_path = manifest_path
+        self.repo_path = repo_path
+        self.lock = threading.Lock()
+        self.committed = {}  # Path -> modification time at the last commit (None if never committed)
+        if os.path.exists(manifest_path):
+            try:
+                with open(manifest_path, 'r') as f:
+                    self.committed = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Could not read change manifest '{manifest_path}': {e}")
+
+    def _relative(self, path):
+        """
+        Returns the path relative to the repository with forward slashes, as git expects.
+        """
+        return os.path.relpath(os.path.abspath(path), os.path.abspath(self.repo_path)).replace(os.sep, '/')
+
+    def _save(self):
+        """
+        Writes the manifest; called with the lock held.
+        """
+        with open(self.manifest_path, 'w') as f:
+            json.dump(self.committed, f, indent=1)
+
+    def track(self, path):
+        """
+        Records that SAM wrote the file at path.
+        """
+        relative = self._relative(path)
+        with self.lock:
+            if relative not in self.committed:
+                self.committed[relative] = None
+                self._save()
+
+    def changed_paths(self):
+        """
+        Returns the tracked paths whose modification time differs from the last commit, including deleted ones.
+        """
+        changed = []
+        with self.lock:
+            for relative, committed_mtime in self.committed.items():
+                full_path = os.path.join(self.repo_path, relative)
+                mtime = os.path.getmtime(full_path) if os.path.exists(full_path) else None
+                if mtime != committed_mtime:
+                    changed.append(relative)
+        return changed
+
+    def mark_committed(self, paths):
+        """
+        Records the current modification times of the committed paths; deleted paths are forgotten.
+        """
+        with self.lock:
+            for relative in paths:
+                if relative not in self.committed:
+                    continue
+                full_path = os.path.join(self.repo_path, relative)
+                if os.path.exists(full_path):
+                    self.committed[relative] = os.path.getmtime(full_path)
+                else:
+                    del self.committed[relative]
+            self._save()
+
+
+class GitWorker:
+    """
+    Runs git commits and pushes on a background thread so a slow remote never blocks the chat loop.
+    Commits queued close together are coalesced into one commit and pushed once.
+    """
+
+    def __init__(self, repo_path='.', notify=None, coalesce_delay=0.5, push=True, tracker=None):
+        """
+        repo_path: path of the git repository.
+        notify: callable(message) used to report failures to the user.
+        coalesce_delay: seconds to wait for more commits before committing a batch.
+        push: whether batches are pushed to the 'origin' remote.
+        tracker: ChangeTracker with the files to stage; without one, all changes are staged with 'git add .'.
+        """
+        self.repo_path = repo_path
+        self.tracker = tracker
+        self.repo = None  # Opened once on the worker thread and reused for every job
+        self.notify = notify or (lambda message: None)
+        self.coalesce_delay = coalesce_delay
+        self.push = push
+        self.unpushed = False  # True while there are local commits that failed to push
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="git-worker", daemon=True)
+        self.thread.start()
+
+    def commit(self, message, only_if_dirty=False):
+        """
+        Queues a commit of all changes with the given message.
+        With only_if_dirty, the commit is skipped if nothing changed.
+        """
+        self.queue.put(("commit", message, only_if_dirty))
+
+    def call(self, function, timeout=None):
+        """
+        Runs function(repo) on the worker after the pending commits and returns its result.
+        """
+        future = Future()
+        self.queue.put(("call", function, future))
+        return future.result(timeout)
+
+    def flush(self, timeout=None):
+        """
+        Waits until all queued commits have been committed and pushed.
+        Returns False if the timeout expired first.
+        """
+        done = threading.Event()
+        self.queue.put(("flush", done))
+        return done.wait(timeout)
+
+    def stop(self, timeout=30):
+        """
+        Flushes the queue and stops the worker thread.
+        """
+        if self.thread.is_alive():
+            self.flush(timeout)
+            self.queue.put(None)
+            self.thread.join(timeout)
+
+    def _run(self):
+        """
+        Worker loop: collects queued jobs, commits them in batches and runs calls in order.
+        """
+        # GitPython is imported here so its import cost is paid on the worker thread, not at startup
+        from git import Repo  # For git operations using GitPython
+        while True:
+            job = self.queue.get()
+            if job is None:
+                break
+            batch = [job]
+            if job[0] == "commit":
+                # Give other commits a moment to arrive so they are coalesced into one
+                deadline = time.monotonic() + self.coalesce_delay
+                while batch[-1] is not None and batch[-1][0] == "commit":
+                    try:
+                        batch.append(self.queue.get(timeout=max(0, deadline - time.monotonic())))
+                    except queue.Empty:
+                        break
+
+            try:
+                if self.repo is None:
+                    self.repo = Repo(self.repo_path)
+            except Exception as e:
+                logging.error(f"Git worker could not open the repository: {e}")
+                self.notify(f"Git is not available: {e}")
+            repo = self.repo
+
+            commits = []
+            for job in batch:
+                if job is not None and job[0] == "commit":
+                    commits.append(job)
+                    continue
+                self._commit_batch(repo, commits)
+                commits = []
+                if job is None:
+                    return
+                if job[0] == "call":
+                    future = job[2]
+                    try:
+                        future.set_result(job[1](repo))
+                    except Exception as e:
+                        future.set_exception(e)
+                elif job[0] == "flush":
+                    job[1].set()
+            self._commit_batch(repo, commits)
+
+    def _commit_batch(self, repo, commits):
+        """
+        Commits the changes for a batch of queued commits as one commit and pushes it.
+        """
+        if not commits or repo is None:
+            return
+        messages = [message for _, message, _ in commits]
+        only_if_dirty = all(flag for _, _, flag in commits)
+        try:
+            if self.tracker is not None:
+                # Files SAM wrote plus tracked files edited by hand, without walking untracked directories
+                tracked_paths = self.tracker.changed_paths()
+                modified_paths = repo.git.diff('--name-only').splitlines()
+                paths = sorted(set(tracked_paths) | set(modified_paths))
+                # git add fails for ignored paths, e.g. custom_persona.txt; they are marked committed below
+                ignored = set(repo.ignored(*paths)) if paths else set()
+                to_stage = [path for path in paths if path not in ignored]
+                if to_stage:
+                    repo.git.add('-A', '--', *to_stage)
+                staged = bool(to_stage) and bool(repo.index.diff('HEAD'))
+            else:
+                staged = repo.is_dirty(untracked_files=True)
+                if staged:
+                    repo.git.add('.')
+            if staged:
+                if len(messages) == 1:
+                    commit_message = messages[0]
+                else:
+                    commit_message = f"{messages[0]} (+{len(messages) - 1} more)\n\n" + "\n".join(f"- {m}" for m in messages)
+                repo.index.commit(commit_message)
+                self.unpushed = True
+                logging.info(f"Committed {len(messages)} queued change(s): {'; '.join(messages)}")
+            elif only_if_dirty:
+                logging.info("No uncommitted changes to commit.")
+            if self.tracker is not None and paths:
+                self.tracker.mark_committed(paths)
+        except Exception as e:
+            logging.error(f"Git commit failed: {e}")
+            self.notify(f"Git commit failed: {e}")
+            return
+
+        if self.push and self.unpushed:
+            try:
+                repo.remote(name='origin').push()
+                self.unpushed = False
+                logging.info("Changes have been pushed to git.")
+            except Exception as e:
+                logging.error(f"Git push failed: {e}")
+                self.notify(f"Git push failed, will retry with the next commit: {e}")
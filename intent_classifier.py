@@ -0,0 +1,200 @@
+import glob  # For finding past session logs
+import gzip  # For reading rotated, compressed logs
+import json  # For reading JSON-lines logs
+import logging  # For logging activities
+import math  # For log probabilities
+import re  # For keyword patterns and log parsing
+import threading  # For training in the background while the chat loop runs
+from collections import Counter  # For word counts
+
+# Patterns that suggest the user wants the assistant's code changed, with their weights
+UPDATE_PATTERNS = [
+    (re.compile(r"\b(update|upgrade|modify|change|rewrite|refactor|improve|fix)\b.{0,40}\b(your|the|own)\b.{0,20}\b(code|script|self|program|chatbot)", re.I), 3.0),
+    (re.compile(r"\b(add|implement|include|create)\b.{0,40}\b(feature|verb|command|option|function|ability|capability)", re.I), 2.0),
+    (re.compile(r"\bself[- ]?(update|upgrade|improve|modify)", re.I), 3.0),
+    (re.compile(r"\bchatbot\.py\b", re.I), 1.0),
+    (re.compile(r"\b(update|upgrade|modify|change|fix|improve|add|implement|feature|code|script|yourself|version|bug|refactor|rewrite|verb|command)s?\b", re.I), 1.0),
+]
+
+# Short replies that only make sense together with the assistant's previous message
+AFFIRMATION_PATTERN = re.compile(
+    r"^\s*(y|yes|yeah|yep|sure|ok|okay|please|go ahead|go for it|do it|do that|let'?s|sounds good)\b(?:[\s.!,]+[\w']{1,20}){0,3}[\s.!]*$",
+    re.I
+)
+
+# Log lines written by chatbot.py that pair a user message with the helper's answer
+LOG_RECORD_PATTERN = re.compile(r"^\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3} - (?:[A-Z]+ - )?(.*)$")
+WORD_PATTERN = re.compile(r"[a-z][a-z0-9_.']+")
+
+# Function to score a message with the keyword patterns
+def keyword_score(text):
+    """
+    Returns the summed weight of the update patterns found in the text.
+    """
+    return sum(weight for pattern, weight in UPDATE_PATTERNS if pattern.search(text or ""))
+
+# Function to split a message into lowercase words for the learned model
+def tokenize(text):
+    """
+    Returns the words of the text in lowercase.
+    """
+    return WORD_PATTERN.findall((text or "").lower())
+
+# Function to read (user message, helper answer) pairs from past session logs
+def read_training_examples(log_files):
+    """
+    Parses chatbot log files, text or JSON lines (optionally gzip-compressed), and returns a list of
+    (user_input, label) pairs, where label is 1 if the helper answered that a code update was requested.
+    """
+    examples = []
+    for log_file in log_files:
+        opener = gzip.open if log_file.endswith(".gz") else open
+        try:
+            with opener(log_file, 'rt', encoding='utf-8', errors='replace') as f:
+                lines = f.readlines()
+        except OSError as e:
+            logging.warning(f"Could not read log '{log_file}' for the intent classifier: {e}")
+            continue
+        user_input = None
+        for line in lines:
+            if line.startswith("{"):
+                try:
+                    message = json.loads(line).get("message", "")
+                except (ValueError, AttributeError):
+                    continue
+            else:
+                match = LOG_RECORD_PATTERN.match(line.rstrip('\n'))
+                if not match:
+                    continue  # Continuation line of a multi-line record
+                message = match.group(1)
+            if message.startswith("User input: "):
+                user_input = message[len("User input: "):]
+            elif message.startswith("Helper response: ") and user_input is not None:
+                answer = message[len("Helper response: "):].strip()
+                examples.append((user_input, 1 if '1' in answer else 0))
+                user_input = None
+    return examples
+
+
+class NaiveBayes:
+    """
+    Multinomial naive Bayes over words with Laplace smoothing, trained incrementally.
+    """
+
+    def __init__(self):
+        self.word_counts = [Counter(), Counter()]
+        self.total_words = [0, 0]
+        self.doc_counts = [0, 0]
+        self.vocabulary = set()
+
+    def learn(self, text, label):
+        """
+        Adds one labelled message to the model.
+        """
+        words = tokenize(text)
+        self.word_counts[label].update(words)
+        self.total_words[label] += len(words)
+        self.doc_counts[label] += 1
+        self.vocabulary.update(words)
+
+    def examples(self):
+        """
+        Returns the number of messages the model has learned from.
+        """
+        return sum(self.doc_counts)
+
+    def probability(self, text):
+        """
+        Returns the probability that the message asks for a code update.
+        """
+        vocabulary_size = len(self.vocabulary) + 1
+        log_scores = []
+        for label in (0, 1):
+            score = math.log((self.doc_counts[label] + 1) / (self.examples() + 2))
+            for word in tokenize(text):
+                score += math.log((self.word_counts[label][word] + 1) / (self.total_words[label] + vocabulary_size))
+            log_scores.append(score)
+        # Softmax over the two classes
+        top = max(log_scores)
+        weights = [math.exp(score - top) for score in log_scores]
+        return weights[1] / sum(weights)
+
+
+class CodeUpdateClassifier:
+    """
+    Cheap local pre-check for check_for_code_update_async.
+    Decides obvious non-update turns locally once the learned model has min_examples examples,
+    and escalates everything else to the remote model.
+    """
+
+    def __init__(self, threshold=0.1, min_examples=20):
+        """
+        threshold: turns are decided locally only if the learned probability of an update is below this value.
+        min_examples: number of labelled messages the learned model needs before it is trusted.
+        """
+        self.threshold = threshold
+        self.min_examples = min_examples
+        self.model = NaiveBayes()
+        self.lock = threading.Lock()  # Training from logs may run on a background thread
+        self.local_decisions = 0
+        self.remote_calls = 0
+
+    def train_from_logs(self, patterns=("*.log", "log_*.txt", "logs/*.jsonl", "logs/*.jsonl.*.gz")):
+        """
+        Trains the learned model from the helper answers recorded in past session logs.
+        """
+        log_files = sorted({path for pattern in patterns for path in glob.glob(pattern)})
+        examples = read_training_examples(log_files)
+        with self.lock:
+            for text, label in examples:
+                self.model.learn(text, label)
+        logging.info(f"Intent classifier trained on {len(examples)} examples from {len(log_files)} logs.")
+
+    def learn(self, text, label):
+        """
+        Adds the remote model's answer for a message so the local model keeps improving.
+        Only remote answers are learned, so the model sees the turns the keywords could not decide more often than
+        the obvious ones; local decisions are logged but not learned, so a wrong one cannot reinforce itself.
+        """
+        with self.lock:
+            self.model.learn(text, 1 if label else 0)
+
+    def classify(self, conversation):
+        """
+        Returns False if the latest user turn is clearly not a code update request,
+        or None if the remote model has to decide.
+        """
+        user_messages = [m for m in conversation if m.get("role") == "user"]
+        if not user_messages:
+            return None
+        text = user_messages[-1].get("content") or ""
+        score = keyword_score(text)
+
+        if AFFIRMATION_PATTERN.match(text):
+            # "yes" only means something together with what the assistant proposed
+            previous = [m for m in conversation[:-1] if m.get("role") == "assistant"]
+            if previous:
+                score += keyword_score(previous[-1].get("content"))
+
+        decision = None
+        if score == 0:
+            # Without enough examples the learned probability is not trusted, so the remote model decides
+            with self.lock:
+                trained = self.model.examples() >= self.min_examples
+                probability = self.model.probability(text) if trained else None
+            if trained:
+                logging.info(f"Intent classifier: update probability {probability:.3f}.")
+                if probability < self.threshold:
+                    decision = False
+
+        if decision is None:
+            self.remote_calls += 1
+        else:
+            self.local_decisions += 1
+            logging.info(f"Intent classifier: decided locally that {text!r} is not a code update request.")
+        total = self.local_decisions + self.remote_calls
+        logging.info(
+            f"Intent classifier: keyword score {score:.1f}, {'local' if decision is not None else 'remote'} decision; "
+            f"{self.local_decisions} of {total} remote calls avoided ({100 * self.local_decisions / total:.0f}%)."
+        )
+        return decision
@@ -0,0 +1,109 @@
+import glob  # For discovering test files
+import os  # For CPU count and file sizes
+import time  # For the wall-clock time of a suite run
+from concurrent.futures import ThreadPoolExecutor  # For keeping one test file per worker process running
+
+from results_parser import TestOutputParser  # For the pass/fail counts of each file
+
+
+class FileResult:
+    """
+    Outcome of one test file: the run result, the parsed summary and where the full output was written.
+    """
+
+    def __init__(self, path, log_path, result, parser):
+        self.path = path
+        self.log_path = log_path
+        self.result = result
+        self.parser = parser
+
+    @property
+    def passed(self):
+        return self.result.returncode == 0 and self.result.limit is None
+
+    def summary(self):
+        """
+        Returns one line with the file's counts, exit status and duration.
+        """
+        counts = self.parser.summary() if self.parser.found_summary() else "no test summary"
+        return f"{self.path}: {counts}; {self.result.summary()}"
+
+
+# Function to find the test files in a directory
+def discover_tests(directory='.', pattern='test_*.py'):
+    """
+    Returns the sorted paths of the files in directory matching pattern.
+    """
+    return sorted(path for path in glob.glob(os.path.join(directory, pattern)) if os.path.isfile(path))
+
+
+# Function to run one test file, sending its output to a log file and a parser as it arrives
+def run_test_file(path, runner, log_path=None, **kwargs):
+    """
+    Runs the test file with runner(path, on_line=..., **kwargs), which must return a RunResult,
+    and returns a FileResult. The full output is written to log_path if given.
+    """
+    parser = TestOutputParser()
+    log = open(log_path, 'w') if log_path else None
+    try:
+        def tee(line):
+            if log is not None:
+                log.write(line)
+            parser.feed(line)
+        result = runner(path, on_line=tee, **kwargs)
+    finally:
+        if log is not None:
+            log.close()
+    return FileResult(path, log_path, result, parser)
+
+
+# Function to run test files concurrently
+def run_parallel(paths, runner, workers=None, log_path_for=None, **kwargs):
+    """
+    Runs the test files with up to workers (default: CPU count) running at once, largest files first so
+    long files do not end up last. runner runs one file in a separate process, see run_test_file.
+    log_path_for: callable(path) returning the log file of a test file, or None.
+    Returns (list of FileResult in the order of paths, wall-clock seconds).
+    """
+    workers = workers or os.cpu_count() or 1
+    start = time.monotonic()
+    by_size = sorted(paths, key=lambda path: os.path.getsize(path) if os.path.exists(path) else 0, reverse=True)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(paths)))) as executor:
+        futures = {
+            path: executor.submit(run_test_file, path, runner, log_path_for(path) if log_path_for else None, **kwargs)
+            for path in by_size
+        }
+        results = [futures[path].result() for path in paths]
+    return results, time.monotonic() - start
+
+
+# Function to describe the results of a suite run
+def format_report(results, wall_time, max_failing_files=5):
+    """
+    Returns the totals, the per-file durations (slowest first) and failure excerpts of the failing files.
+    """
+    if not results:
+        return "No test files found."
+    totals = {}
+    for file_result in results:
+        for kind, count in file_result.parser.counts.items():
+            totals[kind] = totals.get(kind, 0) + count
+    failing = [file_result for file_result in results if not file_result.passed]
+    serial_time = sum(file_result.result.duration for file_result in results)
+    lines = [
+        f"{len(results)} test files, {len(failing)} failing: "
+        + ", ".join(f"{count} {kind}" for kind, count in totals.items())
+        + f". Wall time {wall_time:.2f} s for {serial_time:.2f} s of test time.",
+        "",
+        "Per file, slowest first:",
+    ]
+    for file_result in sorted(results, key=lambda file_result: file_result.result.duration, reverse=True):
+        lines.append(f"  {'ok  ' if file_result.passed else 'FAIL'} {file_result.summary()}")
+    for file_result in failing[:max_failing_files]:
+        lines.append("")
+        full_output = f" (full output: {file_result.log_path})" if file_result.log_path else ""
+        lines.append(f"Failures in {file_result.path}{full_output}:")
+        lines.append(file_result.parser.failure_excerpts() or file_result.result.output.rstrip())
+    if len(failing) > max_failing_files:
+        lines.append(f"[{len(failing) - max_failing_files} more failing files not shown]")
+    return "\n".join(lines)
@@ -0,0 +1,157 @@
+import re  # For parsing hunk headers and code fences
+
+HUNK_HEADER_PATTERN = re.compile(r"^@@\s*-(\d+)(?:,(\d+))?\s+\+(\d+)(?:,(\d+))?\s*@@")
+CODE_FENCE_PATTERN = re.compile(r"^```[\w-]*\n(.*?)\n```\s*$", re.DOTALL | re.MULTILINE)
+
+
+class PatchError(Exception):
+    """
+    Raised when a diff from the model cannot be parsed or applied.
+    """
+
+
+# Function to build the prompt asking the model for a diff instead of the whole file
+def build_patch_prompt(requirements, file_name, code):
+    """
+    Returns the user prompt that asks for a unified diff implementing the requirements.
+    """
+    return f"""Update the code in '{file_name}' according to the requirements below.
+
+Requirements:
+
+{requirements}
+
+Code of '{file_name}':
+
+{code}
+
+Reply only with a unified diff against '{file_name}' (--- a/{file_name}, +++ b/{file_name}, @@ hunks with three lines of context).
+Do not repeat unchanged code outside the hunks and do not add any other text."""
+
+
+# Function to remove a markdown code block around the model's reply
+def strip_code_fence(text):
+    """
+    Returns the content of the first markdown code block in the text, or the text itself if there is none.
+    """
+    match = CODE_FENCE_PATTERN.search(text)
+    return match.group(1) if match else text
+
+
+# Function to split a unified diff into files and hunks
+def parse_unified_diff(diff_text):
+    """
+    Parses a unified diff and returns a list of (file_name, hunks).
+    Each hunk is (old_start, old_lines, new_lines); old_start is None if the header had no line numbers.
+    File headers are only recognised once the line counts of the previous hunk header are used up, so a removed
+    '-- ' or added '++ ' line is not taken for one. Lines past the counts still belong to the hunk, since models
+    often get the counts wrong.
+    """
+    files = []
+    hunks = None
+    current = None
+    old_left = new_left = 0  # Lines the current hunk header announced that have not been read yet
+    for line in strip_code_fence(diff_text).splitlines():
+        in_hunk = old_left > 0 or new_left > 0
+        if line.startswith("--- ") and not in_hunk:
+            continue
+        if line.startswith("+++ ") and not in_hunk:
+            file_name = line[4:].split("\t")[0].strip()
+            if file_name.startswith("b/"):
+                file_name = file_name[2:]
+            hunks = []
+            files.append((file_name, hunks))
+            current = None
+            continue
+        if line.startswith("@@") and not in_hunk:
+            if hunks is None:
+                hunks = []
+                files.append((None, hunks))
+            match = HUNK_HEADER_PATTERN.match(line)
+            current = (int(match.group(1)) if match else None, [], [])
+            if match:
+                old_left = int(match.group(2)) if match.group(2) is not None else 1
+                new_left = int(match.group(4)) if match.group(4) is not None else 1
+            hunks.append(current)
+            continue
+        if current is None or line.startswith("\\"):
+            continue  # Text outside hunks or "\ No newline at end of file"
+        marker, content = (line[0], line[1:]) if line else (" ", "")
+        if marker == " ":
+            current[1].append(content)
+            current[2].append(content)
+            old_left, new_left = old_left - 1, new_left - 1
+        elif marker == "-":
+            current[1].append(content)
+            old_left -= 1
+        elif marker == "+":
+            current[2].append(content)
+            new_left -= 1
+        else:
+            # Models sometimes drop the leading space of context lines
+            current[1].append(line)
+            current[2].append(line)
+            old_left, new_left = old_left - 1, new_left - 1
+    if not any(hunks for _, hunks in files):
+        raise PatchError("The reply does not contain any diff hunks.")
+    return files
+
+
+# Function to find where a hunk applies in the file
+def find_hunk(lines, old_lines, expected, start_from):
+    """
+    Returns the index where old_lines occur in lines, searching outward from the expected index.
+    Falls back to comparing lines without trailing whitespace.
+    """
+    # A line number past the end of the file (or before its start) would keep the search from reaching it
+    expected = min(max(expected, start_from), len(lines))
+    for normalize in (lambda line: line, lambda line: line.rstrip()):
+        wanted = [normalize(line) for line in old_lines]
+        size = len(wanted)
+        for distance in range(len(lines) + 1):
+            for index in (expected - distance, expected + distance):
+                if start_from <= index <= len(lines) - size:
+                    if [normalize(line) for line in lines[index:index + size]] == wanted:
+                        return index
+    return None
+
+
+# Function to apply the hunks of one file
+def apply_hunks(text, hunks):
+    """
+    Applies the hunks to the text and returns the patched text.
+    Raises PatchError if a hunk does not match the text.
+    """
+    lines = text.splitlines()
+    position = 0
+    for number, (old_start, old_lines, new_lines) in enumerate(hunks, 1):
+        if not old_lines:
+            # Pure insertion: '@@ -N,0 ...' adds the lines after line N
+            index = min(max(old_start if old_start is not None else position, position), len(lines))
+        else:
+            expected = old_start - 1 if old_start else position
+            index = find_hunk(lines, old_lines, max(expected, position), position)
+        if index is None:
+            raise PatchError(f"Hunk {number} does not match the current code.")
+        lines[index:index + len(old_lines)] = new_lines
+        position = index + len(new_lines)
+    return "\n".join(lines) + ("\n" if text.endswith("\n") or not text else "")
+
+
+# Function to apply a diff from the model to one file and check the result
+def apply_patch(code, diff_text, file_name):
+    """
+    Applies the hunks for file_name (or for an unnamed file) and returns the new code.
+    Raises PatchError if the diff does not apply and SyntaxError if the result does not compile.
+    """
+    hunks = [
+        hunk
+        for name, file_hunks in parse_unified_diff(diff_text)
+        if name is None or name == file_name or name.endswith("/" + file_name)
+        for hunk in file_hunks
+    ]
+    if not hunks:
+        raise PatchError(f"The diff does not change '{file_name}'.")
+    updated_code = apply_hunks(code, hunks)
+    compile(updated_code, file_name, "exec")
+    return updated_code
@@ -0,0 +1,347 @@
+# Replays the chat sessions recorded in the chatbot's logs against a local stand-in for the API.
+# The text logs (e.g. 20241004_211929.log, log_20241004.txt) and the JSON-lines logs (logs/sam.jsonl) are parsed
+# into sessions of user turns, each with the responses and call durations recorded for it. The turns run through
+# chatbot.chat_loop() as in benchmark.py; the stand-in answers every call with the response recorded for it after
+# the recorded time. The local overhead of each turn (its wall time minus the time spent waiting for the API) is
+# reported against the turn number, to show how it grows with the length of the session.
+#
+#   python replay.py --list                                   # the sessions found in the logs
+#   python replay.py --length 200 --time-scale 0 --profile    # the sessions replayed up to 200 turns
+
+import argparse  # For the command line options
+import glob  # For finding the log files
+import gzip  # For reading rotated, compressed logs
+import json  # For JSON-lines logs and the result file
+import os  # For file paths
+import re  # For the records of the text logs
+from datetime import datetime  # For the timestamps of the records
+
+from benchmark import UPDATE_CHECK_PROMPT, StubLLM, run_benchmark, summarize  # For running the turns
+from telemetry import percentile  # For the summary percentiles
+
+LOG_PATTERNS = ("*.log", "log_*.txt", "logs/*.jsonl", "logs/*.jsonl.*.gz")
+RECORD_PATTERN = re.compile(r"^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3}) - (?:[A-Z]+ - )?(.*)$")
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S,%f"
+
+# Messages that start a turn, in the current and older log formats
+USER_PREFIXES = ("User input: ", "User message: ")
+# Messages that carry the answer of an API call, with the kind of call
+RESPONSE_PREFIXES = (
+    ("Helper response: ", "update_check"),
+    ("Assistant checked for code update: ", "update_check"),
+    ("Requirements extracted: ", "requirements"),
+    ("Assistant extracted requirements: ", "requirements"),
+    ("New version determined: ", "version"),
+    ("Assistant response: ", "reply"),
+    ("Received updated code from AI assistant.", "code_update"),
+    ("Received code update diff from AI assistant:\n", "code_update"),
+)
+# Messages logged just before a call is sent
+REQUEST_MESSAGES = (
+    "Checking if code update is needed.",
+    "Extracting new requirements.",
+    "Assistant is preparing requirements.",
+    "Determining new version number.",
+    "Requesting code update from AI assistant.",
+    "Requesting code update diff from AI assistant.",
+)
+# The version answer is logged as "Assistant response: " after this message
+VERSION_REQUEST = "Determining new version number."
+# Call types of the structured "API call" records that are a different kind of call here
+CALL_TYPE_KINDS = {"code_update_full": "code_update", "code_update_diff": "code_update"}
+
+# Start of the system prompt of each kind of call other than the reply
+REQUEST_KINDS = (
+    (UPDATE_CHECK_PROMPT, "update_check"),
+    ("List the new requirements added since the last code update.", "requirements"),
+    ("Determine the next version number", "version"),
+    ("Update the summary of a conversation", "summary"),
+    ("You are a helpful assistant that updates code", "code_update"),
+)
+# Answers for calls that no response was recorded for
+PLACEHOLDERS = {"update_check": "0"}
+PLACEHOLDER_TEXT = "No response was recorded for this call."
+
+
+# Function to turn the timestamp of a log record into seconds
+def parse_time(text):
+    """
+    Returns the timestamp 'YYYY-MM-DD HH:MM:SS,mmm' as seconds since the epoch, or None if it cannot be parsed.
+    """
+    try:
+        return datetime.strptime(text, TIME_FORMAT).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+# Function to read the records of a log file
+def read_log_records(log_file):
+    """
+    Parses a chatbot log, text or JSON lines (optionally gzip-compressed), and returns a list of records
+    {"time", "message", "fields"}. Continuation lines are added to the message of their record, and messages the
+    JSON logs moved to a payload file are read back from it if it still exists.
+    """
+    opener = gzip.open if log_file.endswith(".gz") else open
+    records = []
+    with opener(log_file, 'rt', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if line.startswith("{"):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    entry = None
+                if isinstance(entry, dict) and "message" in entry:
+                    message = entry["message"]
+                    payload = entry.get("payload")
+                    if payload and os.path.exists(payload):
+                        with open(payload, 'r', encoding='utf-8', errors='replace') as p:
+                            message = p.read()
+                    records.append({"time": parse_time(entry.get("time")), "message": message, "fields": entry})
+                    continue
+            match = RECORD_PATTERN.match(line)
+            if match:
+                records.append({"time": parse_time(match.group(1)), "message": match.group(2), "fields": {}})
+            elif records:
+                records[-1]["message"] += "\n" + line  # Continuation line of a multi-line record
+    return records
+
+
+# Function to split the records of a log into sessions of turns
+def parse_sessions(log_file):
+    """
+    Returns the sessions recorded in a log file as a list of {"name", "turns"}, where each turn is
+    {"user_input", "responses"} and responses maps the kind of call to a list of (text, seconds).
+    A text log is one session; a JSON-lines log is split by the session id of its records.
+    The duration of a call is the latency of its structured "API call" record if there is one, otherwise the
+    time from the message that announced it (or the record before its "HTTP Request" line) to its answer.
+    """
+    sessions = []
+    session_id = object()
+    turn = None
+    last_time = call_start = None
+    measured = {}  # kind -> duration of the latest "API call" record not matched to an answer yet
+    version_pending = False
+    for record in read_log_records(log_file):
+        message, fields, time = record["message"], record["fields"], record["time"]
+        if fields.get("session", session_id) != session_id or not sessions:
+            session_id = fields.get("session")
+            name = os.path.basename(log_file) + (f"#{session_id}" if session_id else "")
+            sessions.append({"name": name, "turns": []})
+            turn = None
+        if message.startswith("HTTP Request:"):
+            if call_start is None:
+                call_start = last_time
+            continue
+        if fields.get("call_type") and fields.get("latency_ms") is not None:
+            kind = CALL_TYPE_KINDS.get(fields["call_type"], fields["call_type"])
+            measured[kind] = fields["latency_ms"] / 1000
+            continue
+        user_prefix = next((prefix for prefix in USER_PREFIXES if message.startswith(prefix)), None)
+        if user_prefix:
+            turn = {"user_input": message[len(user_prefix):], "responses": {}}
+            sessions[-1]["turns"].append(turn)
+            measured.clear()
+            version_pending = False
+        elif message in REQUEST_MESSAGES:
+            call_start = None
+            version_pending = version_pending or message == VERSION_REQUEST
+        else:
+            for prefix, kind in RESPONSE_PREFIXES:
+                if message.startswith(prefix):
+                    if kind == "reply" and version_pending:
+                        kind = "version"
+                    if kind == "version":
+                        version_pending = False
+                    seconds = measured.pop(kind, None)
+                    if seconds is None:
+                        start = call_start if call_start is not None else last_time
+                        seconds = time - start if time is not None and start is not None else 0.0
+                    if turn is not None:
+                        turn["responses"].setdefault(kind, []).append((message[len(prefix):], max(seconds, 0.0)))
+                    call_start = None
+                    break
+        if time is not None:
+            last_time = time
+    return [session for session in sessions if session["turns"]]
+
+
+# Function to find the sessions of all the logs
+def find_sessions(patterns=LOG_PATTERNS, directory="."):
+    """
+    Returns the sessions of the log files matching the glob patterns in directory, oldest file first.
+    """
+    log_files = sorted({path for pattern in patterns for path in glob.glob(os.path.join(directory, pattern))},
+                       key=os.path.getmtime)
+    sessions = []
+    for log_file in log_files:
+        sessions.extend(parse_sessions(log_file))
+    return sessions
+
+
+# Function to tell which kind of call a request is
+def request_kind(body):
+    """
+    Returns the kind of call of a chat completion request from the start of its system prompt.
+    """
+    system = next((m.get("content") or "" for m in body.get("messages", []) if m.get("role") == "system"), "")
+    return next((kind for prompt, kind in REQUEST_KINDS if system.startswith(prompt)), "reply")
+
+
+class ReplayLLM(StubLLM):
+    """
+    Stand-in that answers a call made in turn n with the next response of the same kind recorded for the n-th
+    turn, after its recorded duration times time_scale; the whole duration passes before the response starts.
+    Calls that nothing was recorded for, such as the summaries the old loop did not make, get a placeholder
+    after the median recorded duration of their kind and are counted in unrecorded.
+    """
+
+    def __init__(self, turns, time_scale=1.0):
+        super().__init__(latency=0, tokens_per_second=float("inf"))
+        self.turns = turns
+        self.time_scale = time_scale
+        self.remaining = {}  # turn number -> kind -> responses not used yet
+        self.unrecorded = []  # (turn number, kind) of the calls answered with a placeholder
+        durations = {}
+        for turn in turns:
+            for kind, responses in turn["responses"].items():
+                durations.setdefault(kind, []).extend(seconds for _, seconds in responses)
+        every_duration = [seconds for values in durations.values() for seconds in values]
+        self.default_duration = percentile(every_duration, 50) or 0.0
+        self.typical_durations = {kind: percentile(values, 50) for kind, values in durations.items()}
+
+    def respond(self, body):
+        kind = request_kind(body)
+        with self.lock:
+            remaining = self.remaining.setdefault(self.turn, {})
+            if kind not in remaining:
+                recorded = self.turns[self.turn - 1]["responses"] if 0 < self.turn <= len(self.turns) else {}
+                remaining[kind] = list(recorded.get(kind, ()))
+            if remaining[kind]:
+                text, seconds = remaining[kind].pop(0)
+            else:
+                text = PLACEHOLDERS.get(kind, PLACEHOLDER_TEXT)
+                seconds = self.typical_durations.get(kind, self.default_duration)
+                self.unrecorded.append((self.turn, kind))
+        return text, seconds * self.time_scale
+
+
+# Function to measure how the local overhead of a turn changes over a session
+def scaling(results, buckets=10):
+    """
+    Splits the turns into up to buckets consecutive groups and returns (rows, slope). Each row has the turn range,
+    the mean and p95 local time and the mean wall time in milliseconds, and the mean milliseconds per profile
+    category if the turns were profiled. slope is the least-squares growth of the local time in milliseconds per
+    turn, or None with fewer than two turns.
+    """
+    size = max(1, -(-len(results) // buckets))
+    rows = []
+    for first in range(0, len(results), size):
+        group = results[first:first + size]
+        local = [result["local_time"] * 1000 for result in group]
+        row = {
+            "turns": f"{group[0]['turn']}-{group[-1]['turn']}",
+            "local_mean_ms": sum(local) / len(local),
+            "local_p95_ms": percentile(local, 95),
+            "wall_mean_ms": sum(result["wall"] for result in group) * 1000 / len(group),
+        }
+        if "profile" in group[0]:
+            categories = sorted({category for result in group for category in result["profile"]})
+            row["profile_ms"] = {
+                category: sum(result["profile"].get(category, 0) for result in group) * 1000 / len(group)
+                for category in categories
+            }
+        rows.append(row)
+    slope = None
+    if len(results) > 1:
+        turns = [result["turn"] for result in results]
+        local = [result["local_time"] * 1000 for result in results]
+        mean_turn = sum(turns) / len(turns)
+        mean_local = sum(local) / len(local)
+        variance = sum((turn - mean_turn) ** 2 for turn in turns)
+        slope = sum((turn - mean_turn) * (value - mean_local) for turn, value in zip(turns, local)) / variance
+    return rows, slope
+
+
+# Function to print the scaling of the local overhead
+def format_scaling(rows, slope, summary):
+    """
+    Returns the table of the local time by group of turns, with the profile categories as columns if
+    present, followed by the growth per turn and the summary of the run.
+    """
+    categories = sorted({category for row in rows for category in row.get("profile_ms", {})})
+    header = f"{'turns':>9} {'local ms':>9} {'p95 ms':>8} {'wall ms':>9}"
+    header += "".join(f" {category:>10}" for category in categories)
+    lines = [header]
+    for row in rows:
+        line = (f"{row['turns']:>9} {row['local_mean_ms']:>9.1f} {row['local_p95_ms']:>8.1f} "
+                f"{row['wall_mean_ms']:>9.1f}")
+        line += "".join(f" {row['profile_ms'].get(category, 0):>10.2f}" for category in categories)
+        lines.append(line)
+    if categories:
+        lines.append("Profile columns: mean milliseconds per turn of each kind of work on the chat thread (under cProfile).")
+    lines.append("")
+    if slope is not None:
+        first, last = rows[0]["local_mean_ms"], rows[-1]["local_mean_ms"]
+        growth = f", {last / first:.2f}x from the first to the last group" if first else ""
+        lines.append(f"Local time grows by {slope:.3f} ms per turn{growth}.")
+    for key, value in summary.items():
+        lines.append(f"{key:<26} {'-' if value is None else f'{value:.1f}':>10}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the sessions recorded in the chatbot's logs against a stand-in for the API.")
+    parser.add_argument("logs", nargs="*", help=f"Log files (default: {', '.join(LOG_PATTERNS)} next to this script)")
+    parser.add_argument("--list", action="store_true", help="List the recorded sessions and exit")
+    parser.add_argument("--session", type=int, help="Replay only this session of the list (default: all in order)")
+    parser.add_argument("--length", type=int, help="Turns to replay, repeating the sessions (default: their length)")
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="Factor for the recorded durations; 0 replays without waiting for the API")
+    parser.add_argument("--buckets", type=int, default=10, help="Groups of turns in the scaling table")
+    parser.add_argument("--profile", action="store_true", help="Break the local time down by kind of work")
+    parser.add_argument("--output", help="Write the measurements to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="Show the assistant's output")
+    options = parser.parse_args()
+
+    if options.logs:
+        sessions = [session for log_file in options.logs for session in parse_sessions(log_file)]
+    else:
+        sessions = find_sessions(directory=os.path.dirname(os.path.abspath(__file__)))
+    if not sessions:
+        parser.error("no recorded turns were found in the logs")
+    if options.list:
+        for number, session in enumerate(sessions, 1):
+            calls = [seconds for turn in session["turns"] for responses in turn["responses"].values()
+                     for _, seconds in responses]
+            print(f"{number:>3}  {session['name']:<40} {len(session['turns']):>4} turns "
+                  f"{len(calls):>4} calls {sum(calls):>8.1f} s of API time")
+        return
+    if options.session is not None:
+        if not 1 <= options.session <= len(sessions):
+            parser.error(f"--session must be between 1 and {len(sessions)}")
+        sessions = [sessions[options.session - 1]]
+
+    script = [turn for session in sessions for turn in session["turns"]]
+    length = options.length or len(script)
+    turns = [script[index % len(script)] for index in range(length)]
+    stub = ReplayLLM(turns, time_scale=options.time_scale)
+    results = run_benchmark([turn["user_input"] for turn in turns], verbose=options.verbose, stub=stub,
+                            profile=options.profile)
+    summary = summarize(results)
+    rows, slope = scaling(results, options.buckets)
+    print(format_scaling(rows, slope, summary))
+    if stub.unrecorded:
+        kinds = sorted({kind for _, kind in stub.unrecorded})
+        print(f"{len(stub.unrecorded)} calls had no recorded response ({', '.join(kinds)}) and got a placeholder.")
+    if options.output:
+        settings = {"sessions": [session["name"] for session in sessions], "turns": len(results),
+                    "time_scale": options.time_scale, "profile": options.profile}
+        with open(options.output, 'w') as f:
+            json.dump({"settings": settings, "summary": summary, "slope_ms_per_turn": slope, "scaling": rows,
+                       "turns": results}, f, indent=1)
+        print(f"Results written to '{options.output}'.")
+
+
+if __name__ == "__main__":
+    main()
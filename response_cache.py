@@ -0,0 +1,95 @@
+import hashlib  # For hashing the cache keys
+import json  # For serializing the message windows
+import logging  # For logging activities
+import re  # For normalizing whitespace
+import sqlite3  # For the on-disk cache
+import threading  # For sharing the connection between threads
+import time  # For TTL and LRU timestamps
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# Function to build the cache key for a helper prompt
+def cache_key(model, messages):
+    """
+    Returns a hash of the model name and the messages, ignoring differences in whitespace.
+    """
+    normalized = [
+        [message.get("role"), WHITESPACE_PATTERN.sub(" ", message.get("content") or "").strip()]
+        for message in messages
+    ]
+    payload = json.dumps([model, normalized], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent cache of helper responses stored in SQLite, with a TTL and least-recently-used eviction.
+    """
+
+    def __init__(self, path, ttl=24 * 3600, max_entries=1000):
+        """
+        path: SQLite database file.
+        ttl: seconds after which a cached response is no longer used.
+        max_entries: number of responses kept; the least recently used ones are evicted first.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, model TEXT, response TEXT, created REAL, last_used REAL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self.connection.commit()
+
+    def get(self, model, messages):
+        """
+        Returns the cached response for the model and messages, or None if there is no fresh entry.
+        """
+        key = cache_key(model, messages)
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self.connection.commit()
+                self.misses += 1
+                return None
+            self.connection.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self.connection.commit()
+            self.hits += 1
+        logging.info(f"Response cache hit for {model} ({self.hits} hits, {self.misses} misses).")
+        return row[0]
+
+    def put(self, model, messages, response):
+        """
+        Stores the response and evicts expired and least recently used entries.
+        """
+        key = cache_key(model, messages)
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now)
+            )
+            self.connection.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            self.connection.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self.connection.commit()
+
+    def clear(self):
+        """
+        Removes every cached response.
+        """
+        with self.lock:
+            self.connection.execute("DELETE FROM responses")
+            self.connection.commit()
@@ -0,0 +1,120 @@
+import re  # For recognising summary lines and failure headers
+from collections import deque  # For keeping the end of each failure
+
+UNITTEST_RAN_PATTERN = re.compile(r"^Ran (\d+) tests? in ([\d.]+)s")
+UNITTEST_RESULT_PATTERN = re.compile(r"^(OK|FAILED)(?: \((.*)\))?\s*$")
+UNITTEST_FAILURE_PATTERN = re.compile(r"^(FAIL|ERROR): (.+)$")
+PYTEST_SECTION_PATTERN = re.compile(r"^=+ (.+?) =+$")
+PYTEST_FAILURE_PATTERN = re.compile(r"^_{3,} (.+?) _{3,}$")
+PYTEST_SUMMARY_PATTERN = re.compile(r"^=* ?((?:\d+ [\w ]+?, )*\d+ [\w ]+?) in [\d.]+s\b.*?=*$")
+PYTEST_COUNT_PATTERN = re.compile(r"(\d+) (passed|failed|errors?|skipped|xfailed|xpassed|deselected)")
+SEPARATOR_PATTERN = re.compile(r"^[=-]{20,}$")
+
+
+class TestOutputParser:
+    """
+    Reads the output of a unittest or pytest run line by line and collects the pass/fail counts
+    and the end of each failing test's traceback, without keeping the whole output.
+    """
+
+    def __init__(self, max_failures=5, excerpt_lines=25):
+        """
+        max_failures: failing tests for which an excerpt is kept; later failures are only counted.
+        excerpt_lines: last lines kept of each failure.
+        """
+        self.max_failures = max_failures
+        self.excerpt_lines = excerpt_lines
+        self.framework = None
+        self.counts = {"passed": 0, "failed": 0, "errors": 0, "skipped": 0}
+        self.total = None
+        self.failures = []  # (test name, deque of the last lines)
+        self.current = None
+        self.in_pytest_failures = False
+
+    def _start_failure(self, name):
+        if len(self.failures) < self.max_failures:
+            self.current = deque(maxlen=self.excerpt_lines)
+            self.failures.append((name, self.current))
+        else:
+            self.current = None
+
+    def feed(self, line):
+        """
+        Parses one line of output.
+        """
+        line = line.rstrip('\n')
+
+        ran = UNITTEST_RAN_PATTERN.match(line)
+        if ran:
+            self.framework = "unittest"
+            self.total = int(ran.group(1))
+            self.current = None
+            return
+        result = UNITTEST_RESULT_PATTERN.match(line)
+        if result and self.framework == "unittest":
+            details = dict(
+                (key.strip(), int(value))
+                for key, value in (part.split("=") for part in (result.group(2) or "").split(",") if "=" in part)
+            )
+            self.counts["failed"] = details.get("failures", 0) + details.get("unexpected successes", 0)
+            self.counts["errors"] = details.get("errors", 0)
+            self.counts["skipped"] = details.get("skipped", 0) + details.get("expected failures", 0)
+            self.counts["passed"] = self.total - self.counts["failed"] - self.counts["errors"] - self.counts["skipped"]
+            return
+        failure = UNITTEST_FAILURE_PATTERN.match(line)
+        if failure and not self.in_pytest_failures:
+            self._start_failure(f"{failure.group(1)}: {failure.group(2)}")
+            return
+
+        totals = PYTEST_SUMMARY_PATTERN.match(line)
+        if totals:
+            # '=== 1 failed, 2 passed in 0.12s ===', or without the '=' in quiet mode
+            self.framework = "pytest"
+            for count, kind in PYTEST_COUNT_PATTERN.findall(totals.group(1)):
+                key = "errors" if kind.startswith("error") else kind
+                if key in self.counts:
+                    self.counts[key] = int(count)
+            self.total = sum(self.counts.values())
+            self.in_pytest_failures = False
+            self.current = None
+            return
+        section = PYTEST_SECTION_PATTERN.match(line)
+        if section and not SEPARATOR_PATTERN.match(line):
+            self.in_pytest_failures = section.group(1) in ("FAILURES", "ERRORS")
+            self.current = None
+            return
+        if self.in_pytest_failures:
+            header = PYTEST_FAILURE_PATTERN.match(line)
+            if header:
+                self._start_failure(header.group(1))
+                return
+
+        if self.current is not None and not SEPARATOR_PATTERN.match(line):
+            self.current.append(line)
+
+    def found_summary(self):
+        """
+        Returns True if a unittest or pytest summary line was seen.
+        """
+        return self.framework is not None
+
+    def summary(self):
+        """
+        Returns one line with the counts, e.g. '3 passed, 1 failed, 0 errors, 1 skipped'.
+        """
+        return ", ".join(f"{count} {kind}" for kind, count in self.counts.items())
+
+    def failure_excerpts(self):
+        """
+        Returns the excerpts of the failing tests as text.
+        """
+        blocks = []
+        for name, lines in self.failures:
+            excerpt = list(lines)
+            while excerpt and not excerpt[0].strip():
+                excerpt.pop(0)
+            blocks.append(f"{name}\n" + "\n".join(excerpt).rstrip())
+        hidden = self.counts["failed"] + self.counts["errors"] - len(self.failures)
+        if hidden > 0 and len(self.failures) == self.max_failures:
+            blocks.append(f"[{hidden} more failures not shown]")
+        return "\n\n".join(blocks)
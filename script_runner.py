@@ -0,0 +1,242 @@
+import os  # For process groups and waiting with resource usage
+import signal  # For killing scripts that run too long
+import subprocess  # For running scripts in a child process
+import sys  # For the current interpreter and platform
+import threading  # For reading the script's output while waiting for it
+import time  # For durations and timeouts
+from collections import deque  # For keeping the end of long output
+
+try:
+    import resource  # For CPU and memory limits; not available on Windows
+except ImportError:
+    resource = None
+
+
+class BoundedBuffer:
+    """
+    Keeps the beginning and the end of a stream of lines within a byte budget and counts what was dropped in between.
+    """
+
+    def __init__(self, max_bytes=8192):
+        self.head_budget = max_bytes // 2
+        self.tail_budget = max_bytes - self.head_budget
+        self.head = []
+        self.head_bytes = 0
+        self.tail = deque()
+        self.tail_bytes = 0
+        self.dropped_lines = 0
+        self.total_lines = 0
+
+    def add(self, line):
+        """
+        Adds a line. Returns True if it was kept in the beginning of the buffer, False if only the end may keep it.
+        """
+        self.total_lines += 1
+        size = len(line.encode('utf-8', errors='replace'))
+        if not self.tail and self.head_bytes + size <= self.head_budget:
+            self.head.append(line)
+            self.head_bytes += size
+            return True
+        self.tail.append(line)
+        self.tail_bytes += size
+        while self.tail_bytes > self.tail_budget and len(self.tail) > 1:
+            self.tail_bytes -= len(self.tail.popleft().encode('utf-8', errors='replace'))
+            self.dropped_lines += 1
+        return False
+
+    @property
+    def truncated(self):
+        return self.dropped_lines > 0
+
+    def text(self):
+        """
+        Returns the kept output, with a marker where lines were dropped.
+        """
+        lines = list(self.head)
+        if self.dropped_lines:
+            lines.append(f"[... {self.dropped_lines} lines omitted ...]\n")
+        lines.extend(self.tail)
+        return "".join(lines)
+
+
+class RunResult:
+    """
+    Outcome of a script run: exit status, wall-clock duration, peak memory and the captured output.
+    """
+
+    def __init__(self, command, returncode, duration, peak_rss, output, truncated, limit=None):
+        self.command = command
+        self.returncode = returncode  # Negative for a signal on POSIX
+        self.duration = duration  # Seconds
+        self.peak_rss = peak_rss  # Bytes, or None where it cannot be measured
+        self.output = output
+        self.truncated = truncated
+        self.limit = limit  # "wall time", "CPU time" or "memory" if the script was stopped by a limit
+
+    def summary(self):
+        """
+        Returns one line with the exit status, duration and peak memory.
+        """
+        if self.limit:
+            status = f"was stopped after exceeding its {self.limit} limit"
+        else:
+            status = f"exited with status {self.returncode}"
+        memory = f", peak memory {self.peak_rss / 2**20:.1f} MB" if self.peak_rss else ""
+        return f"{status} after {self.duration:.2f} s{memory}"
+
+
+# Code run with python -c that sets the CPU and memory limits and then runs the script like `python script.py`.
+# The limits are set by the child itself because preexec_fn is not safe in a process with threads.
+LIMITED_RUN_CODE = """import os, resource, runpy, sys
+cpu_seconds, memory_bytes = int(sys.argv[1]), int(sys.argv[2])
+if cpu_seconds:
+    # The soft limit sends SIGXCPU, the hard limit one second later kills the script
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+if memory_bytes:
+    resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+del sys.argv[:3]
+sys.path[0] = os.path.dirname(os.path.abspath(sys.argv[0]))
+runpy.run_path(sys.argv[0], run_name="__main__")
+"""
+
+
+# Function to build the command that runs a script with the resource limits
+def limited_command(script_name, args, cpu_seconds, memory_bytes):
+    """
+    Returns the command running the script under LIMITED_RUN_CODE, or a plain python command if there are
+    no limits or the resource module is not available.
+    """
+    if resource is None or (not cpu_seconds and not memory_bytes):
+        return [sys.executable, script_name, *args]
+    return [sys.executable, "-c", LIMITED_RUN_CODE, str(cpu_seconds or 0), str(memory_bytes or 0), script_name, *args]
+
+
+# Function to make the callback that collects the output of a script
+def output_handler(buffer, on_output=None, on_line=None):
+    """
+    Returns a callable(line) that passes every line to on_line and adds it to the buffer. Lines kept at the
+    start of the buffer are passed to on_output as they arrive, followed by one marker once later lines are
+    only kept at the end.
+    """
+    hidden = False
+
+    def handle(line):
+        nonlocal hidden
+        if on_line:
+            on_line(line)
+        if buffer.add(line):
+            if on_output:
+                on_output(line.rstrip('\n'))
+        elif on_output and not hidden:
+            hidden = True
+            on_output("[... further output is only kept at the end ...]")
+
+    return handle
+
+
+# Function to get the peak memory of a child process from its resource usage
+def peak_rss_bytes(usage):
+    """
+    Returns ru_maxrss in bytes; it is in kilobytes on Linux and in bytes on macOS.
+    """
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+
+# Function to tell whether a script was stopped by its CPU or memory limit
+def exceeded_limit(returncode, duration, cpu_seconds, memory_bytes, memory_error):
+    """
+    Returns "CPU time" or "memory" if the exit status shows the script was stopped by that limit, otherwise None.
+    memory_error: whether the output reported a MemoryError.
+    """
+    if resource is None:
+        return None
+    if returncode in (-signal.SIGXCPU, -signal.SIGKILL) and cpu_seconds and duration >= cpu_seconds:
+        return "CPU time"
+    if returncode != 0 and memory_bytes and memory_error:
+        return "memory"
+    return None
+
+
+# Function to wait for a child process with a deadline, returning its exit status and peak memory
+def wait_with_usage(process, deadline):
+    """
+    Waits until the process exits or the deadline (time.monotonic()) passes.
+    Returns (returncode, peak_rss) or None on timeout; peak_rss is None where os.wait4 is not available.
+    """
+    if not hasattr(os, "wait4"):
+        try:
+            return process.wait(timeout=max(0, deadline - time.monotonic())), None
+        except subprocess.TimeoutExpired:
+            return None
+    delay = 0.005
+    while True:
+        pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+        if pid:
+            process.returncode = os.waitstatus_to_exitcode(status)
+            return process.returncode, peak_rss_bytes(usage)
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(delay)
+        delay = min(delay * 2, 0.1)
+
+
+# Function to stop a child process and everything it started
+def kill_process(process):
+    """
+    Kills the process group of the process on POSIX, or the process itself elsewhere.
+    """
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+# Function to run a script in a child process with limits and bounded output capture
+def run_sandboxed(script_name, args=(), wall_timeout=60, cpu_seconds=30, memory_bytes=None,
+                  max_output_bytes=8192, on_output=None, on_line=None, cwd=None):
+    """
+    Runs the Python script with a wall-clock timeout, CPU time and memory limits (where the resource
+    module exists) and captures stdout and stderr into a bounded buffer.
+    on_output: callable(line) called live for each line kept at the start of the output.
+    on_line: callable(line) called for every line of the output, e.g. to write a log file.
+    Returns a RunResult.
+    """
+    command = [sys.executable, script_name, *args]
+    buffer = BoundedBuffer(max_output_bytes)
+    start = time.monotonic()
+    process = subprocess.Popen(
+        limited_command(script_name, args, cpu_seconds, memory_bytes),
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        cwd=cwd,
+        start_new_session=os.name == "posix",  # Own process group, so a timeout also stops its children
+        env={**os.environ, "PYTHONUNBUFFERED": "1"},  # Stream output as it is printed
+    )
+
+    handle_line = output_handler(buffer, on_output, on_line)
+
+    def read_output():
+        for raw_line in process.stdout:
+            handle_line(raw_line.decode('utf-8', errors='replace'))
+
+    reader = threading.Thread(target=read_output, name="script-output", daemon=True)
+    reader.start()
+
+    limit = None
+    waited = wait_with_usage(process, start + wall_timeout)
+    if waited is None:
+        limit = "wall time"
+        kill_process(process)
+        waited = wait_with_usage(process, time.monotonic() + 5) or (process.poll(), None)
+    returncode, peak_rss = waited
+    duration = time.monotonic() - start
+    reader.join(1)
+    process.stdout.close()
+
+    if limit is None:
+        limit = exceeded_limit(returncode, duration, cpu_seconds, memory_bytes, "MemoryError" in buffer.text())
+    return RunResult(command, returncode, duration, peak_rss, buffer.text(), buffer.truncated, limit)
@@ -0,0 +1,166 @@
+import json  # For the session records and the state file
+import logging  # For logging activities
+import os  # For file paths
+import struct  # For the fixed-size entries of the offset index
+import time  # For session ids
+
+from file_utils import write_atomically  # For replacing the state file in one step
+
+INDEX_ENTRY = struct.Struct("<Q")  # Byte offset of one record in the session file
+
+
+class SessionStore:
+    """
+    Append-only store of conversation messages, one JSON line per message.
+    Next to each session file, an index holds the byte offset of every record as a fixed-size entry,
+    so the last N messages are found by reading the last N index entries instead of the whole session.
+    A small state file names the latest session and holds values such as the last code update position.
+    """
+
+    def __init__(self, directory='.sam_sessions'):
+        self.directory = directory
+        self.state_path = os.path.join(directory, "latest.json")
+        self.session_id = None
+        self.file = None
+        self.index = None
+        self.next_seq = 0
+        self.state = {}
+
+    def _paths(self, session_id):
+        base = os.path.join(self.directory, session_id)
+        return base + ".jsonl", base + ".idx"
+
+    def _open(self, session_id):
+        session_path, index_path = self._paths(session_id)
+        self.session_id = session_id
+        self.file = open(session_path, 'ab')
+        self.index = open(index_path, 'ab')
+
+    def _save_state(self):
+        """
+        Writes the state file atomically.
+        """
+        write_atomically(self.state_path, json.dumps({"session": self.session_id, **self.state}))
+
+    def create(self):
+        """
+        Starts a new session and makes it the latest one.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self._open(time.strftime("%Y%m%d_%H%M%S") + f"_{os.getpid()}")
+        self.next_seq = 0
+        self.state = {}
+        self._save_state()
+
+    def resume(self, max_messages):
+        """
+        Reopens the latest session for appending and returns (messages, first_seq, state): its last
+        max_messages messages (never starting with a tool result), the sequence number of the first of them
+        and the saved state. Returns None if there is no session to resume.
+        """
+        try:
+            with open(self.state_path, 'r') as f:
+                state = json.load(f)
+            session_id = state.pop("session")
+            session_path, index_path = self._paths(session_id)
+            index_size = os.path.getsize(index_path)
+        except (OSError, ValueError, KeyError) as e:
+            logging.info(f"No session to resume: {e}")
+            return None
+
+        total = index_size // INDEX_ENTRY.size  # A partly written entry at the end is ignored
+        # The first record is the system message of the old session, which is replaced by the current one
+        first_seq = max(1, total - max_messages)
+        messages = []
+        if total > first_seq:
+            with open(index_path, 'rb') as f:
+                f.seek(first_seq * INDEX_ENTRY.size)
+                (offset,) = INDEX_ENTRY.unpack(f.read(INDEX_ENTRY.size))
+            with open(session_path, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    try:
+                        messages.append(json.loads(line)["message"])
+                    except (ValueError, KeyError):
+                        break  # Torn last record from a crash
+        count = min(total, first_seq + len(messages))  # Complete records
+        # Tool results cannot be sent without the assistant message that called the tools
+        while messages and messages[0].get("role") == "tool":
+            messages.pop(0)
+            first_seq += 1
+
+        self._open(session_id)
+        # Drop index entries and records past the last complete record, so new records line up
+        self.index.truncate(count * INDEX_ENTRY.size)
+        end = 0
+        if count > 0:
+            with open(index_path, 'rb') as f:
+                f.seek((count - 1) * INDEX_ENTRY.size)
+                (last_offset,) = INDEX_ENTRY.unpack(f.read(INDEX_ENTRY.size))
+            with open(session_path, 'rb') as f:
+                f.seek(last_offset)
+                end = last_offset + len(f.readline())
+        self.file.truncate(end)
+        # Appends take the offset of a new record from tell(), which truncate() does not move
+        self.file.seek(0, os.SEEK_END)
+        self.next_seq = count
+        self.state = state
+        logging.info(f"Resumed session {session_id} with {len(messages)} of {count} messages.")
+        return messages, first_seq, state
+
+    def append(self, message):
+        """
+        Appends one message and returns its sequence number.
+        """
+        seq = self.next_seq
+        self.index.write(INDEX_ENTRY.pack(self.file.tell()))
+        self.file.write((json.dumps({"seq": seq, "message": message}) + "\n").encode('utf-8'))
+        self.file.flush()
+        self.index.flush()
+        self.next_seq += 1
+        return seq
+
+    def set_state(self, **values):
+        """
+        Saves values (JSON serializable) to the state file of the latest session.
+        """
+        self.state.update(values)
+        self._save_state()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.index.close()
+            self.file = None
+
+
+class PersistentConversation(list):
+    """
+    Conversation list that writes every message added with append() or extend() to a SessionStore.
+    first_seq is the sequence number of conversation[1]; conversation[0] is the system message.
+    """
+
+    def __init__(self, messages, store, first_seq=1):
+        super().__init__(messages)
+        self.store = store
+        self.first_seq = first_seq
+
+    def append(self, message):
+        self.store.append(message)
+        super().append(message)
+
+    def extend(self, messages):
+        for message in messages:
+            self.append(message)
+
+    def seq_of(self, index):
+        """
+        Returns the sequence number in the session of the message at the given index.
+        """
+        return self.first_seq + index - 1
+
+    def index_of(self, seq):
+        """
+        Returns the index of the message with the given sequence number, clamped to the loaded messages.
+        """
+        return min(max(seq - self.first_seq + 1, 1), len(self))
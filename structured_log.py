@@ -0,0 +1,211 @@
+import atexit  # For writing the queued records on exit
+import gzip  # For compressing rotated log files
+import hashlib  # For naming payload files by their contents
+import json  # For the log records
+import logging  # For the handlers and formatter
+import logging.handlers  # For QueueHandler, QueueListener and RotatingFileHandler
+import os  # For file paths, sizes and ages
+import queue  # For passing records to the writer thread
+import shutil  # For copying a rotated file into its compressed version
+import time  # For the age of the current log file
+
+# Record attributes written as fields of the JSON record when they are set, e.g. with extra={...}
+RECORD_FIELDS = (
+    "session", "turn", "call_type", "model", "latency_ms", "ttft_ms",
+    "prompt_tokens", "completion_tokens", "cost", "attempts",
+)
+
+# Fields added to every record, such as the session and turn ids; see set_context()
+context = {}
+
+
+# Function to set fields added to every following log record
+def set_context(**fields):
+    """
+    Sets fields such as session= and turn= that are added to every record logged from now on.
+    A value of None removes the field.
+    """
+    for key, value in fields.items():
+        if value is None:
+            context.pop(key, None)
+        else:
+            context[key] = value
+
+
+class ContextFilter(logging.Filter):
+    """
+    Adds the current context fields to each record on the thread that logs it, before it is queued.
+    """
+
+    def filter(self, record):
+        for key, value in context.items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+# Function to remove old payload files
+def prune_payloads(payload_dir, max_bytes=None, max_age=None):
+    """
+    Removes payload files last used more than max_age seconds ago, then the least recently used ones until
+    the directory holds at most max_bytes. Returns the bytes still in the directory.
+    """
+    try:
+        entries = [entry for entry in os.scandir(payload_dir) if entry.is_file()]
+    except FileNotFoundError:
+        return 0
+    files = sorted((entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in entries)
+    total = sum(size for _, size, _ in files)
+    now = time.time()
+    for modified, size, path in files:
+        too_old = max_age is not None and now - modified > max_age
+        if not too_old and (max_bytes is None or total <= max_bytes):
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+    return total
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    Formats a record as one JSON object per line. Messages longer than payload_chars are written to a
+    file in payload_dir named by their hash and logged by reference, with the start of the message inline.
+    Payloads not used for payload_max_age seconds are removed, and the least recently used ones once the
+    directory grows past payload_max_bytes, so a reference in an old log may point to a removed file.
+    """
+
+    def __init__(self, payload_dir=None, payload_chars=2000, preview_chars=200, payload_max_bytes=100 * 1024 * 1024,
+                 payload_max_age=None):
+        super().__init__()
+        self.payload_dir = payload_dir
+        self.payload_chars = payload_chars
+        self.preview_chars = preview_chars
+        self.payload_max_bytes = payload_max_bytes
+        self.payload_max_age = payload_max_age
+        self.payload_bytes = None  # Size of the payload directory, measured when the first payload is stored
+
+    def _prune(self):
+        """
+        Applies the payload limits; pruning by size goes down to three quarters of payload_max_bytes, so the
+        directory is not scanned again for every following payload.
+        """
+        target = self.payload_max_bytes * 3 // 4 if self.payload_max_bytes else None
+        self.payload_bytes = prune_payloads(self.payload_dir, target, self.payload_max_age)
+
+    def _store_payload(self, message):
+        """
+        Writes message to the payload directory, once per distinct content, and returns its path.
+        """
+        if self.payload_bytes is None:
+            self._prune()
+        data = message.encode('utf-8')
+        path = os.path.join(self.payload_dir, hashlib.sha256(data).hexdigest()[:16] + ".txt")
+        if os.path.exists(path):
+            os.utime(path)  # Used again, so it is kept longest
+            return path
+        # Pruned before writing, so the new payload is never the one removed
+        if self.payload_max_bytes and self.payload_bytes + len(data) > self.payload_max_bytes:
+            self._prune()
+        os.makedirs(self.payload_dir, exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        self.payload_bytes += len(data)
+        return path
+
+    def format(self, record):
+        message = record.getMessage()
+        entry = {"time": self.formatTime(record), "level": record.levelname}
+        if record.name != "root":
+            entry["logger"] = record.name
+        for field in RECORD_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if self.payload_dir and len(message) > self.payload_chars:
+            try:
+                entry["payload"] = self._store_payload(message)
+                message = message[:self.preview_chars] + f" [{len(message)} characters in {entry['payload']}]"
+            except OSError:
+                pass  # The full message is logged inline
+        entry["message"] = message
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+# Function to compress a rotated log file
+def compress_rotated(source, destination):
+    """
+    Rotator for RotatingJsonLinesHandler: gzips source into destination and removes source.
+    """
+    with open(source, 'rb') as f_in, gzip.open(destination, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+class RotatingJsonLinesHandler(logging.handlers.RotatingFileHandler):
+    """
+    Appends to a log file and rotates it when it reaches max_bytes or is older than max_age seconds,
+    keeping backup_count gzip-compressed old files (name.1.gz is the newest).
+    """
+
+    def __init__(self, filename, max_bytes=10 * 1024 * 1024, max_age=24 * 3600, backup_count=10):
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        self.max_age = max_age
+        self.namer = lambda name: name + ".gz"
+        self.rotator = compress_rotated
+        # Like TimedRotatingFileHandler, the age of an existing file is taken from its last modification
+        started = os.path.getmtime(filename) if os.path.getsize(filename) else time.time()
+        self.rollover_at = started + max_age if max_age else None
+
+    def shouldRollover(self, record):
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        if self.max_age:
+            self.rollover_at = time.time() + self.max_age
+
+
+class LogListener(logging.handlers.QueueListener):
+    """
+    QueueListener that can be stopped more than once, e.g. before a restart and again on exit.
+    """
+
+    def stop(self):
+        if self._thread is not None:
+            super().stop()
+
+
+# Function to send log records through a queue to a writer thread
+def start_logging(filename, level=logging.INFO, max_bytes=10 * 1024 * 1024, max_age=24 * 3600, backup_count=10,
+                  payload_dir=None, payload_chars=2000, payload_max_bytes=100 * 1024 * 1024, payload_max_age=None):
+    """
+    Configures the root logger to put records on a queue; a QueueListener thread formats them as JSON lines
+    and writes them to a rotating file, so logging never waits for the disk. Records still queued are written
+    on exit. Returns the LogListener.
+    """
+    handler = RotatingJsonLinesHandler(filename, max_bytes=max_bytes, max_age=max_age, backup_count=backup_count)
+    handler.setFormatter(JsonLinesFormatter(
+        payload_dir=payload_dir,
+        payload_chars=payload_chars,
+        payload_max_bytes=payload_max_bytes,
+        payload_max_age=payload_max_age
+    ))
+    records = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(records)
+    queue_handler.addFilter(ContextFilter())
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+    listener = LogListener(records, handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
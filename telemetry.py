@@ -0,0 +1,233 @@
+import asyncio  # For recognising cancelled streams
+import json  # For the records on disk
+import logging  # For logging activities
+import os  # For atomic replacement when the file is compacted
+import threading  # For recording calls from the turn pipeline and tool threads
+import time  # For timestamps and time to first token
+from collections import deque  # For the ring buffer of recent calls
+
+PERCENTILES = (50, 95, 99)
+
+
+# Function to compute a percentile of a list of numbers
+def percentile(values, q):
+    """
+    Returns the q-th percentile (0-100) of values with linear interpolation, or None if values is empty.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class Telemetry:
+    """
+    Ring buffer of the latest API calls with their wall time, time to first token, token counts and cost.
+    Each call is also appended to a JSON-lines file; the file is rewritten with only the buffered calls when
+    it grows to twice the capacity, so the statistics survive restarts without the file growing forever.
+    """
+
+    def __init__(self, path=None, capacity=1000, prices=None):
+        """
+        prices: dictionary of model -> (USD per million prompt tokens, USD per million completion tokens).
+        """
+        self.path = path
+        self.capacity = capacity
+        self.prices = prices or {}
+        self.calls = deque(maxlen=capacity)
+        self.lock = threading.Lock()
+        self.lines_on_disk = 0
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    self.lines_on_disk += 1
+                    try:
+                        self.calls.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError as e:
+            logging.warning(f"Could not read the telemetry file '{self.path}': {e}")
+
+    def _compact(self):
+        """
+        Rewrites the file with the buffered calls only.
+        """
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, 'w', encoding='utf-8') as f:
+            for call in self.calls:
+                f.write(json.dumps(call) + "\n")
+        os.replace(temporary_path, self.path)
+        self.lines_on_disk = len(self.calls)
+
+    def configure(self, capacity, prices):
+        """
+        Changes the number of calls kept and the prices, e.g. after the settings were reloaded.
+        """
+        with self.lock:
+            self.prices = prices or {}
+            if capacity != self.capacity:
+                self.capacity = capacity
+                self.calls = deque(self.calls, maxlen=capacity)
+
+    def cost(self, model, prompt_tokens, completion_tokens):
+        """
+        Returns the estimated cost in USD of a call, or None if the model's price or the token counts are unknown.
+        """
+        price = self.prices.get(model)
+        if price is None or prompt_tokens is None or completion_tokens is None:
+            return None
+        return (prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000
+
+    def record(self, call_type, model, wall, ttft=None, prompt_tokens=None, completion_tokens=None, cost=None,
+               status="ok"):
+        """
+        Adds one call and returns its record. status is "ok", "error" or "cancelled".
+        cost: the cost reported by the API, if any; otherwise it is estimated from the token counts.
+        """
+        call = {
+            "time": time.time(),
+            "call_type": call_type,
+            "model": model,
+            "status": status,
+            "wall": round(wall, 4),
+            "ttft": None if ttft is None else round(ttft, 4),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cost": cost if cost is not None else self.cost(model, prompt_tokens, completion_tokens),
+        }
+        with self.lock:
+            self.calls.append(call)
+            if self.path:
+                try:
+                    with open(self.path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(call) + "\n")
+                    self.lines_on_disk += 1
+                    if self.lines_on_disk >= 2 * self.capacity:
+                        self._compact()
+                except OSError as e:
+                    logging.warning(f"Could not write the telemetry file '{self.path}': {e}")
+        return call
+
+    def summary(self):
+        """
+        Returns a dictionary of call type -> statistics of the buffered calls: counts by status, wall time and time to first
+        token percentiles (seconds, of successful calls), token totals and cost total.
+        """
+        with self.lock:
+            calls = list(self.calls)
+        groups = {}
+        for call in calls:
+            groups.setdefault(call["call_type"], []).append(call)
+        summary = {}
+        for call_type, group in groups.items():
+            ok = [call for call in group if call["status"] == "ok"]
+            walls = [call["wall"] for call in ok]
+            ttfts = [call["ttft"] for call in ok if call["ttft"] is not None]
+            summary[call_type] = {
+                "calls": len(group),
+                "errors": sum(call["status"] == "error" for call in group),
+                "cancelled": sum(call["status"] == "cancelled" for call in group),
+                "wall": {q: percentile(walls, q) for q in PERCENTILES},
+                "ttft": {q: percentile(ttfts, q) for q in PERCENTILES},
+                "prompt_tokens": sum(call["prompt_tokens"] or 0 for call in group),
+                "completion_tokens": sum(call["completion_tokens"] or 0 for call in group),
+                "cost": sum(call["cost"] or 0 for call in group),
+            }
+        return summary
+
+    def format_stats(self):
+        """
+        Returns the summary as a text table, one line per call type.
+        """
+        summary = self.summary()
+        if not summary:
+            return "No API calls have been recorded yet."
+
+        def seconds(values):
+            return "/".join("-" if values[q] is None else f"{values[q]:.2f}" for q in PERCENTILES)
+
+        with self.lock:
+            since = time.strftime("%Y-%m-%d %H:%M", time.localtime(self.calls[0]["time"]))
+            count = len(self.calls)
+        lines = [
+            f"Last {count} API calls since {since}. Times in seconds as p50/p95/p99 of successful calls.",
+            f"{'call type':<18} {'calls':>5} {'errors':>6} {'cancelled':>9}  {'wall time':<17} {'first token':<17} {'tokens in/out':<15} {'cost':>8}",
+        ]
+        total_cost = 0
+        for call_type, stats in sorted(summary.items()):
+            total_cost += stats["cost"]
+            tokens = f"{stats['prompt_tokens']}/{stats['completion_tokens']}"
+            lines.append(
+                f"{call_type:<18} {stats['calls']:>5} {stats['errors']:>6} {stats['cancelled']:>9}  {seconds(stats['wall']):<17} "
+                f"{seconds(stats['ttft']):<17} {tokens:<15} ${stats['cost']:>7.4f}"
+            )
+        lines.append(f"Estimated total cost: ${total_cost:.4f}")
+        return "\n".join(lines)
+
+
+# Function to check whether a streamed chunk carries the first output of a reply
+def has_output(chunk):
+    """
+    Returns True if the chat completion chunk contains text or tool call data.
+    """
+    return bool(chunk.choices) and bool(chunk.choices[0].delta.content or chunk.choices[0].delta.tool_calls)
+
+
+# Function to time a streamed response while passing its chunks on
+def measure_stream(stream, start, on_done):
+    """
+    Yields the chunks of a stream. When it ends, calls on_done(ttft, usage, status) with the seconds from start
+    to the first chunk with output, the usage of the final chunk (if the API sent it) and "ok", "error" or
+    "cancelled", then closes the stream.
+    """
+    ttft = None
+    usage = None
+    status = "error"
+    try:
+        for chunk in stream:
+            if ttft is None and has_output(chunk):
+                ttft = time.perf_counter() - start
+            usage = getattr(chunk, "usage", None) or usage
+            yield chunk
+        status = "ok"
+    except GeneratorExit:
+        status = "cancelled"
+        raise
+    finally:
+        on_done(ttft, usage, status)
+        # Releases the HTTP connection of a stream that was not read to the end
+        if hasattr(stream, "close"):
+            stream.close()
+
+
+# Async version of measure_stream
+async def measure_stream_async(stream, start, on_done):
+    """
+    Yields the chunks of an async stream, calling on_done like measure_stream when it ends or is cancelled.
+    """
+    ttft = None
+    usage = None
+    status = "error"
+    try:
+        async for chunk in stream:
+            if ttft is None and has_output(chunk):
+                ttft = time.perf_counter() - start
+            usage = getattr(chunk, "usage", None) or usage
+            yield chunk
+        status = "ok"
+    except (GeneratorExit, asyncio.CancelledError):
+        status = "cancelled"
+        raise
+    finally:
+        on_done(ttft, usage, status)
+        # Releases the HTTP connection of a stream that was not read to the end
+        if hasattr(stream, "close"):
+            await stream.close()
@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from backup_store import BackupStore
+
+
+# Function to make a script text that differs from the others in one line
+def script_text(number):
+    """
+    Returns a 50-line script whose last line depends on number.
+    """
+    return "".join(f"line_{line} = {line}\n" for line in range(49)) + f"version = {number}\n"
+
+
+class BackupStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def blob_files(self):
+        objects_dir = os.path.join(self.directory, "objects")
+        return [name for _, _, names in os.walk(objects_dir) for name in names if name.endswith(".xz")]
+
+    def backdate(self, store):
+        for entry in store.versions:
+            entry["time"] = "2000-01-01T00:00:00"
+
+    def test_identical_content_is_stored_once(self):
+        store = BackupStore(self.directory)
+        first = store.add(script_text(1), "bot.py", label="before update")
+        second = store.add(script_text(1), "bot.py", label="before rollback")
+        self.assertEqual(first["hash"], second["hash"])
+        self.assertEqual((first["version"], second["version"]), (1, 2))
+        self.assertEqual(len(self.blob_files()), 1)
+
+    def test_versions_are_stored_as_deltas_and_read_back(self):
+        store = BackupStore(self.directory, snapshot_every=3)
+        entries = [store.add(script_text(number), "bot.py") for number in range(1, 6)]
+        for number, entry in enumerate(entries, 1):
+            self.assertEqual(store.read(entry["hash"]), script_text(number))
+        depths = [store.blobs[entry["hash"]]["depth"] for entry in entries]
+        self.assertEqual(depths, [0, 1, 2, 0, 1])
+
+    def test_index_survives_reopening(self):
+        store = BackupStore(self.directory)
+        entry = store.add(script_text(1), "bot.py", label="before update")
+        store.set_ref("bot.py:rollback", entry["hash"])
+        reopened = BackupStore(self.directory)
+        self.assertEqual(reopened.get(1)["hash"], entry["hash"])
+        self.assertEqual(reopened.latest("bot.py", label="before update"), entry)
+        self.assertEqual(reopened.get_ref("bot.py:rollback"), entry["hash"])
+        self.assertEqual(reopened.add(script_text(2), "bot.py")["version"], 2)
+
+    def test_prune_keeps_recent_and_referenced_versions(self):
+        store = BackupStore(self.directory, snapshot_every=1, keep_versions=2, keep_days=30)
+        entries = [store.add(script_text(number), "bot.py") for number in range(1, 5)]
+        store.set_ref("bot.py:rollback", entries[0]["hash"])
+        self.backdate(store)
+        newest = store.add(script_text(5), "bot.py")
+        self.assertEqual([entry["version"] for entry in store.versions], [4, 5])
+        self.assertIsNone(store.get(2))
+        # Version 1 is gone from the index but its blob is kept for the rollback reference
+        self.assertEqual(store.read(store.get_ref("bot.py:rollback")), script_text(1))
+        self.assertEqual(sorted(store.blobs), sorted({entries[0]["hash"], entries[3]["hash"], newest["hash"]}))
+        self.assertEqual(len(self.blob_files()), 3)
+
+    def test_prune_keeps_the_bases_of_kept_deltas(self):
+        store = BackupStore(self.directory, snapshot_every=10, keep_versions=1, keep_days=30)
+        entries = [store.add(script_text(number), "bot.py") for number in range(1, 4)]
+        self.backdate(store)
+        store.prune()
+        self.assertEqual([entry["version"] for entry in store.versions], [3])
+        self.assertEqual(store.read(entries[2]["hash"]), script_text(3))
+        self.assertEqual(len(store.blobs), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import threading
+import unittest
+
+from command_executor import CommandExecutor, extract_commands, parse_write_arguments
+from tools import ToolRegistry
+
+
+class ExtractCommandsTest(unittest.TestCase):
+
+    def test_finds_every_command_in_order(self):
+        reply = "Let me look.\n/read notes.txt lines 1-5\n/page f1 next\n/ls\n/execute report.py --fast\n/stats"
+        self.assertEqual(extract_commands(reply), [
+            ("/read notes.txt lines 1-5", "read_file", {"file_path": "notes.txt", "mode": "lines", "start": 1, "end": 5}),
+            ("/page f1 next", "read_page", {"handle_id": "f1", "which": "next"}),
+            ("/ls", "list_files", {}),
+            ("/execute report.py --fast", "run_script", {"script_name": "report.py"}),
+            ("/stats", "show_stats", {}),
+        ])
+
+    def test_ignores_paths_and_urls(self):
+        self.assertEqual(extract_commands("See docs/read and https://example.com/ls for details."), [])
+
+    def test_write_code_is_not_searched_for_commands(self):
+        reply = "/write hello.py\n```python\nprint('/read secrets.txt')\n```\n/execute hello.py"
+        commands = extract_commands(reply)
+        self.assertEqual([name for _, name, _ in commands], ["write_script", "run_script"])
+        self.assertEqual(commands[0][2], {"script_name": "hello.py", "script_code": "print('/read secrets.txt')"})
+
+    def test_command_without_arguments_is_reported(self):
+        self.assertEqual(extract_commands("/execute"), [("/execute", "run_script", None)])
+        self.assertEqual(extract_commands("/write"), [("/write", "write_script", None)])
+
+    def test_parse_write_arguments_without_code_block(self):
+        self.assertEqual(parse_write_arguments("a.py\nx = 1\n"), ("a.py", "x = 1\n", 11))
+        self.assertIsNone(parse_write_arguments("a.py"))
+
+
+class CommandExecutorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = ToolRegistry()
+        self.order = []
+        self.reads_running = 0
+        self.overlapped = False
+        self.lock = threading.Lock()
+        self.both_reads_started = threading.Barrier(2, timeout=5)
+        self.registry.register("read_file", self.read_file, "Reads a file.")
+        self.registry.register("write_script", self.write_script, "Writes a script.", mutating=True)
+
+    def read_file(self, file_path, mode, start, end):
+        with self.lock:
+            self.reads_running += 1
+        try:
+            self.both_reads_started.wait()
+            with self.lock:
+                self.overlapped = self.overlapped or self.reads_running > 1
+                self.order.append(f"read {file_path}")
+        finally:
+            with self.lock:
+                self.reads_running -= 1
+        return f"contents of {file_path}"
+
+    def write_script(self, script_name, script_code):
+        self.order.append(f"write {script_name}")
+        return f"wrote {script_name}"
+
+    def test_reads_run_concurrently_and_writes_in_order(self):
+        reply = "/read a.txt\n/read b.txt\n/write c.py\n```\npass\n```\n"
+        results = CommandExecutor(self.registry).run(reply)
+        self.assertEqual(results, [
+            ("/read a.txt", "contents of a.txt"),
+            ("/read b.txt", "contents of b.txt"),
+            ("/write c.py", "wrote c.py"),
+        ])
+        self.assertTrue(self.overlapped)
+        self.assertEqual(self.order[-1], "write c.py")
+
+    def test_unparsed_and_unknown_commands_return_errors(self):
+        results = CommandExecutor(self.registry).run("/execute\n/ls")
+        self.assertEqual(results, [
+            ("/execute", "Error: could not parse the arguments of this command."),
+            ("/ls", "Error: unknown tool 'list_files'."),
+        ])
+
+    def test_reply_without_commands(self):
+        self.assertEqual(CommandExecutor(self.registry).run("Nothing to do."), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
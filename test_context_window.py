@@ -0,0 +1,93 @@
+import unittest
+
+from context_window import ContextWindow, count_tokens
+
+
+# Function to count tokens in the tests: every message has 10 unless it says otherwise
+def fixed_count(message):
+    """
+    Returns the message's "tokens" value, or 10.
+    """
+    return message.get("tokens", 10)
+
+
+# Function to make a conversation of numbered messages after a system message
+def make_conversation(count, first=1):
+    """
+    Returns the system message followed by count user and assistant messages.
+    """
+    return [{"role": "system", "content": "system"}] + [
+        {"role": "user" if number % 2 else "assistant", "content": f"message {number}"} for number in range(first, first + count)
+    ]
+
+
+class ContextWindowTest(unittest.TestCase):
+
+    def setUp(self):
+        self.summaries = []
+        self.window = ContextWindow(100, self.summarize, min_recent_messages=4, count=fixed_count)
+
+    def summarize(self, previous_summary, messages):
+        self.summaries.append([message["content"] for message in messages])
+        return (previous_summary + " " if previous_summary else "") + f"summary of {len(messages)}"
+
+    def test_conversation_within_budget_is_sent_whole(self):
+        conversation = make_conversation(9)
+        self.assertEqual(self.window.build(conversation), conversation)
+        self.assertEqual(self.summaries, [])
+        self.assertEqual(self.window.total_tokens(conversation), 100)
+
+    def test_slides_to_the_low_watermark_and_summarizes_once(self):
+        conversation = make_conversation(10)
+        messages = self.window.build(conversation)
+        # 90 tokens are available after the system message; the window is trimmed to 75% of them
+        self.assertEqual(self.summaries, [["message 1", "message 2", "message 3", "message 4"]])
+        self.assertEqual(messages[0], conversation[0])
+        self.assertEqual(messages[1], {"role": "system", "content": "Summary of the earlier conversation:\nsummary of 4"})
+        self.assertEqual(messages[2:], conversation[5:])
+
+        # The room left by the low watermark takes the next turn without another summary
+        conversation.extend(make_conversation(2, first=11)[1:])
+        self.assertEqual(self.window.build(conversation)[2:], conversation[5:])
+        self.assertEqual(len(self.summaries), 1)
+
+        # Past the budget again, only the newly evicted messages are added to the summary
+        conversation.extend(make_conversation(2, first=13)[1:])
+        messages = self.window.build(conversation)
+        self.assertEqual(self.summaries[1], ["message 5", "message 6", "message 7", "message 8"])
+        self.assertEqual(messages[1]["content"], "Summary of the earlier conversation:\nsummary of 4 summary of 4")
+        self.assertLessEqual(sum(fixed_count(message) for message in messages), 100)
+
+    def test_latest_messages_are_kept_over_budget(self):
+        conversation = make_conversation(6)
+        for message in conversation[1:]:
+            message["tokens"] = 40
+        messages = self.window.build(conversation)
+        self.assertEqual(messages[2:], conversation[-4:])
+        self.assertEqual(self.summaries, [["message 1", "message 2"]])
+
+    def test_window_never_starts_with_a_tool_result(self):
+        conversation = make_conversation(4) + [
+            {"role": "assistant", "content": "", "tool_calls": [{"id": "call_1", "function": {"name": "list_files", "arguments": "{}"}}]},
+            {"role": "tool", "tool_call_id": "call_1", "content": "a.py"},
+        ] + make_conversation(4, first=5)[1:]
+        conversation[5]["tokens"] = 50
+        messages = self.window.build(conversation)
+        self.assertNotEqual(messages[2]["role"], "tool")
+        # The assistant message that called the tool is summarized together with its result
+        self.assertEqual(self.summaries[0][-2:], ["", "a.py"])
+        self.assertNotIn({"role": "tool", "tool_call_id": "call_1", "content": "a.py"}, messages)
+
+    def test_shorter_conversation_resets_the_window(self):
+        self.window.build(make_conversation(10))
+        conversation = make_conversation(3)
+        self.assertEqual(self.window.build(conversation), conversation)
+        self.assertEqual(self.window.summary, "")
+
+    def test_count_tokens_includes_tool_calls(self):
+        message = {"role": "assistant", "content": "", "tool_calls": [{"function": {"name": "read_file", "arguments": '{"file_path": "notes.txt"}'}}]}
+        self.assertGreater(count_tokens(message), count_tokens({"role": "assistant", "content": ""}))
+
+
+if __name__ == "__main__":
+    unittest.main()
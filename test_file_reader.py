@@ -0,0 +1,113 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from file_reader import FileReader, format_result, parse_page_arguments, parse_read_arguments
+
+
+class FileReaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "numbers.txt")
+        with open(self.path, 'w') as f:
+            f.write("".join(f"line {number:03}\n" for number in range(1, 101)))  # 9 bytes per line
+        self.reader = FileReader(page_bytes=100, max_bytes=400)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_pages_end_at_line_breaks(self):
+        result = self.reader.read_path(self.path)
+        self.assertEqual(result["description"], "page 1")
+        self.assertEqual((result["start"], result["end"]), (0, 99))
+        self.assertTrue(result["text"].endswith("line 011\n"))
+
+    def test_next_and_previous_page(self):
+        handle_id = self.reader.read_path(self.path)["handle"]
+        second = self.reader.page(handle_id, "next")
+        self.assertEqual(second["description"], "page 2")
+        self.assertTrue(second["text"].startswith("line 012\n"))
+        self.assertEqual(self.reader.page(handle_id, "prev")["description"], "page 1")
+
+    def test_numbered_page_and_page_past_the_end(self):
+        handle_id = self.reader.read_path(self.path)["handle"]
+        self.assertTrue(self.reader.page(handle_id, 3)["text"].startswith("line 023\n"))
+        last = self.reader.page(handle_id, 50)
+        self.assertEqual(last["text"], "")
+        self.assertIn("past the end", last["description"])
+
+    def test_line_byte_head_and_tail_ranges(self):
+        self.assertEqual(self.reader.read_path(self.path, "lines", 3, 4)["text"], "line 003\nline 004\n")
+        self.assertEqual(self.reader.read_path(self.path, "bytes", 9, 12)["text"], "line")
+        self.assertEqual(self.reader.read_path(self.path, "head", 2)["text"], "line 001\nline 002\n")
+        self.assertEqual(self.reader.read_path(self.path, "tail", 2)["text"], "line 099\nline 100\n")
+
+    def test_reads_are_capped_at_max_bytes(self):
+        result = self.reader.read_path(self.path, "lines", 1, 100)
+        self.assertTrue(result["truncated"])
+        self.assertEqual(result["end"] - result["start"], 400)
+
+    def test_pages_follow_changes_to_the_file(self):
+        handle_id = self.reader.read_path(self.path)["handle"]
+        with open(self.path, 'w') as f:
+            f.write("short\n")
+        os.utime(self.path, (0, 0))
+        self.assertIn("past the end", self.reader.page(handle_id, 2)["description"])
+        self.assertEqual(self.reader.page(handle_id, 1)["text"], "short\n")
+
+    def test_configure_recomputes_pages(self):
+        handle_id = self.reader.read_path(self.path)["handle"]
+        self.reader.page(handle_id, 2)
+        self.reader.configure(page_bytes=50, max_bytes=400)
+        self.assertTrue(self.reader.page(handle_id, 2)["text"].startswith("line 006\n"))
+
+    def test_reuses_the_handle_of_an_open_file(self):
+        first = self.reader.read_path(self.path)["handle"]
+        self.assertEqual(self.reader.read_path(self.path, "head", 1)["handle"], first)
+
+    def test_missing_file_and_unknown_handle(self):
+        with self.assertRaises(FileNotFoundError):
+            self.reader.read_path(os.path.join(self.directory, "missing.txt"))
+        with self.assertRaises(KeyError):
+            self.reader.page("f99")
+
+    def test_format_result_suggests_the_next_page(self):
+        text = format_result(self.reader.read_path(self.path))
+        self.assertIn("handle f1", text)
+        self.assertIn("/page f1 next", text)
+
+    def test_format_result_names_the_tools_when_tool_calling_is_on(self):
+        text = format_result(self.reader.read_path(self.path), tool_calling=True)
+        self.assertIn("read_page with handle_id 'f1'", text)
+        self.assertNotIn("/page", text)
+
+    def test_directory_is_reported_as_a_directory(self):
+        with self.assertRaises(IsADirectoryError):
+            self.reader.read_path(self.directory)
+
+    @unittest.skipIf(not hasattr(os, "geteuid") or os.geteuid() == 0, "file permissions do not apply to root")
+    def test_unreadable_file_raises_permission_error(self):
+        os.chmod(self.path, 0)
+        self.addCleanup(os.chmod, self.path, 0o644)
+        with self.assertRaises(PermissionError):
+            self.reader.read_path(self.path)
+
+
+class ArgumentParsingTest(unittest.TestCase):
+
+    def test_parse_read_arguments(self):
+        self.assertEqual(parse_read_arguments("notes.txt lines 10-20"), ("notes.txt", "lines", 10, 20))
+        self.assertEqual(parse_read_arguments("'notes.txt' tail 5"), ("notes.txt", "tail", 5, None))
+        self.assertEqual(parse_read_arguments("notes.txt"), ("notes.txt", "page", None, None))
+        self.assertIsNone(parse_read_arguments(""))
+
+    def test_parse_page_arguments(self):
+        self.assertEqual(parse_page_arguments("f2"), ("f2", "next"))
+        self.assertEqual(parse_page_arguments("f2 previous"), ("f2", "prev"))
+        self.assertEqual(parse_page_arguments("f2 7"), ("f2", 7))
+
+
+if __name__ == "__main__":
+    unittest.main()
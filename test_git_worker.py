@@ -0,0 +1,127 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from git import Repo
+
+from git_worker import ChangeTracker, GitWorker
+
+
+class GitRepoTestCase(unittest.TestCase):
+    """
+    Base class that creates a repository with one commit in a temporary directory.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        self.repo = Repo.init(self.directory)
+        with self.repo.config_writer() as config:
+            config.set_value("user", "name", "Test")
+            config.set_value("user", "email", "test@example.com")
+        self.write("readme.md", "readme\n")
+        self.repo.git.add("readme.md")
+        self.repo.index.commit("Initial commit")
+        self.notifications = []
+
+    def write(self, name, text):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def messages(self):
+        return [commit.message for commit in self.repo.iter_commits()]
+
+    def start_worker(self, **kwargs):
+        worker = GitWorker(self.directory, notify=self.notifications.append, **kwargs)
+        self.addCleanup(worker.stop, 10)
+        return worker
+
+
+class GitWorkerTest(GitRepoTestCase):
+
+    def test_commits_queued_together_are_coalesced(self):
+        worker = self.start_worker(coalesce_delay=0.5, push=False)
+        for number in range(3):
+            self.write(f"script_{number}.py", f"print({number})\n")
+            worker.commit(f"Add script {number}")
+        self.assertTrue(worker.flush(10))
+        self.assertEqual(len(self.messages()), 2)
+        self.assertTrue(self.messages()[0].startswith("Add script 0 (+2 more)"))
+        self.assertEqual(self.repo.untracked_files, [])
+
+    def test_commit_only_if_dirty_is_skipped_without_changes(self):
+        worker = self.start_worker(coalesce_delay=0, push=False)
+        worker.commit("Nothing to commit", only_if_dirty=True)
+        self.assertTrue(worker.flush(10))
+        self.assertEqual(self.messages(), ["Initial commit"])
+
+    def test_call_runs_after_pending_commits(self):
+        worker = self.start_worker(coalesce_delay=0, push=False)
+        self.write("notes.txt", "notes\n")
+        worker.commit("Add notes")
+        self.assertEqual(worker.call(lambda repo: repo.head.commit.message, timeout=10), "Add notes")
+
+    def test_failed_push_is_reported_and_retried_later(self):
+        worker = self.start_worker(coalesce_delay=0, push=True)
+        self.write("notes.txt", "notes\n")
+        worker.commit("Add notes")
+        self.assertTrue(worker.flush(10))
+        self.assertEqual(self.messages()[0], "Add notes")
+        self.assertTrue(worker.unpushed)
+        self.assertTrue(any(message.startswith("Git push failed") for message in self.notifications))
+
+
+class ChangeTrackerTest(GitRepoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.manifest = os.path.join(self.directory, ".sam_changes.json")
+        self.write(".gitignore", ".sam_changes.json\ncustom_persona.txt\n")
+        self.repo.git.add(".gitignore")
+        self.repo.index.commit("Ignore local files")
+        self.tracker = ChangeTracker(self.manifest, self.directory)
+
+    def test_only_tracked_and_modified_files_are_staged(self):
+        self.tracker.track(self.write("generated.py", "print(1)\n"))
+        self.write("scratch.py", "print('not written by SAM')\n")
+        self.write("readme.md", "edited by hand\n")
+        worker = self.start_worker(coalesce_delay=0, push=False, tracker=self.tracker)
+        worker.commit("Add generated.py")
+        self.assertTrue(worker.flush(10))
+        committed = self.repo.head.commit.stats.files
+        self.assertEqual(sorted(committed), ["generated.py", "readme.md"])
+        self.assertEqual(self.repo.untracked_files, ["scratch.py"])
+        self.assertEqual(self.tracker.changed_paths(), [])
+
+    def test_ignored_tracked_files_do_not_block_the_commit(self):
+        self.tracker.track(self.write("custom_persona.txt", "persona\n"))
+        self.tracker.track(self.write("generated.py", "print(1)\n"))
+        worker = self.start_worker(coalesce_delay=0, push=False, tracker=self.tracker)
+        worker.commit("Add generated.py")
+        self.assertTrue(worker.flush(10))
+        self.assertEqual(self.notifications, [])
+        self.assertEqual(sorted(self.repo.head.commit.stats.files), ["generated.py"])
+        self.assertEqual(self.tracker.changed_paths(), [])
+
+    def test_changes_are_detected_by_modification_time(self):
+        path = self.write("generated.py", "print(1)\n")
+        self.tracker.track(path)
+        self.assertEqual(self.tracker.changed_paths(), ["generated.py"])
+        self.tracker.mark_committed(["generated.py"])
+        self.assertEqual(self.tracker.changed_paths(), [])
+        os.utime(path, (0, 0))
+        self.assertEqual(self.tracker.changed_paths(), ["generated.py"])
+        os.remove(path)
+        self.tracker.mark_committed(["generated.py"])
+        self.assertEqual(self.tracker.committed, {})
+
+    def test_manifest_keeps_uncommitted_files_across_sessions(self):
+        self.tracker.track(self.write("generated.py", "print(1)\n"))
+        self.assertEqual(ChangeTracker(self.manifest, self.directory).changed_paths(), ["generated.py"])
+
+
+if __name__ == "__main__":
+    unittest.main()
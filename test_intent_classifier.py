@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from intent_classifier import CodeUpdateClassifier, keyword_score, read_training_examples
+
+NOT_UPDATES = [
+    "What is the capital of France?",
+    "Tell me a joke about cats",
+    "How tall is the Eiffel tower?",
+    "Translate good morning into Spanish",
+    "What is the weather like in Paris?",
+]
+UPDATES = [
+    "Please update your code to remember my name",
+    "Add a feature that lists files",
+    "Implement a new command for the weather",
+]
+
+
+# Function to make a conversation that ends with the given user message
+def conversation_with(text, assistant=None):
+    """
+    Returns a conversation with the system message, an optional assistant message and the user message.
+    """
+    messages = [{"role": "system", "content": "system"}]
+    if assistant:
+        messages += [{"role": "user", "content": "Hello"}, {"role": "assistant", "content": assistant}]
+    return messages + [{"role": "user", "content": text}]
+
+
+class CodeUpdateClassifierTest(unittest.TestCase):
+
+    def trained_classifier(self, min_examples=10):
+        classifier = CodeUpdateClassifier(threshold=0.1, min_examples=min_examples)
+        for _ in range(4):
+            for text in NOT_UPDATES:
+                classifier.learn(text, False)
+            for text in UPDATES:
+                classifier.learn(text, True)
+        return classifier
+
+    def test_untrained_model_escalates_every_turn(self):
+        classifier = CodeUpdateClassifier(min_examples=20)
+        self.assertIsNone(classifier.classify(conversation_with("What is the capital of France?")))
+        self.assertEqual((classifier.local_decisions, classifier.remote_calls), (0, 1))
+
+    def test_affirmation_of_a_proposed_change_is_escalated(self):
+        classifier = self.trained_classifier()
+        proposal = "I can update my code to add a command that shows the weather. Shall I?"
+        self.assertIsNone(classifier.classify(conversation_with("Let's do that.", assistant=proposal)))
+        self.assertIsNone(classifier.classify(conversation_with("yes please", assistant=proposal)))
+
+    def test_trained_model_decides_obvious_turns_locally(self):
+        classifier = self.trained_classifier()
+        self.assertIs(classifier.classify(conversation_with("What is the capital of Spain?")), False)
+        self.assertEqual(classifier.local_decisions, 1)
+
+    def test_keywords_are_always_escalated(self):
+        classifier = self.trained_classifier()
+        self.assertIsNone(classifier.classify(conversation_with("Can you fix the bug in your script?")))
+        self.assertGreater(keyword_score("Add a feature to export the chat"), 0)
+        self.assertEqual(keyword_score("What time is it?"), 0)
+
+    def test_conversation_without_user_messages(self):
+        self.assertIsNone(CodeUpdateClassifier().classify([{"role": "system", "content": "system"}]))
+
+
+class ReadTrainingExamplesTest(unittest.TestCase):
+
+    def test_pairs_user_input_with_helper_answer(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "session.log")
+            with open(path, 'w') as f:
+                f.write(
+                    "2024-10-04 21:19:29,123 - INFO - User input: add a feature\n"
+                    "2024-10-04 21:19:30,123 - INFO - Helper response: 1\n"
+                    "2024-10-04 21:20:29,123 - INFO - User input: hello\n"
+                    "second line of the message\n"
+                    "2024-10-04 21:20:30,123 - INFO - Helper response: 0\n"
+                    '{"message": "User input: tell me a joke"}\n'
+                    '{"message": "Helper response: 0"}\n'
+                )
+            self.assertEqual(
+                read_training_examples([path, os.path.join(directory, "missing.log")]),
+                [("add a feature", 1), ("hello", 0), ("tell me a joke", 0)]
+            )
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    unittest.main()
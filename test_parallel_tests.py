@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from parallel_tests import discover_tests, format_report, run_parallel
+from script_runner import run_sandboxed
+
+PASSING_TEST = """import time
+import unittest
+
+
+class SlowTest(unittest.TestCase):
+
+    def test_slow(self):
+        time.sleep(0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
+"""
+
+FAILING_TEST = """import unittest
+
+
+class BrokenTest(unittest.TestCase):
+
+    def test_ok(self):
+        pass
+
+    def test_broken(self):
+        self.assertEqual(1, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
+"""
+
+
+class ParallelTestsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        for name in ("test_a.py", "test_b.py", "test_c.py"):
+            self.write(name, PASSING_TEST)
+        self.write("test_failing.py", FAILING_TEST)
+        self.write("helpers.py", "")
+
+    def write(self, name, code):
+        with open(os.path.join(self.directory, name), 'w') as f:
+            f.write(code)
+
+    def log_path(self, path):
+        return os.path.join(self.directory, os.path.basename(path) + ".log")
+
+    def test_discover_tests(self):
+        names = [os.path.basename(path) for path in discover_tests(self.directory)]
+        self.assertEqual(names, ["test_a.py", "test_b.py", "test_c.py", "test_failing.py"])
+
+    def test_files_run_at_the_same_time(self):
+        paths = discover_tests(self.directory)
+        results, wall_time = run_parallel(paths, run_sandboxed, workers=4, log_path_for=self.log_path)
+        self.assertEqual([file_result.path for file_result in results], paths)
+        self.assertEqual([file_result.passed for file_result in results], [True, True, True, False])
+        self.assertLess(wall_time, sum(file_result.result.duration for file_result in results))
+        with open(self.log_path(paths[3])) as f:
+            self.assertIn("FAILED (failures=1)", f.read())
+
+    def test_report(self):
+        paths = discover_tests(self.directory)
+        results, wall_time = run_parallel(paths, run_sandboxed, workers=4, log_path_for=self.log_path)
+        report = format_report(results, wall_time)
+        self.assertTrue(report.startswith("4 test files, 1 failing: "))
+        self.assertIn("4 passed", report.splitlines()[0])
+        self.assertIn("1 failed", report.splitlines()[0])
+        self.assertIn(f"Failures in {paths[3]} (full output: {self.log_path(paths[3])}):", report)
+        self.assertIn("test_broken", report)
+        self.assertEqual(format_report([], 0), "No test files found.")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+
+from patch_update import PatchError, apply_patch, find_hunk, parse_unified_diff
+
+CODE = "".join(f"value_{number} = {number}\n" for number in range(1, 21))
+
+
+class FindHunkTest(unittest.TestCase):
+
+    def test_finds_hunk_at_expected_line(self):
+        lines = CODE.splitlines()
+        self.assertEqual(find_hunk(lines, ["value_5 = 5", "value_6 = 6"], 4, 0), 4)
+
+    def test_relocates_hunk_with_wrong_line_number(self):
+        lines = CODE.splitlines()
+        self.assertEqual(find_hunk(lines, ["value_15 = 15"], 2, 0), 14)
+        self.assertEqual(find_hunk(lines, ["value_3 = 3"], 17, 0), 2)
+
+    def test_finds_hunk_with_line_number_past_the_end(self):
+        lines = CODE.splitlines()
+        self.assertEqual(find_hunk(lines, ["value_2 = 2"], 500, 0), 1)
+
+    def test_ignores_trailing_whitespace_when_needed(self):
+        lines = ["a = 1   ", "b = 2"]
+        self.assertEqual(find_hunk(lines, ["a = 1", "b = 2"], 0, 0), 0)
+
+    def test_does_not_search_before_start_from(self):
+        lines = CODE.splitlines()
+        self.assertIsNone(find_hunk(lines, ["value_2 = 2"], 10, 5))
+
+
+class ApplyPatchTest(unittest.TestCase):
+
+    def test_applies_hunk_with_shifted_header(self):
+        diff = """--- a/example.py
++++ b/example.py
+@@ -3,3 +3,3 @@
+ value_12 = 12
+-value_13 = 13
++value_13 = 130
+ value_14 = 14
+"""
+        updated = apply_patch(CODE, diff, "example.py")
+        self.assertIn("value_13 = 130\n", updated)
+        self.assertNotIn("value_13 = 13\n", updated)
+        self.assertEqual(len(updated.splitlines()), 20)
+
+    def test_applies_hunks_in_order(self):
+        diff = """@@ -1,2 +1,2 @@
+-value_1 = 1
++value_1 = 10
+ value_2 = 2
+@@ -19,2 +19,3 @@
+ value_19 = 19
+ value_20 = 20
++value_21 = 21
+"""
+        updated = apply_patch(CODE, diff, "example.py")
+        self.assertTrue(updated.startswith("value_1 = 10\n"))
+        self.assertTrue(updated.endswith("value_20 = 20\nvalue_21 = 21\n"))
+
+    def test_accepts_fenced_diff(self):
+        diff = "```diff\n@@ -1,1 +1,1 @@\n-value_1 = 1\n+value_1 = 2\n```"
+        self.assertTrue(apply_patch(CODE, diff, "example.py").startswith("value_1 = 2\n"))
+
+    def test_rejects_hunk_that_does_not_match(self):
+        diff = "@@ -1,1 +1,1 @@\n-missing = 0\n+missing = 1\n"
+        with self.assertRaises(PatchError):
+            apply_patch(CODE, diff, "example.py")
+
+    def test_rejects_diff_for_another_file(self):
+        diff = "--- a/other.py\n+++ b/other.py\n@@ -1,1 +1,1 @@\n-value_1 = 1\n+value_1 = 2\n"
+        with self.assertRaises(PatchError):
+            apply_patch(CODE, diff, "example.py")
+
+    def test_rejects_result_that_does_not_compile(self):
+        diff = "@@ -1,1 +1,1 @@\n-value_1 = 1\n+value_1 = (\n"
+        with self.assertRaises(SyntaxError):
+            apply_patch(CODE, diff, "example.py")
+
+    def test_lines_that_look_like_file_headers_inside_a_hunk(self):
+        code = "text = '''\n-- removed\nkept\n'''\n"
+        diff = """--- a/example.py
++++ b/example.py
+@@ -1,4 +1,4 @@
+ text = '''
+--- removed
++++ added
+ kept
+ '''
+"""
+        self.assertEqual(parse_unified_diff(diff)[0][0], "example.py")
+        self.assertEqual(apply_patch(code, diff, "example.py"), "text = '''\n++ added\nkept\n'''\n")
+
+    def test_file_header_after_a_complete_hunk(self):
+        diff = """--- a/other.py
++++ b/other.py
+@@ -1,1 +1,1 @@
+-value_1 = 1
++value_1 = 2
+--- a/example.py
++++ b/example.py
+@@ -2,1 +2,1 @@
+-value_2 = 2
++value_2 = 3
+"""
+        self.assertEqual([name for name, _ in parse_unified_diff(diff)], ["other.py", "example.py"])
+        self.assertIn("value_1 = 1\nvalue_2 = 3\n", apply_patch(CODE, diff, "example.py"))
+
+    def test_pure_insertion_goes_after_the_named_line(self):
+        diff = "@@ -3,0 +4,1 @@\n+inserted = 0\n"
+        lines = apply_patch(CODE, diff, "example.py").splitlines()
+        self.assertEqual(lines[2:5], ["value_3 = 3", "inserted = 0", "value_4 = 4"])
+        diff = "@@ -0,0 +1,1 @@\n+inserted = 0\n"
+        self.assertTrue(apply_patch(CODE, diff, "example.py").startswith("inserted = 0\nvalue_1 = 1\n"))
+
+    def test_rejects_reply_without_hunks(self):
+        with self.assertRaises(PatchError):
+            parse_unified_diff("I could not make this change.")
+
+
+if __name__ == "__main__":
+    unittest.main()
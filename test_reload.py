@@ -0,0 +1,74 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from update_gate import prepare_directory
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Objects created on the first load that must survive importlib.reload(assistant)
+KEPT_OBJECTS = (
+    "context_window", "file_reader", "intent_classifier", "response_cache", "telemetry", "worker_pool",
+    "backup_store", "script_installer", "chat_loop_installer", "turn_loop", "change_tracker"
+)
+
+# Script run in a copy of the code, so importing assistant does not touch the files of this directory
+RELOAD_CHECK_SCRIPT = """import importlib, json, sys
+import assistant
+kept = {name: getattr(assistant, name) for name in sys.argv[1:]}
+assistant.code_changed = True
+assistant.context_window.summary = "summary before the reload"
+importlib.reload(assistant)
+pending = assistant.apply_settings()
+assistant.helper_completion = lambda messages, **kwargs: "1"
+chat_loop = assistant.choose_update_target("Ask for confirmation before every turn.")
+assistant.helper_completion = lambda messages, **kwargs: "0"
+module = assistant.choose_update_target("Add a tool that lists the git branches.")
+print("RESULT " + json.dumps({
+    "replaced": [name for name, value in kept.items() if getattr(assistant, name) is not value],
+    "code_changed": assistant.code_changed,
+    "summary": assistant.context_window.summary,
+    "pending": pending,
+    "chat_loop": [chat_loop[0], chat_loop[1] is assistant.chat_loop_installer],
+    "module": [module[0], module[1] is assistant.script_installer],
+}), flush=True)
+"""
+
+
+class ReloadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        with open(os.path.join(SOURCE_DIR, "assistant.py")) as f:
+            prepare_directory(SOURCE_DIR, self.directory, "assistant.py", f.read())
+        with open(os.path.join(self.directory, "_reload_check.py"), 'w') as f:
+            f.write(RELOAD_CHECK_SCRIPT)
+
+    def test_first_load_objects_survive_a_reload(self):
+        completed = subprocess.run(
+            [sys.executable, "_reload_check.py", *KEPT_OBJECTS],
+            cwd=self.directory,
+            env={**os.environ, "SAM_OPENROUTER": os.environ.get("SAM_OPENROUTER", "reload-test")},
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+            text=True,
+            timeout=120
+        )
+        self.assertEqual(completed.returncode, 0, completed.stderr)
+        # The assistant's own messages, e.g. about a missing git repository, may come before or after the result
+        result = json.loads(next(line[7:] for line in completed.stdout.splitlines() if line.startswith("RESULT ")))
+        self.assertEqual(result["replaced"], [])
+        self.assertTrue(result["code_changed"])
+        self.assertEqual(result["summary"], "summary before the reload")
+        self.assertEqual(result["pending"], [])
+        self.assertEqual(result["chat_loop"], ["chatbot.py", True])
+        self.assertEqual(result["module"], ["assistant.py", True])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from response_cache import ResponseCache, cache_key
+
+MODEL = "openai/gpt-4o"
+
+
+# Function to make a helper prompt asking about one message
+def prompt(text):
+    """
+    Returns the messages of a helper prompt with the given user message.
+    """
+    return [{"role": "system", "content": "Return '1' or '0'."}, {"role": "user", "content": text}]
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)  # Runs last, after the connections are closed
+        self.path = os.path.join(self.directory, "cache.sqlite")
+        self.now = 1000.0
+        patcher = mock.patch("response_cache.time.time", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def open_cache(self, **kwargs):
+        cache = ResponseCache(self.path, **kwargs)
+        self.addCleanup(cache.connection.close)
+        return cache
+
+    def test_key_ignores_whitespace_but_not_model_or_role(self):
+        self.assertEqual(cache_key(MODEL, prompt("add  a\nfeature ")), cache_key(MODEL, prompt("add a feature")))
+        self.assertNotEqual(cache_key(MODEL, prompt("add a feature")), cache_key("other/model", prompt("add a feature")))
+        self.assertNotEqual(
+            cache_key(MODEL, [{"role": "user", "content": "hi"}]),
+            cache_key(MODEL, [{"role": "assistant", "content": "hi"}])
+        )
+
+    def test_hit_and_miss_counts(self):
+        cache = self.open_cache()
+        self.assertIsNone(cache.get(MODEL, prompt("hello")))
+        cache.put(MODEL, prompt("hello"), "0")
+        self.assertEqual(cache.get(MODEL, prompt("hello ")), "0")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_responses_survive_reopening(self):
+        self.open_cache().put(MODEL, prompt("hello"), "0")
+        self.assertEqual(self.open_cache().get(MODEL, prompt("hello")), "0")
+
+    def test_expired_responses_are_not_used(self):
+        cache = self.open_cache(ttl=60)
+        cache.put(MODEL, prompt("hello"), "0")
+        self.now += 61
+        self.assertIsNone(cache.get(MODEL, prompt("hello")))
+        self.assertEqual(cache.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0], 0)
+
+    def test_least_recently_used_response_is_evicted(self):
+        cache = self.open_cache(max_entries=2)
+        cache.put(MODEL, prompt("first"), "1")
+        self.now += 1
+        cache.put(MODEL, prompt("second"), "2")
+        self.now += 1
+        cache.get(MODEL, prompt("first"))
+        self.now += 1
+        cache.put(MODEL, prompt("third"), "3")
+        self.assertEqual(cache.get(MODEL, prompt("first")), "1")
+        self.assertIsNone(cache.get(MODEL, prompt("second")))
+        self.assertEqual(cache.get(MODEL, prompt("third")), "3")
+
+    def test_clear(self):
+        cache = self.open_cache()
+        cache.put(MODEL, prompt("hello"), "0")
+        cache.clear()
+        self.assertIsNone(cache.get(MODEL, prompt("hello")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+
+import results_parser  # Imported as a module so test runners do not collect TestOutputParser
+
+UNITTEST_OUTPUT = """..F.E.s
+======================================================================
+ERROR: test_load (test_store.StoreTest.test_load)
+----------------------------------------------------------------------
+Traceback (most recent call last):
+  File "test_store.py", line 12, in test_load
+KeyError: 'missing'
+
+======================================================================
+FAIL: test_save (test_store.StoreTest.test_save)
+----------------------------------------------------------------------
+Traceback (most recent call last):
+  File "test_store.py", line 20, in test_save
+AssertionError: 1 != 2
+
+----------------------------------------------------------------------
+Ran 7 tests in 0.012s
+
+FAILED (failures=1, errors=1, skipped=1)
+"""
+
+PYTEST_OUTPUT = """============================= test session starts ==============================
+collected 5 items
+
+test_store.py ..F.s                                                       [100%]
+
+=================================== FAILURES ===================================
+__________________________________ test_save ___________________________________
+
+    def test_save():
+>       assert 1 == 2
+E       assert 1 == 2
+
+test_store.py:20: AssertionError
+=========================== short test summary info ============================
+FAILED test_store.py::test_save - assert 1 == 2
+==================== 1 failed, 3 passed, 1 skipped in 0.05s ====================
+"""
+
+
+# Function to feed a whole output to a new parser
+def parse(output, **kwargs):
+    """
+    Returns a TestOutputParser that has read every line of output.
+    """
+    parser = results_parser.TestOutputParser(**kwargs)
+    for line in output.splitlines(keepends=True):
+        parser.feed(line)
+    return parser
+
+
+class UnittestOutputTest(unittest.TestCase):
+
+    def test_counts(self):
+        parser = parse(UNITTEST_OUTPUT)
+        self.assertTrue(parser.found_summary())
+        self.assertEqual(parser.framework, "unittest")
+        self.assertEqual(parser.total, 7)
+        self.assertEqual(parser.summary(), "4 passed, 1 failed, 1 errors, 1 skipped")
+
+    def test_failure_excerpts(self):
+        excerpts = parse(UNITTEST_OUTPUT).failure_excerpts()
+        self.assertIn("ERROR: test_load (test_store.StoreTest.test_load)", excerpts)
+        self.assertIn("KeyError: 'missing'", excerpts)
+        self.assertIn("FAIL: test_save (test_store.StoreTest.test_save)", excerpts)
+        self.assertIn("AssertionError: 1 != 2", excerpts)
+        self.assertNotIn("Ran 7 tests", excerpts)
+
+    def test_passing_run(self):
+        parser = parse("....\n----------------------------------------------------------------------\nRan 4 tests in 0.001s\n\nOK\n")
+        self.assertEqual(parser.summary(), "4 passed, 0 failed, 0 errors, 0 skipped")
+        self.assertEqual(parser.failure_excerpts(), "")
+
+    def test_only_the_first_failures_are_kept(self):
+        output = "".join(
+            f"======================================================================\nFAIL: test_{number}\n"
+            f"----------------------------------------------------------------------\nAssertionError\n\n"
+            for number in range(4)
+        ) + "Ran 4 tests in 0.001s\n\nFAILED (failures=4)\n"
+        excerpts = parse(output, max_failures=2).failure_excerpts()
+        self.assertIn("FAIL: test_1", excerpts)
+        self.assertNotIn("FAIL: test_2", excerpts)
+        self.assertIn("[2 more failures not shown]", excerpts)
+
+
+class PytestOutputTest(unittest.TestCase):
+
+    def test_counts(self):
+        parser = parse(PYTEST_OUTPUT)
+        self.assertEqual(parser.framework, "pytest")
+        self.assertEqual(parser.total, 5)
+        self.assertEqual(parser.summary(), "3 passed, 1 failed, 0 errors, 1 skipped")
+
+    def test_failure_excerpts(self):
+        excerpts = parse(PYTEST_OUTPUT).failure_excerpts()
+        self.assertTrue(excerpts.startswith("test_save\n"))
+        self.assertIn("E       assert 1 == 2", excerpts)
+        self.assertNotIn("short test summary info", excerpts)
+
+    def test_quiet_summary_line(self):
+        parser = parse("..E\n2 passed, 1 error in 0.03s\n")
+        self.assertEqual(parser.summary(), "2 passed, 0 failed, 1 errors, 0 skipped")
+
+    def test_output_without_summary(self):
+        parser = parse("Traceback (most recent call last):\nImportError: no module named store\n")
+        self.assertFalse(parser.found_summary())
+
+
+if __name__ == "__main__":
+    unittest.main()
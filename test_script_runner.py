@@ -0,0 +1,93 @@
+import os
+import shutil
+import signal
+import tempfile
+import unittest
+
+from script_runner import BoundedBuffer, RunResult, exceeded_limit, output_handler, resource, run_sandboxed
+
+
+class BoundedBufferTest(unittest.TestCase):
+
+    def test_short_output_is_kept_whole(self):
+        buffer = BoundedBuffer(100)
+        for number in range(3):
+            self.assertTrue(buffer.add(f"line {number}\n"))
+        self.assertEqual(buffer.text(), "line 0\nline 1\nline 2\n")
+        self.assertFalse(buffer.truncated)
+
+    def test_middle_of_long_output_is_dropped(self):
+        buffer = BoundedBuffer(40)  # 20 bytes for the start, 20 for the end, 7 bytes per line
+        for number in range(10):
+            buffer.add(f"line {number}\n")
+        self.assertTrue(buffer.truncated)
+        self.assertEqual(buffer.total_lines, 10)
+        self.assertEqual(buffer.text(), "line 0\nline 1\n[... 6 lines omitted ...]\nline 8\nline 9\n")
+
+
+class OutputHandlerTest(unittest.TestCase):
+
+    def test_live_output_stops_with_one_marker(self):
+        shown, logged = [], []
+        handle = output_handler(BoundedBuffer(20), shown.append, logged.append)
+        for number in range(5):
+            handle(f"line {number}\n")
+        self.assertEqual(shown, ["line 0", "[... further output is only kept at the end ...]"])
+        self.assertEqual(len(logged), 5)
+
+
+class ExceededLimitTest(unittest.TestCase):
+
+    @unittest.skipIf(resource is None, "limits are only reported where the resource module exists")
+    def test_limits(self):
+        self.assertEqual(exceeded_limit(-signal.SIGXCPU, 2.5, 2, None, False), "CPU time")
+        self.assertIsNone(exceeded_limit(-signal.SIGKILL, 0.1, 2, None, False))
+        self.assertEqual(exceeded_limit(1, 0.1, 2, 2 ** 30, True), "memory")
+        self.assertIsNone(exceeded_limit(1, 0.1, 2, None, True))
+        self.assertIsNone(exceeded_limit(0, 3, 2, 2 ** 30, False))
+
+
+class RunSandboxedTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write_script(self, code):
+        path = os.path.join(self.directory, "script.py")
+        with open(path, 'w') as f:
+            f.write(code)
+        return path
+
+    def test_output_and_exit_status(self):
+        script = self.write_script("import sys\nprint('out')\nprint('err', file=sys.stderr)\nsys.exit(2)\n")
+        result = run_sandboxed(script)
+        self.assertEqual(result.returncode, 2)
+        self.assertEqual(sorted(result.output.splitlines()), ["err", "out"])
+        self.assertIsNone(result.limit)
+        self.assertIn("exited with status 2", result.summary())
+
+    def test_wall_timeout(self):
+        result = run_sandboxed(self.write_script("import time\ntime.sleep(30)\n"), wall_timeout=0.5)
+        self.assertEqual(result.limit, "wall time")
+        self.assertLess(result.duration, 10)
+
+    @unittest.skipIf(resource is None, "limits need the resource module")
+    def test_cpu_limit(self):
+        result = run_sandboxed(self.write_script("while True:\n    pass\n"), wall_timeout=20, cpu_seconds=1)
+        self.assertEqual(result.limit, "CPU time")
+
+    @unittest.skipIf(resource is None, "limits need the resource module")
+    def test_memory_limit(self):
+        script = self.write_script("data = bytearray(2 * 1024 ** 3)\n")
+        result = run_sandboxed(script, memory_bytes=512 * 1024 ** 2)
+        self.assertEqual(result.limit, "memory")
+        self.assertIn("was stopped after exceeding its memory limit", result.summary())
+
+    def test_summary_with_peak_memory(self):
+        result = RunResult(["python", "x.py"], 0, 1.5, 3 * 2 ** 20, "", False)
+        self.assertEqual(result.summary(), "exited with status 0 after 1.50 s, peak memory 3.0 MB")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from session_store import INDEX_ENTRY, PersistentConversation, SessionStore
+
+SYSTEM_MESSAGE = {"role": "system", "content": "You are a helpful assistant."}
+
+
+class SessionStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = SessionStore(self.directory)
+        self.store.create()
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.directory)
+
+    def messages(self, count):
+        return [{"role": "user" if number % 2 else "assistant", "content": f"message {number}"} for number in range(1, count + 1)]
+
+    def session_paths(self):
+        return self.store._paths(self.store.session_id)
+
+    def reopen(self, max_messages=100):
+        self.store.close()
+        self.store = SessionStore(self.directory)
+        return self.store.resume(max_messages)
+
+    def test_resume_returns_the_last_messages(self):
+        conversation = PersistentConversation([], self.store)
+        conversation.append(SYSTEM_MESSAGE)  # Record 0 is the system message, as in chatbot.py
+        conversation.extend(self.messages(6))
+        self.store.set_state(last_update_seq=3)
+        messages, first_seq, state = self.reopen(max_messages=4)
+        self.assertEqual([message["content"] for message in messages], ["message 3", "message 4", "message 5", "message 6"])
+        self.assertEqual(first_seq, 3)
+        self.assertEqual(state, {"last_update_seq": 3})
+
+    def test_resume_never_starts_with_a_tool_result(self):
+        self.store.append(SYSTEM_MESSAGE)
+        for message in self.messages(2) + [{"role": "tool", "tool_call_id": "call_1", "content": "done"}, {"role": "assistant", "content": "finished"}]:
+            self.store.append(message)
+        messages, first_seq, _ = self.reopen(max_messages=2)
+        self.assertEqual(messages, [{"role": "assistant", "content": "finished"}])
+        self.assertEqual(first_seq, 4)
+
+    def test_torn_record_is_dropped_and_appends_line_up(self):
+        self.store.append(SYSTEM_MESSAGE)
+        for message in self.messages(3):
+            self.store.append(message)
+        session_path, index_path = self.session_paths()
+        # A crash while writing the fourth message: its index entry and half of its record were written
+        with open(index_path, 'ab') as f:
+            f.write(INDEX_ENTRY.pack(os.path.getsize(session_path)))
+        with open(session_path, 'ab') as f:
+            f.write(b'{"seq": 4, "message": {"role": "us')
+
+        messages, first_seq, _ = self.reopen()
+        self.assertEqual([message["content"] for message in messages], ["message 1", "message 2", "message 3"])
+        self.assertEqual(first_seq, 1)
+        self.assertEqual(self.store.append({"role": "user", "content": "after the crash"}), 4)
+
+        messages, _, _ = self.reopen()
+        self.assertEqual(messages[-1], {"role": "user", "content": "after the crash"})
+        self.assertEqual(len(messages), 4)
+
+    def test_message_appended_after_a_torn_record_is_found_by_its_index_entry(self):
+        self.store.append(SYSTEM_MESSAGE)
+        for message in self.messages(3):
+            self.store.append(message)
+        session_path, index_path = self.session_paths()
+        with open(session_path, 'ab') as f:
+            f.write(b'{"seq": 4, "message": {"role": "user", "content": "lost in the cr')
+
+        self.reopen()
+        self.store.append({"role": "user", "content": "after the crash"})
+        # Only the last index entry is read, so it must point at the new record itself
+        messages, first_seq, _ = self.reopen(max_messages=1)
+        self.assertEqual(messages, [{"role": "user", "content": "after the crash"}])
+        self.assertEqual(first_seq, 4)
+
+    def test_state_file_is_replaced_in_one_step(self):
+        self.store.set_state(last_update_seq=7)
+        self.assertEqual(sorted(os.listdir(self.directory)), sorted(["latest.json", *map(os.path.basename, self.session_paths())]))
+        self.assertEqual(self.reopen()[2], {"last_update_seq": 7})
+
+    def test_partial_index_entry_is_ignored(self):
+        self.store.append(SYSTEM_MESSAGE)
+        self.store.append({"role": "user", "content": "hello"})
+        _, index_path = self.session_paths()
+        with open(index_path, 'ab') as f:
+            f.write(b'\x01\x02\x03')
+        messages, _, _ = self.reopen()
+        self.assertEqual(messages, [{"role": "user", "content": "hello"}])
+        self.assertEqual(os.path.getsize(index_path), 2 * INDEX_ENTRY.size)
+
+    def test_nothing_to_resume(self):
+        self.assertIsNone(SessionStore(os.path.join(self.directory, "empty")).resume(10))
+
+    def test_sequence_numbers_of_a_resumed_conversation(self):
+        conversation = PersistentConversation([SYSTEM_MESSAGE] + self.messages(3), self.store, first_seq=5)
+        self.assertEqual(conversation.seq_of(1), 5)
+        self.assertEqual(conversation.index_of(7), 3)
+        self.assertEqual(conversation.index_of(1), 1)
+        self.assertEqual(conversation.index_of(100), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
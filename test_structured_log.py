@@ -0,0 +1,117 @@
+import gzip
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import structured_log
+from structured_log import JsonLinesFormatter, RotatingJsonLinesHandler, prune_payloads
+
+
+# Function to make a log record with extra fields
+def make_record(message, **fields):
+    """
+    Returns an INFO record of the root logger with the given message and attributes.
+    """
+    record = logging.LogRecord("root", logging.INFO, __file__, 1, message, None, None)
+    for key, value in fields.items():
+        setattr(record, key, value)
+    return record
+
+
+class StructuredLogTestCase(unittest.TestCase):
+    """
+    Base class with a temporary directory for logs and payloads.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.payload_dir = os.path.join(self.directory, "payloads")
+
+    def payload_files(self):
+        return sorted(os.listdir(self.payload_dir))
+
+
+class FormatterTest(StructuredLogTestCase):
+
+    def test_fields_and_context(self):
+        structured_log.set_context(session="s1", turn=4)
+        self.addCleanup(structured_log.set_context, session=None, turn=None)
+        record = make_record("API call", call_type="reply", latency_ms=120)
+        structured_log.ContextFilter().filter(record)
+        entry = json.loads(JsonLinesFormatter().format(record))
+        self.assertEqual(entry["message"], "API call")
+        self.assertEqual((entry["session"], entry["turn"]), ("s1", 4))
+        self.assertEqual((entry["call_type"], entry["latency_ms"]), ("reply", 120))
+        self.assertNotIn("model", entry)
+
+    def test_long_messages_are_logged_by_reference(self):
+        formatter = JsonLinesFormatter(payload_dir=self.payload_dir, payload_chars=100, preview_chars=10)
+        message = "x" * 500
+        first = json.loads(formatter.format(make_record(message)))
+        second = json.loads(formatter.format(make_record(message)))
+        self.assertEqual(first["payload"], second["payload"])
+        self.assertTrue(first["message"].startswith("x" * 10 + " [500 characters in "))
+        with open(first["payload"]) as f:
+            self.assertEqual(f.read(), message)
+        self.assertEqual(len(self.payload_files()), 1)
+
+
+class PayloadRetentionTest(StructuredLogTestCase):
+
+    def write_payload(self, name, size, age):
+        os.makedirs(self.payload_dir, exist_ok=True)
+        path = os.path.join(self.payload_dir, name)
+        with open(path, 'w') as f:
+            f.write("x" * size)
+        modified = time.time() - age
+        os.utime(path, (modified, modified))
+
+    def test_prune_by_age_and_size(self):
+        self.write_payload("old.txt", 100, 3600)
+        self.write_payload("older.txt", 100, 7200)
+        self.write_payload("new.txt", 100, 0)
+        self.assertEqual(prune_payloads(self.payload_dir, max_age=5000), 200)
+        self.assertEqual(self.payload_files(), ["new.txt", "old.txt"])
+        self.assertEqual(prune_payloads(self.payload_dir, max_bytes=150), 100)
+        self.assertEqual(self.payload_files(), ["new.txt"])
+        self.assertEqual(prune_payloads(os.path.join(self.directory, "missing")), 0)
+
+    def test_formatter_keeps_the_directory_under_its_cap(self):
+        formatter = JsonLinesFormatter(payload_dir=self.payload_dir, payload_chars=100, payload_max_bytes=1000)
+        for number in range(10):
+            last = json.loads(formatter.format(make_record(str(number) * 300)))
+        total = sum(os.path.getsize(os.path.join(self.payload_dir, name)) for name in self.payload_files())
+        self.assertLessEqual(total, 1000)
+        self.assertEqual(formatter.payload_bytes, total)
+        self.assertTrue(os.path.exists(last["payload"]))
+
+    def test_old_payloads_are_removed_when_logging_starts(self):
+        self.write_payload("stale.txt", 10, 7200)
+        formatter = JsonLinesFormatter(payload_dir=self.payload_dir, payload_chars=100, payload_max_age=3600)
+        formatter.format(make_record("y" * 200))
+        self.assertNotIn("stale.txt", self.payload_files())
+        self.assertEqual(len(self.payload_files()), 1)
+
+
+class RotationTest(StructuredLogTestCase):
+
+    def test_rotated_files_are_compressed(self):
+        path = os.path.join(self.directory, "logs", "sam.jsonl")
+        handler = RotatingJsonLinesHandler(path, max_bytes=200, max_age=0, backup_count=2)
+        self.addCleanup(handler.close)
+        handler.setFormatter(JsonLinesFormatter())
+        for number in range(20):
+            handler.emit(make_record(f"message {number}"))
+        self.assertTrue(os.path.exists(path + ".1.gz"))
+        self.assertFalse(os.path.exists(path + ".3.gz"))
+        with gzip.open(path + ".1.gz", 'rt') as f:
+            self.assertTrue(all(json.loads(line)["message"].startswith("message") for line in f))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from telemetry import Telemetry, measure_stream, measure_stream_async, percentile
+
+PRICES = {"openai/gpt-4o": (2.5, 10.0)}
+
+
+# Function to make a streamed chat completion chunk
+def chunk(content=None, usage=None):
+    """
+    Returns an object shaped like a chat completion chunk with the given text and usage.
+    """
+    delta = SimpleNamespace(content=content, tool_calls=None)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=usage)
+
+
+class FakeStream:
+    """
+    Stream of chunks that records whether it was closed.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeAsyncStream(FakeStream):
+    """
+    Async stream that waits before each chunk, so it can be cancelled while it is read.
+    """
+
+    async def __aiter__(self):
+        for item in self.chunks:
+            await asyncio.sleep(0.01)
+            yield item
+
+    async def close(self):
+        self.closed = True
+
+
+class TelemetryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "telemetry.jsonl")
+
+    def test_percentile(self):
+        self.assertIsNone(percentile([], 50))
+        self.assertEqual(percentile([4, 1, 3, 2], 50), 2.5)
+        self.assertEqual(percentile([1, 2, 3], 99), 2.98)
+
+    def test_summary_counts_tokens_and_cost(self):
+        telemetry = Telemetry(prices=PRICES)
+        telemetry.record("reply", "openai/gpt-4o", 1.0, ttft=0.2, prompt_tokens=1000, completion_tokens=100)
+        telemetry.record("reply", "openai/gpt-4o", 3.0, status="error")
+        telemetry.record("reply", "other/model", 2.0, prompt_tokens=10, completion_tokens=10, cost=0.5)
+        stats = telemetry.summary()["reply"]
+        self.assertEqual((stats["calls"], stats["errors"], stats["cancelled"]), (3, 1, 0))
+        self.assertEqual(stats["wall"][50], 1.5)  # Only successful calls
+        self.assertEqual((stats["prompt_tokens"], stats["completion_tokens"]), (1010, 110))
+        self.assertAlmostEqual(stats["cost"], 0.0035 + 0.5)
+        self.assertIn("Estimated total cost: $0.5035", telemetry.format_stats())
+
+    def test_calls_survive_a_restart_and_the_file_is_compacted(self):
+        telemetry = Telemetry(self.path, capacity=3)
+        for number in range(6):
+            telemetry.record("helper", "openai/gpt-4o", number)
+        with open(self.path) as f:
+            self.assertEqual(len(f.readlines()), 3)
+        reloaded = Telemetry(self.path, capacity=3)
+        self.assertEqual([call["wall"] for call in reloaded.calls], [3, 4, 5])
+
+
+class MeasureStreamTest(unittest.TestCase):
+
+    def setUp(self):
+        self.done = []
+
+    def on_done(self, ttft, usage, status):
+        self.done.append((ttft is not None, usage, status))
+
+    def test_stream_read_to_the_end(self):
+        stream = FakeStream([chunk(), chunk("Hello"), chunk(usage="usage")])
+        self.assertEqual(len(list(measure_stream(stream, 0, self.on_done))), 3)
+        self.assertEqual(self.done, [(True, "usage", "ok")])
+        self.assertTrue(stream.closed)
+
+    def test_abandoned_stream_is_closed(self):
+        stream = FakeStream([chunk("Hello"), chunk("world")])
+        chunks = measure_stream(stream, 0, self.on_done)
+        next(chunks)
+        chunks.close()
+        self.assertEqual(self.done, [(True, None, "cancelled")])
+        self.assertTrue(stream.closed)
+
+    def test_cancelled_async_stream_is_closed(self):
+        stream = FakeAsyncStream([chunk("Hello")] * 100)
+
+        async def read():
+            async for _ in measure_stream_async(stream, 0, self.on_done):
+                pass
+
+        async def run():
+            task = asyncio.create_task(read())
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run())
+        self.assertEqual(self.done, [(True, None, "cancelled")])
+        self.assertTrue(stream.closed)
+
+    def test_async_stream_read_to_the_end(self):
+        stream = FakeAsyncStream([chunk("Hello"), chunk(usage="usage")])
+
+        async def read():
+            return [item async for item in measure_stream_async(stream, 0, self.on_done)]
+
+        self.assertEqual(len(asyncio.run(read())), 2)
+        self.assertEqual(self.done, [(True, "usage", "ok")])
+        self.assertTrue(stream.closed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import json
+import threading
+import unittest
+
+from tools import ToolRegistry
+
+
+# Function to make a tool call in the API format
+def tool_call(call_id, name, arguments):
+    """
+    Returns a tool call as found in an assistant message; arguments is a dictionary or a raw string.
+    """
+    if not isinstance(arguments, str):
+        arguments = json.dumps(arguments)
+    return {"id": call_id, "type": "function", "function": {"name": name, "arguments": arguments}}
+
+
+class ToolRegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.confirmations = []
+        self.allow = True
+        self.registry = ToolRegistry(confirm=self.confirm)
+        self.registry.register(
+            "add", lambda a, b: a + b, "Adds two numbers.",
+            {"a": {"type": "integer"}, "b": {"type": "integer"}}, ["a", "b"]
+        )
+        self.registry.register("files", lambda: ["a.py", "b.py"], "Lists files.")
+        self.registry.register("delete", lambda path: None, "Deletes a file.", {"path": {"type": "string"}},
+                               ["path"], mutating=True, confirm=True)
+        self.registry.register("fail", self.fail_tool, "Always fails.")
+
+    def confirm(self, name, arguments):
+        self.confirmations.append((name, arguments))
+        return self.allow
+
+    def fail_tool(self):
+        raise RuntimeError("disk full")
+
+    def test_schemas(self):
+        schema = self.registry.schemas()[0]
+        self.assertEqual(schema["type"], "function")
+        self.assertEqual(schema["function"]["name"], "add")
+        self.assertEqual(schema["function"]["parameters"]["required"], ["a", "b"])
+
+    def test_results_are_returned_as_text(self):
+        self.assertEqual(self.registry.call("add", {"a": 2, "b": 3}), "5")
+        self.assertEqual(self.registry.call("files", {}), "a.py\nb.py")
+        self.assertEqual(self.registry.call("delete", {"path": "x"}), "Done.")
+        self.assertEqual(self.registry.call("fail", {}), "Error: disk full")
+        self.assertEqual(self.registry.call("missing", {}), "Error: unknown tool 'missing'.")
+        self.assertIn("Error:", self.registry.call("add", {"a": 1}))
+
+    def test_confirmation_is_asked_for_marked_tools(self):
+        self.allow = False
+        self.assertEqual(self.registry.call("delete", {"path": "x"}), "The user declined this action.")
+        self.assertEqual(self.confirmations, [("delete", {"path": "x"})])
+        self.registry.call("add", {"a": 1, "b": 1})
+        self.assertEqual(len(self.confirmations), 1)
+
+    def test_read_only_calls_run_concurrently_and_mutating_calls_in_order(self):
+        registry = ToolRegistry(max_workers=4)
+        started = threading.Barrier(3, timeout=5)
+        order = []
+        lock = threading.Lock()
+
+        def read(name):
+            if name != "r3":
+                started.wait()  # Only returns if the three reads before the write run at the same time
+            with lock:
+                order.append(name)
+            return name
+
+        def write(name):
+            with lock:
+                order.append(name)
+            return name
+
+        registry.register("read", read, "Reads.")
+        registry.register("write", write, "Writes.", mutating=True)
+        calls = [("read", {"name": f"r{number}"}) for number in range(3)] + [("write", {"name": "w"}), ("read", {"name": "r3"})]
+        self.assertEqual(registry.execute(calls), ["r0", "r1", "r2", "w", "r3"])
+        self.assertEqual(order[3:], ["w", "r3"])
+
+    def test_execute_tool_calls_returns_tool_messages(self):
+        messages = self.registry.execute_tool_calls([
+            tool_call("call_1", "add", {"a": 1, "b": 2}),
+            tool_call("call_2", "add", "{not json"),
+            tool_call("call_3", "add", "[1, 2]"),
+            tool_call("call_4", "files", ""),
+        ])
+        self.assertEqual(messages, [
+            {"role": "tool", "tool_call_id": "call_1", "content": "3"},
+            {"role": "tool", "tool_call_id": "call_2", "content": "Error: the arguments are not a valid JSON object."},
+            {"role": "tool", "tool_call_id": "call_3", "content": "Error: the arguments are not a valid JSON object."},
+            {"role": "tool", "tool_call_id": "call_4", "content": "a.py\nb.py"},
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
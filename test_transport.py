@@ -0,0 +1,123 @@
+import asyncio
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import httpx
+import openai
+
+from transport import (
+    TransportStats, backoff_delay, build_async_http_client, build_http_client, call_with_retries,
+    call_with_retries_async
+)
+
+
+class OkHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keeps connections open between requests
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Function to make a retryable API error
+def connection_error():
+    """
+    Returns an openai.APIConnectionError for a dummy request.
+    """
+    return openai.APIConnectionError(request=httpx.Request("POST", "http://localhost/chat/completions"))
+
+
+class PooledClientTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), OkHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}/ping"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_blocking_client_reuses_its_connection(self):
+        stats = TransportStats()
+        with build_http_client(stats) as client:
+            for _ in range(3):
+                self.assertEqual(client.get(self.url).text, "ok")
+        self.assertEqual((stats.requests, stats.new_connections, stats.reused()), (3, 1, 2))
+
+    def test_async_client_reuses_its_connection(self):
+        stats = TransportStats()
+
+        async def run():
+            async with build_async_http_client(stats) as client:
+                for _ in range(3):
+                    self.assertEqual((await client.get(self.url)).text, "ok")
+
+        asyncio.run(run())
+        self.assertEqual((stats.requests, stats.new_connections, stats.reused()), (3, 1, 2))
+
+
+class RetryTest(unittest.TestCase):
+
+    def test_backoff_delay_is_capped(self):
+        for attempt in range(10):
+            self.assertLessEqual(backoff_delay(attempt, base_delay=0.5, max_delay=8.0), min(8.0, 0.5 * 2 ** attempt))
+
+    def test_retryable_errors_are_retried(self):
+        calls = []
+
+        def flaky(value):
+            calls.append(value)
+            if len(calls) < 3:
+                raise connection_error()
+            return value * 2
+
+        with mock.patch("transport.time.sleep") as sleep:
+            self.assertEqual(call_with_retries(flaky, 21, attempts=3), 42)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_last_error_is_raised(self):
+        def failing():
+            raise connection_error()
+
+        with mock.patch("transport.time.sleep"):
+            with self.assertRaises(openai.APIConnectionError):
+                call_with_retries(failing, attempts=2)
+
+    def test_other_errors_are_not_retried(self):
+        calls = []
+
+        def broken():
+            calls.append(1)
+            raise ValueError("bad request")
+
+        with self.assertRaises(ValueError):
+            call_with_retries(broken, attempts=3)
+        self.assertEqual(len(calls), 1)
+
+    def test_async_retries(self):
+        calls = []
+
+        async def flaky():
+            calls.append(1)
+            if len(calls) < 2:
+                raise connection_error()
+            return "done"
+
+        with mock.patch("transport.asyncio.sleep", mock.AsyncMock()):
+            self.assertEqual(asyncio.run(call_with_retries_async(flaky, attempts=3)), "done")
+        self.assertEqual(len(calls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
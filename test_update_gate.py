@@ -0,0 +1,180 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from backup_store import BackupStore
+from file_utils import write_atomically
+from script_runner import run_sandboxed
+from update_gate import ScriptInstaller, validate_update
+
+APP_CODE = """def double(value):
+    return value * 2
+
+
+if __name__ == "__main__":
+    print(double(int(input("Number: "))))
+"""
+
+APP_TEST = """import unittest
+
+from app import double
+
+
+class DoubleTest(unittest.TestCase):
+
+    def test_double(self):
+        self.assertEqual(double(4), 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
+"""
+
+BROKEN_TEST = """import unittest
+
+
+class BrokenTest(unittest.TestCase):
+
+    def test_broken(self):
+        self.fail("this test already fails")
+
+
+if __name__ == "__main__":
+    unittest.main()
+"""
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class ValidateUpdateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.script = os.path.join(self.directory, "app.py")
+        self.write("app.py", APP_CODE)
+        self.write("test_app.py", APP_TEST)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, code):
+        with open(os.path.join(self.directory, name), 'w') as f:
+            f.write(code)
+
+    def validate(self, code, **kwargs):
+        return validate_update(code, self.script, run_sandboxed, import_timeout=30, test_workers=2, **kwargs)
+
+    def test_code_that_does_not_compile(self):
+        result = self.validate("def double(value):\nreturn value\n")
+        self.assertFalse(result.passed)
+        self.assertEqual(result.stage, "compile")
+
+    def test_code_that_fails_while_starting(self):
+        result = self.validate("import missing_module_for_the_test\n" + APP_CODE)
+        self.assertFalse(result.passed)
+        self.assertEqual(result.stage, "import")
+        self.assertIn("missing_module_for_the_test", result.report)
+
+    def test_code_that_exits_before_asking_for_input(self):
+        result = self.validate("print('no prompt')\n")
+        self.assertEqual(result.stage, "import")
+        self.assertIn("exited before it asked for input", result.report)
+
+    def test_network_is_disabled_while_starting(self):
+        code = "import socket\nsocket.create_connection(('example.com', 80))\n" + APP_CODE
+        result = self.validate(code)
+        self.assertEqual(result.stage, "import")
+        self.assertIn("network access is disabled", result.report)
+
+    def test_code_that_breaks_a_passing_test(self):
+        result = self.validate(APP_CODE.replace("value * 2", "value * 3"))
+        self.assertFalse(result.passed)
+        self.assertEqual(result.stage, "tests")
+        self.assertIn("The update breaks test_app.py", result.report)
+
+    def test_tests_that_already_fail_do_not_block_the_update(self):
+        self.write("test_broken.py", BROKEN_TEST)
+        result = self.validate(APP_CODE.replace("return value * 2", "return value + value"))
+        self.assertTrue(result.passed)
+        self.assertIn("test_broken.py also fail with the current code", result.report)
+
+    def test_entry_script_is_started_instead_of_the_candidate(self):
+        self.write("main.py", "import app\ninput('> ')\n")
+        main = os.path.join(self.directory, "main.py")
+        library = "def double(value):\n    return value * 2\n"  # Would exit without a prompt if started itself
+        self.assertTrue(self.validate(library, test_pattern='none_*.py', entry_script=main).passed)
+        result = self.validate("raise ValueError('broken on import')\n", test_pattern='none_*.py', entry_script=main)
+        self.assertEqual(result.stage, "import")
+        self.assertIn("broken on import", result.report)
+
+    def test_current_assistant_starts_with_chatbot(self):
+        # The gate validates assistant.py with chatbot.py as the entry point; the current code must pass
+        with open(os.path.join(SOURCE_DIR, "assistant.py")) as f:
+            code = f.read()
+        with mock.patch.dict(os.environ, {"SAM_OPENROUTER": os.environ.get("SAM_OPENROUTER", "validation")}):
+            result = validate_update(code, os.path.join(SOURCE_DIR, "assistant.py"), run_sandboxed,
+                                     test_pattern='none_*.py', entry_script=os.path.join(SOURCE_DIR, "chatbot.py"))
+        self.assertTrue(result.passed, result.report)
+
+
+class ScriptInstallerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.script = os.path.join(self.directory, "app.py")
+        with open(self.script, 'w') as f:
+            f.write(APP_CODE)
+        self.store = BackupStore(os.path.join(self.directory, "backups"))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read_script(self):
+        with open(self.script) as f:
+            return f.read()
+
+    def test_install_and_roll_back(self):
+        installer = ScriptInstaller(self.script, self.store)
+        self.assertFalse(installer.can_roll_back())
+        installer.install("print('new version')\n")
+        self.assertEqual(self.read_script(), "print('new version')\n")
+        self.assertTrue(installer.can_roll_back())
+        self.assertTrue(installer.rollback())
+        self.assertEqual(self.read_script(), APP_CODE)
+        self.assertFalse(installer.can_roll_back())
+        self.assertFalse(installer.rollback())
+
+    def test_roll_back_after_a_restart(self):
+        ScriptInstaller(self.script, self.store).install("print('new version')\n")
+        installer = ScriptInstaller(self.script, BackupStore(os.path.join(self.directory, "backups")))
+        self.assertTrue(installer.can_roll_back())
+        self.assertTrue(installer.rollback())
+        self.assertEqual(self.read_script(), APP_CODE)
+        self.assertEqual(self.store.latest(self.script, label="before update")["script"], self.script)
+
+    def test_install_keeps_permissions_and_leaves_no_temporary_files(self):
+        os.chmod(self.script, 0o755)
+        ScriptInstaller(self.script, self.store).install("print('new version')\n")
+        self.assertEqual(os.stat(self.script).st_mode & 0o777, 0o755)
+        self.assertEqual(sorted(os.listdir(self.directory)), ["app.py", "backups"])
+
+
+class WriteAtomicallyTest(unittest.TestCase):
+
+    def test_writes_text_and_bytes(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "nested", "data.bin")
+            write_atomically(path, "text\n")
+            write_atomically(path, b"bytes\n")
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), b"bytes\n")
+            self.assertEqual(os.listdir(os.path.dirname(path)), ["data.bin"])
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    unittest.main()
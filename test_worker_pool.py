@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import worker_pool
+from worker_pool import CAN_FORK, WorkerPool
+
+
+class WorkerPoolTestCase(unittest.TestCase):
+    """
+    Base class with a temporary directory for scripts.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write_script(self, name, code):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as f:
+            f.write(code)
+        return path
+
+    def start_pool(self, **kwargs):
+        pool = WorkerPool(**kwargs)
+        self.addCleanup(pool.stop)
+        return pool
+
+
+@unittest.skipUnless(CAN_FORK, "the pool only runs jobs on workers where fork is available")
+class WorkerPoolTest(WorkerPoolTestCase):
+
+    def test_runs_scripts_with_arguments_output_and_exit_status(self):
+        pool = self.start_pool(size=1)
+        script = self.write_script("greet.py", "import sys\nprint('hello', sys.argv[1])\nsys.exit(3)\n")
+        lines = []
+        result = pool.run(script, ["world"], on_output=lines.append)
+        self.assertEqual(result.returncode, 3)
+        self.assertEqual(result.output, "hello world\n")
+        self.assertEqual(lines, ["hello world"])
+
+    def test_jobs_do_not_share_interpreter_state(self):
+        pool = self.start_pool(size=1)
+        script = self.write_script("state.py", "import json\nprint(hasattr(json, 'patched'))\njson.patched = True\n")
+        self.assertEqual(pool.run(script).output, "False\n")
+        self.assertEqual(pool.run(script).output, "False\n")
+
+    def test_wall_timeout_replaces_the_worker(self):
+        pool = self.start_pool(size=1)
+        slow = self.write_script("slow.py", "import time\ntime.sleep(30)\n")
+        result = pool.run(slow, wall_timeout=0.5)
+        self.assertEqual(result.limit, "wall time")
+        quick = self.write_script("quick.py", "print('ok')\n")
+        self.assertEqual(pool.run(quick).output, "ok\n")
+
+    def test_worker_is_replaced_after_max_jobs(self):
+        pool = self.start_pool(size=1, max_jobs=1)
+        script = self.write_script("pid.py", "import os\nprint(os.getppid())\n")
+        first = pool.run(script).output
+        self.assertNotEqual(pool.run(script).output, first)
+
+    def test_runs_in_own_process_after_stop(self):
+        pool = self.start_pool(size=1)
+        pool.start()
+        pool.stop()
+        script = self.write_script("quick.py", "print('ok')\n")
+        with mock.patch("worker_pool.run_sandboxed", wraps=worker_pool.run_sandboxed) as sandboxed:
+            self.assertEqual(pool.run(script).output, "ok\n")
+        sandboxed.assert_called_once()
+
+    def test_runs_in_own_process_when_no_worker_becomes_idle(self):
+        pool = self.start_pool(size=0, checkout_timeout=0.2)
+        script = self.write_script("quick.py", "print('ok')\n")
+        with mock.patch("worker_pool.run_sandboxed", wraps=worker_pool.run_sandboxed) as sandboxed:
+            self.assertEqual(pool.run(script).output, "ok\n")
+        sandboxed.assert_called_once()
+
+    def test_worker_that_cannot_start_is_left_out(self):
+        pool = self.start_pool(size=2, checkout_timeout=0.2)
+        with mock.patch("worker_pool.Worker", side_effect=OSError("too many processes")):
+            with self.assertLogs(level="ERROR"):
+                pool.start()
+        self.assertTrue(pool.idle.empty())
+        script = self.write_script("quick.py", "print('ok')\n")
+        self.assertEqual(pool.run(script).output, "ok\n")
+
+
+class WithoutForkTest(WorkerPoolTestCase):
+
+    def test_jobs_run_with_run_sandboxed(self):
+        pool = self.start_pool(size=1)
+        script = self.write_script("quick.py", "print('ok')\n")
+        with mock.patch("worker_pool.CAN_FORK", False):
+            pool.start()
+            with mock.patch("worker_pool.run_sandboxed", wraps=worker_pool.run_sandboxed) as sandboxed:
+                self.assertEqual(pool.run(script).output, "ok\n")
+        self.assertFalse(pool.started)
+        sandboxed.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
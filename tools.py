@@ -0,0 +1,128 @@
+import json  # For decoding tool call arguments
+import logging  # For logging activities
+from concurrent.futures import ThreadPoolExecutor  # For running read-only tools concurrently
+
+
+class ToolRegistry:
+    """
+    Functions the assistant can call through the API's tool calling, with their JSON schemas.
+    Read-only tools requested together run concurrently; mutating tools run one at a time, in order.
+    """
+
+    def __init__(self, confirm=None, max_workers=4):
+        """
+        confirm: callable(name, arguments) returning True if a tool marked with confirm=True may run.
+        max_workers: number of threads for concurrent read-only tools.
+        """
+        self.tools = {}
+        self.confirm = confirm or (lambda name, arguments: True)
+        self.max_workers = max_workers
+
+    def register(self, name, function, description, parameters=None, required=None, mutating=False, confirm=False):
+        """
+        Registers a tool.
+        parameters: dictionary of parameter name -> JSON schema; required: list of required parameter names.
+        mutating: the tool changes files or state, so it must not run concurrently with other tools.
+        confirm: the user has to approve each call.
+        """
+        self.tools[name] = {
+            "function": function,
+            "mutating": mutating,
+            "confirm": confirm,
+            "schema": {
+                "type": "function",
+                "function": {
+                    "name": name,
+                    "description": description,
+                    "parameters": {
+                        "type": "object",
+                        "properties": parameters or {},
+                        "required": required or [],
+                    },
+                },
+            },
+        }
+
+    def schemas(self):
+        """
+        Returns the tool definitions to send with a chat completion request.
+        """
+        return [tool["schema"] for tool in self.tools.values()]
+
+    def is_mutating(self, name):
+        """
+        Returns True if the tool changes state; unknown tools are treated as mutating.
+        """
+        tool = self.tools.get(name)
+        return tool is None or tool["mutating"]
+
+    def call(self, name, arguments):
+        """
+        Runs one tool with decoded arguments and returns its result as text. Errors are returned as text too.
+        """
+        tool = self.tools.get(name)
+        if tool is None:
+            return f"Error: unknown tool '{name}'."
+        if tool["confirm"] and not self.confirm(name, arguments):
+            logging.info(f"User declined tool call {name}({arguments}).")
+            return "The user declined this action."
+        try:
+            result = tool["function"](**arguments)
+        except Exception as e:
+            logging.error(f"Tool {name} failed: {e}")
+            return f"Error: {e}"
+        if result is None:
+            return "Done."
+        if isinstance(result, (list, tuple)):
+            return "\n".join(str(item) for item in result)
+        return str(result)
+
+    def execute(self, calls):
+        """
+        Runs a list of (name, arguments) pairs and returns their results in the same order.
+        Consecutive read-only calls run concurrently; a mutating call waits for the calls before it.
+        """
+        results = [None] * len(calls)
+        batch = []  # Indexes of pending read-only calls
+
+        def run_batch():
+            if len(batch) == 1:
+                index = batch[0]
+                results[index] = self.call(*calls[index])
+            elif batch:
+                with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batch))) as pool:
+                    futures = {index: pool.submit(self.call, *calls[index]) for index in batch}
+                    for index, future in futures.items():
+                        results[index] = future.result()
+            batch.clear()
+
+        for index, (name, arguments) in enumerate(calls):
+            if self.is_mutating(name):
+                run_batch()
+                results[index] = self.call(name, arguments)
+            else:
+                batch.append(index)
+        run_batch()
+        return results
+
+    def execute_tool_calls(self, tool_calls):
+        """
+        Runs the tool calls of an assistant message (API format) and returns the 'tool' messages with their results.
+        """
+        calls = []
+        for tool_call in tool_calls:
+            try:
+                arguments = json.loads(tool_call["function"]["arguments"] or "{}")
+            except ValueError as e:
+                arguments = None
+                logging.error(f"Tool call {tool_call['function']['name']} has invalid arguments: {e}")
+            calls.append((tool_call["function"]["name"], arguments))
+        valid = [index for index, (_, arguments) in enumerate(calls) if isinstance(arguments, dict)]
+        valid_results = self.execute([calls[index] for index in valid])
+        results = ["Error: the arguments are not a valid JSON object."] * len(calls)
+        for index, result in zip(valid, valid_results):
+            results[index] = result
+        return [
+            {"role": "tool", "tool_call_id": tool_call["id"], "content": result}
+            for tool_call, result in zip(tool_calls, results)
+        ]
@@ -0,0 +1,145 @@
+import asyncio  # For async backoff sleeps
+import importlib.util  # For checking if HTTP/2 support is installed
+import logging  # For logging activities
+import random  # For jittered backoff
+import time  # For per-request latency
+
+import httpx  # HTTP client used by the OpenAI SDK
+import openai  # For the retryable API error types
+
+# HTTP/2 needs the optional 'h2' package (pip install httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Errors worth retrying: network problems, timeouts, rate limits and 5xx responses
+RETRYABLE_ERRORS = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+
+class TransportStats:
+    """
+    Counts requests and new connections so connection reuse can be logged.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+
+    def reused(self):
+        """
+        Returns the number of requests that were sent over an already open connection.
+        """
+        return self.requests - self.new_connections
+
+
+# Function to log one finished request
+def _log_request(stats, request, response):
+    """
+    Logs the latency until the response headers arrived and whether the connection was reused.
+    """
+    stats.requests += 1
+    new_connection = request.extensions.get("sam_new_connection", False)
+    if new_connection:
+        stats.new_connections += 1
+    latency = time.perf_counter() - request.extensions.get("sam_start", time.perf_counter())
+    logging.info(
+        f"HTTP {request.method} {request.url.path} {response.status_code} {response.http_version} "
+        f"in {latency * 1000:.0f} ms, {'new' if new_connection else 'reused'} connection "
+        f"({stats.reused()} of {stats.requests} requests reused a connection)."
+    )
+
+
+# Function to build the shared blocking HTTP client
+def build_http_client(stats, max_connections=10, max_keepalive=5, keepalive_expiry=120.0, timeout=60.0):
+    """
+    Returns an httpx.Client with connection pooling, keep-alive, HTTP/2 when available and request logging.
+    """
+    def on_request(request):
+        request.extensions["sam_start"] = time.perf_counter()
+
+        def trace(event, info):
+            if event == "connection.connect_tcp.started":
+                request.extensions["sam_new_connection"] = True
+
+        request.extensions["trace"] = trace
+
+    def on_response(response):
+        _log_request(stats, response.request, response)
+
+    return httpx.Client(
+        http2=HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry
+        ),
+        timeout=timeout,
+        event_hooks={"request": [on_request], "response": [on_response]}
+    )
+
+
+# Function to build the shared async HTTP client
+def build_async_http_client(stats, max_connections=10, max_keepalive=5, keepalive_expiry=120.0, timeout=60.0):
+    """
+    Returns an httpx.AsyncClient with connection pooling, keep-alive, HTTP/2 when available and request logging.
+    """
+    async def on_request(request):
+        request.extensions["sam_start"] = time.perf_counter()
+
+        async def trace(event, info):
+            if event == "connection.connect_tcp.started":
+                request.extensions["sam_new_connection"] = True
+
+        request.extensions["trace"] = trace
+
+    async def on_response(response):
+        _log_request(stats, response.request, response)
+
+    return httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry
+        ),
+        timeout=timeout,
+        event_hooks={"request": [on_request], "response": [on_response]}
+    )
+
+
+# Function to compute the wait before the next retry
+def backoff_delay(attempt, base_delay=0.5, max_delay=8.0):
+    """
+    Returns a random delay between zero and the exponential backoff for the attempt ("full jitter").
+    """
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+# Function to call the API with retries
+def call_with_retries(function, *args, attempts=3, **kwargs):
+    """
+    Calls the function and retries retryable API errors with jittered exponential backoff.
+    """
+    for attempt in range(attempts):
+        try:
+            return function(*args, **kwargs)
+        except RETRYABLE_ERRORS as e:
+            if attempt == attempts - 1:
+                raise
+            delay = backoff_delay(attempt)
+            logging.warning(f"API call failed ({e}), retrying in {delay:.2f}s (attempt {attempt + 2} of {attempts}).")
+            time.sleep(delay)
+
+
+# Async version of call_with_retries
+async def call_with_retries_async(function, *args, attempts=3, **kwargs):
+    """
+    Awaits the function and retries retryable API errors with jittered exponential backoff.
+    """
+    for attempt in range(attempts):
+        try:
+            return await function(*args, **kwargs)
+        except RETRYABLE_ERRORS as e:
+            if attempt == attempts - 1:
+                raise
+            delay = backoff_delay(attempt)
+            logging.warning(f"API call failed ({e}), retrying in {delay:.2f}s (attempt {attempt + 2} of {attempts}).")
+            await asyncio.sleep(delay)
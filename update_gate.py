@@ -0,0 +1,170 @@
+import glob  # For the files copied into the validation directory
+import logging  # For logging activities
+import os  # For the paths of the sources and the validation directory
+import shutil  # For copying the sources and removing the validation directory
+import tempfile  # For the validation directory
+
+from file_utils import write_atomically  # For replacing the script in one step
+from parallel_tests import discover_tests, format_report, run_parallel  # For running the test suite
+from script_runner import run_sandboxed  # For starting the candidate in a fresh interpreter
+
+# Files copied next to the candidate so it starts as it would in the real directory
+VALIDATION_COPY_PATTERNS = ("*.py", "*.md", "*.txt")
+
+# Script that runs the candidate until it first asks for input, with network access disabled
+IMPORT_CHECK_SCRIPT = '''import builtins
+import runpy
+import socket
+import sys
+
+
+class StartupComplete(BaseException):
+    pass
+
+
+def no_network(*args, **kwargs):
+    raise OSError("network access is disabled while validating an update")
+
+
+def stop_at_prompt(prompt=""):
+    raise StartupComplete()
+
+
+socket.socket.connect = no_network
+socket.socket.connect_ex = no_network
+socket.create_connection = no_network
+socket.getaddrinfo = no_network
+builtins.input = stop_at_prompt
+
+sys.argv = [sys.argv[1]]
+try:
+    runpy.run_path(sys.argv[0], run_name="__main__")
+except StartupComplete:
+    print("Startup completed.")
+    sys.exit(0)
+print("The script exited before it asked for input.")
+sys.exit(1)
+'''
+
+
+class ValidationResult:
+    """
+    Outcome of validating an updated script: whether it passed, the stage that failed and a report.
+    """
+
+    def __init__(self, passed, stage, report):
+        self.passed = passed
+        self.stage = stage  # "compile", "import", "tests" or "passed"
+        self.report = report
+
+
+# Function to copy the sources into the validation directory with the candidate in place of the script
+def prepare_directory(source_dir, target_dir, script_name, code):
+    """
+    Copies the files matching VALIDATION_COPY_PATTERNS and writes the candidate as script_name.
+    """
+    for pattern in VALIDATION_COPY_PATTERNS:
+        for path in glob.glob(os.path.join(source_dir, pattern)):
+            if os.path.isfile(path):
+                shutil.copy2(path, target_dir)
+    with open(os.path.join(target_dir, script_name), 'w') as f:
+        f.write(code)
+
+
+# Function to check an updated script before it replaces the running one
+def validate_update(code, script_filename, runner, test_pattern='test_*.py', import_timeout=60, test_workers=None,
+                    entry_script=None):
+    """
+    Validates the candidate code for script_filename in three stages, stopping at the first failure:
+    compile it; run entry_script (default the candidate itself) in a copy of the directory with network access
+    disabled until it first asks for input; run the test files in parallel against the copy. A test file only
+    fails the update if it passes with the current code. The startup check always runs in a new interpreter
+    with run_sandboxed, so modules imported by earlier runs cannot hide an import error of the candidate.
+    runner: callable(path, on_line=None, cwd=None, **kwargs) returning a RunResult for the tests, e.g. WorkerPool.run.
+    Returns a ValidationResult.
+    """
+    script_filename = os.path.abspath(script_filename)
+    source_dir = os.path.dirname(script_filename)
+    script_name = os.path.basename(script_filename)
+    try:
+        compile(code, script_name, 'exec')
+    except SyntaxError as e:
+        return ValidationResult(False, "compile", f"The updated code does not compile: {e}")
+
+    validation_dir = tempfile.mkdtemp(prefix="sam_validate_")
+    try:
+        prepare_directory(source_dir, validation_dir, script_name, code)
+        check_script = os.path.join(validation_dir, "_import_check.py")
+        with open(check_script, 'w') as f:
+            f.write(IMPORT_CHECK_SCRIPT)
+        entry_name = os.path.basename(entry_script) if entry_script else script_name
+        result = run_sandboxed(check_script, args=[entry_name], cwd=validation_dir, wall_timeout=import_timeout)
+        if result.returncode != 0:
+            return ValidationResult(False, "import", f"The updated code {result.summary()} while starting:\n{result.output}")
+
+        test_files = discover_tests(validation_dir, test_pattern)
+        if not test_files:
+            return ValidationResult(True, "passed", "The updated code compiles and starts; there are no tests to run.")
+        results, wall_time = run_parallel(
+            test_files, lambda path, **kwargs: runner(path, cwd=validation_dir, **kwargs), workers=test_workers
+        )
+        report = format_report(results, wall_time)
+        failing = [os.path.basename(file_result.path) for file_result in results if not file_result.passed]
+        if failing:
+            # Tests that also fail with the current code are not caused by the update
+            current_results, _ = run_parallel(
+                [os.path.join(source_dir, name) for name in failing],
+                lambda path, **kwargs: runner(path, cwd=source_dir, **kwargs),
+                workers=test_workers
+            )
+            regressions = [
+                os.path.basename(file_result.path) for file_result in current_results if file_result.passed
+            ]
+            if regressions:
+                return ValidationResult(False, "tests", f"The update breaks {', '.join(regressions)}.\n\n{report}")
+            report += f"\n\n{', '.join(failing)} also fail with the current code, so they do not block the update."
+        return ValidationResult(True, "passed", f"The updated code compiles, starts and passes the tests.\n\n{report}")
+    finally:
+        shutil.rmtree(validation_dir, ignore_errors=True)
+
+
+class ScriptInstaller:
+    """
+    Replaces a script atomically and keeps the previous version, in memory and in a BackupStore,
+    so an update can be rolled back at once.
+    """
+
+    def __init__(self, script_filename, store):
+        self.script_filename = script_filename
+        self.store = store
+        self.rollback_ref = f"{script_filename}:rollback"  # Store reference to the version a rollback restores
+        self.previous_code = None
+
+    def install(self, code):
+        """
+        Replaces the script with code, keeping the current version for rollback.
+        """
+        with open(self.script_filename, 'r') as f:
+            self.previous_code = f.read()
+        entry = self.store.add(self.previous_code, self.script_filename, label="before update")
+        self.store.set_ref(self.rollback_ref, entry["hash"])
+        write_atomically(self.script_filename, code, prefix=".sam_update_", suffix=".py")
+        logging.info(f"Installed the update of '{self.script_filename}'; previous version kept as backup version {entry['version']}.")
+
+    def can_roll_back(self):
+        return self.previous_code is not None or self.store.get_ref(self.rollback_ref) is not None
+
+    def rollback(self):
+        """
+        Puts the previous version of the script back. Returns False if there is none.
+        """
+        if self.previous_code is None:
+            content_hash = self.store.get_ref(self.rollback_ref)
+            if content_hash is None:
+                return False
+            self.previous_code = self.store.read(content_hash)
+        write_atomically(self.script_filename, self.previous_code, prefix=".sam_update_", suffix=".py")
+        logging.info(f"Rolled back '{self.script_filename}' to the previous version.")
+        self.previous_code = None
+        self.store.set_ref(self.rollback_ref, None)
+        return True
@@ -0,0 +1,347 @@
+import atexit  # For running the exit handlers of a job
+import gc  # For finding the files a job left open
+import importlib  # For preloading modules in the workers
+import io  # For finding the files a job left open
+import json  # For the messages exchanged with the workers
+import logging  # For logging activities
+import os  # For forking jobs and process groups
+import queue  # For the output of the workers and the idle workers
+import runpy  # For running a script as __main__ inside a worker
+import subprocess  # For starting the worker processes
+import sys  # For the interpreter, argv and stdout of the jobs
+import threading  # For reading worker output and replacing workers in the background
+import time  # For timeouts and durations
+import traceback  # For reporting exceptions raised by a job
+
+from script_runner import (  # Shared with the one-off script runner
+    BoundedBuffer, RunResult, exceeded_limit, kill_process, output_handler, peak_rss_bytes, run_sandboxed
+)
+
+try:
+    import resource  # For CPU and memory limits; not available on Windows
+except ImportError:
+    resource = None
+
+# Jobs need a forked child each for a clean interpreter state; without fork every job runs in a new process
+CAN_FORK = hasattr(os, "fork") and resource is not None
+
+PRELOAD_MODULES = ("unittest", "json", "re", "collections", "itertools", "functools", "math", "datetime")
+
+
+class Worker:
+    """
+    One warm worker process. Jobs and results are JSON lines on its stdin and stdout.
+    """
+
+    def __init__(self, preload):
+        self.process = subprocess.Popen(
+            [sys.executable, "-u", os.path.abspath(__file__), *preload],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            start_new_session=os.name == "posix",  # Own process group, so a timeout also stops the job it forked
+        )
+        self.messages = queue.Queue()
+        self.jobs = 0
+        threading.Thread(target=self._read, name="worker-output", daemon=True).start()
+
+    def _read(self):
+        """
+        Forwards the worker's messages to the queue; None marks the end of its output.
+        """
+        for line in self.process.stdout:
+            try:
+                self.messages.put(json.loads(line))
+            except ValueError:
+                logging.warning(f"Worker {self.process.pid} wrote an invalid message: {line[:200]!r}")
+        self.messages.put(None)
+
+    def send(self, job):
+        self.process.stdin.write((json.dumps(job) + "\n").encode('utf-8'))
+        self.process.stdin.flush()
+        self.jobs += 1
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def stop(self):
+        """
+        Closes the worker's stdin so it exits, killing it if it does not.
+        """
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=2)
+        except (OSError, subprocess.TimeoutExpired):
+            kill_process(self.process)
+            self.process.wait()
+
+
+class WorkerPool:
+    """
+    Pre-started Python processes that run scripts without paying interpreter startup and imports each time.
+    Each worker forks a fresh child per job, like a forkserver, so jobs get a clean interpreter state
+    and their own CPU and memory limits. Where fork is not available (Windows) no workers are started and
+    every job runs in its own process with run_sandboxed, since jobs sharing a worker would share its
+    imported modules and any patches a previous job left behind.
+    Workers are replaced after max_jobs jobs, after a crash and after a timeout. A job that finds no idle
+    worker in time, or that is submitted after stop(), also runs with run_sandboxed.
+    """
+
+    def __init__(self, size=2, max_jobs=50, preload=PRELOAD_MODULES, checkout_timeout=30):
+        """
+        size: number of warm workers kept.
+        max_jobs: jobs a worker runs before it is replaced.
+        preload: modules imported by each worker when it starts.
+        checkout_timeout: seconds a job waits for an idle worker before it runs in its own process instead.
+        """
+        self.size = size
+        self.max_jobs = max_jobs
+        self.checkout_timeout = checkout_timeout
+        self.preload = tuple(preload)
+        self.idle = queue.Queue()
+        self.lock = threading.Lock()
+        self.started = False
+        self.stopped = False
+
+    def start(self):
+        """
+        Starts the workers if they are not running yet.
+        """
+        with self.lock:
+            if self.started or self.stopped or not CAN_FORK:
+                return
+            self.started = True
+        for _ in range(self.size):
+            self._add_worker()
+        logging.info(f"Worker pool started {self.size} workers.")
+
+    def _add_worker(self):
+        """
+        Starts a worker and makes it idle; a worker that cannot be started is logged and left out.
+        """
+        try:
+            worker = Worker(self.preload)
+        except OSError as e:
+            logging.error(f"Could not start a worker: {e}")
+            return
+        if self.stopped:
+            worker.stop()
+        else:
+            self.idle.put(worker)
+
+    def _replace(self, worker):
+        """
+        Stops a worker and starts a new one in the background.
+        """
+        def replace():
+            worker.stop()
+            if not self.stopped:
+                self._add_worker()
+        threading.Thread(target=replace, name="worker-replace", daemon=True).start()
+
+    def _checkout(self):
+        """
+        Returns an idle worker that is still running, or None if the pool is stopped
+        or no worker becomes idle within checkout_timeout seconds.
+        """
+        self.start()
+        deadline = time.monotonic() + self.checkout_timeout
+        while not self.stopped:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logging.warning(f"No worker became idle within {self.checkout_timeout} seconds.")
+                return None
+            try:
+                worker = self.idle.get(timeout=min(remaining, 0.5))  # Wakes up regularly to notice stop()
+            except queue.Empty:
+                continue
+            if worker.alive():
+                return worker
+            logging.warning(f"Worker {worker.process.pid} exited while idle; replacing it.")
+            self._replace(worker)
+        return None
+
+    def run(self, script_name, args=(), wall_timeout=60, cpu_seconds=30, memory_bytes=None,
+            max_output_bytes=8192, on_output=None, on_line=None, cwd=None):
+        """
+        Runs a Python script on a warm worker with the same limits and output handling as run_sandboxed.
+        on_output: callable(line) called live for each line kept at the start of the output.
+        on_line: callable(line) called for every line of the output, e.g. to write a log file.
+        Returns a RunResult.
+        """
+        worker = self._checkout() if CAN_FORK else None
+        if worker is None:
+            return run_sandboxed(script_name, args, wall_timeout=wall_timeout, cpu_seconds=cpu_seconds,
+                                 memory_bytes=memory_bytes, max_output_bytes=max_output_bytes,
+                                 on_output=on_output, on_line=on_line, cwd=cwd)
+        buffer = BoundedBuffer(max_output_bytes)
+        handle_line = output_handler(buffer, on_output, on_line)
+        start = time.monotonic()
+        worker.send({
+            "script": os.path.abspath(script_name),
+            "args": list(args),
+            "cwd": os.path.abspath(cwd or os.getcwd()),
+            "cpu_seconds": cpu_seconds,
+            "memory_bytes": memory_bytes,
+        })
+        returncode, peak_rss, limit = None, None, None
+        while True:
+            try:
+                message = worker.messages.get(timeout=max(0, start + wall_timeout - time.monotonic()))
+            except queue.Empty:
+                limit = "wall time"
+                kill_process(worker.process)
+                break
+            if message is None:
+                logging.error(f"Worker {worker.process.pid} crashed while running '{script_name}'.")
+                buffer.add("[the worker running this script crashed]\n")
+                break
+            if "output" in message:
+                handle_line(message["output"])
+            else:
+                returncode, peak_rss, limit = message["returncode"], message["peak_rss"], message["limit"]
+                break
+        duration = time.monotonic() - start
+
+        if returncode is None or limit == "memory" or worker.jobs >= self.max_jobs or not worker.alive():
+            self._replace(worker)
+        else:
+            self.idle.put(worker)
+        return RunResult([script_name, *args], returncode, duration, peak_rss, buffer.text(), buffer.truncated, limit)
+
+    def stop(self):
+        """
+        Stops all idle workers; busy workers are stopped when their job returns.
+        """
+        self.stopped = True
+        while True:
+            try:
+                self.idle.get_nowait().stop()
+            except queue.Empty:
+                break
+
+
+# Functions below run inside the worker process
+
+# Function to run one job in the current process
+def run_job(job, stream):
+    """
+    Runs the job's script as __main__ with the output going to stream and returns its exit status.
+    """
+    sys.argv = [job["script"], *job["args"]]
+    sys.path.insert(0, os.path.dirname(job["script"]))
+    saved = sys.stdout, sys.stderr, os.getcwd()
+    sys.stdout = sys.stderr = stream
+    returncode = 0
+    try:
+        os.chdir(job["cwd"])
+        runpy.run_path(job["script"], run_name="__main__")
+    except SystemExit as e:
+        if isinstance(e.code, int) or e.code is None:
+            returncode = e.code or 0
+        else:
+            print(e.code, file=stream)
+            returncode = 1
+    except BaseException:
+        traceback.print_exc(file=stream)
+        returncode = 1
+    finally:
+        stream.flush()
+        sys.stdout, sys.stderr, cwd = saved
+        os.chdir(cwd)
+        del sys.path[0]
+    return returncode
+
+
+# Function to do what the interpreter does at exit before a forked child calls os._exit
+def finish_child(stream):
+    """
+    Waits for the job's non-daemon threads, runs its atexit handlers and flushes the files it left open
+    and the output, so the job ends like `python script.py` would.
+    """
+    current = threading.current_thread()
+    for thread in threading.enumerate():
+        if thread is not current and not thread.daemon:
+            thread.join()
+    try:
+        atexit._run_exitfuncs()
+    except BaseException:
+        traceback.print_exc(file=stream)
+    # Files kept by the job's namespace or not collected yet; the interpreter would flush them when it finalizes
+    # them, which os._exit skips
+    open_files = [obj for obj in gc.get_objects() if isinstance(obj, io.IOBase)]
+    for output in (*open_files, sys.stdout, sys.stderr, stream):
+        try:
+            if not output.closed:
+                output.flush()
+        except (OSError, ValueError):
+            pass
+
+
+# Function to run one job in a forked child, so the worker itself stays clean
+def fork_job(job, send):
+    """
+    Forks a child that runs the job with its own resource limits; the child's output,
+    including output of programs it starts, is read from a pipe and forwarded line by line.
+    Returns (returncode, peak_rss, limit).
+    """
+    read_end, write_end = os.pipe()
+    start = time.monotonic()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_end)
+        # The worker's stdin carries the jobs, so the script must not read from it
+        os.dup2(os.open(os.devnull, os.O_RDONLY), 0)
+        sys.stdin = open(os.devnull, 'r')
+        if job["cpu_seconds"]:
+            resource.setrlimit(resource.RLIMIT_CPU, (job["cpu_seconds"], job["cpu_seconds"] + 1))
+        if job["memory_bytes"]:
+            resource.setrlimit(resource.RLIMIT_AS, (job["memory_bytes"], job["memory_bytes"]))
+        os.dup2(write_end, 1)
+        os.dup2(write_end, 2)
+        os.close(write_end)
+        stream = open(1, 'w', buffering=1, closefd=False, errors='replace')
+        returncode = run_job(job, stream)
+        finish_child(stream)
+        os._exit(returncode & 0xFF)
+    os.close(write_end)
+    memory_error = False
+    with open(read_end, 'r', errors='replace') as output:
+        for line in output:
+            memory_error = memory_error or line.startswith("MemoryError")
+            send({"output": line})
+    _, status, usage = os.wait4(pid, 0)
+    returncode = os.waitstatus_to_exitcode(status)
+    limit = exceeded_limit(
+        returncode, time.monotonic() - start, job["cpu_seconds"], job["memory_bytes"], memory_error
+    )
+    return returncode, peak_rss_bytes(usage), limit
+
+
+# Function with the worker's main loop
+def worker_main(preload):
+    """
+    Imports the preload modules, then runs the jobs read from stdin and writes their results to stdout.
+    """
+    channel = os.fdopen(os.dup(1), 'w', buffering=1, encoding='utf-8')
+    # Anything else printed to the real stdout would corrupt the messages
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    lock = threading.Lock()
+
+    def send(message):
+        with lock:
+            channel.write(json.dumps(message) + "\n")
+
+    for name in preload:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+    for line in sys.stdin:
+        job = json.loads(line)
+        returncode, peak_rss, limit = fork_job(job, send)
+        send({"returncode": returncode, "peak_rss": peak_rss, "limit": limit})
+
+
+if __name__ == "__main__":
+    worker_main(sys.argv[1:])